@@ -10,7 +10,9 @@ from .params import (
     ParametersSection,
 )
 from .source import (
+    CachedMultiFileSource,
     FileFinderSource,
+    GeneratedSource,
     GlobSource,
     MultiFileSource,
     SimpleSource,
@@ -23,16 +25,19 @@ from .writer import (
     MetadataGenerator,
     Splitable,
     SplitWriterMixin,
+    WritePlan,
     WriterAbstract,
     method,
 )
 
 __all__ = [
     "CachedModule",
+    "CachedMultiFileSource",
     "DataInterface",
     "DataInterfaceSection",
     "DataInterfaceStore",
     "FileFinderSource",
+    "GeneratedSource",
     "GlobSource",
     "LoaderAbstract",
     "MetadataGenerator",
@@ -48,6 +53,7 @@ __all__ = [
     "SourceUnion",
     "SplitWriterMixin",
     "Splitable",
+    "WritePlan",
     "WriterAbstract",
     "autocached",
     "method",
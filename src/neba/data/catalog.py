@@ -0,0 +1,372 @@
+"""Catalog of files stored in a SQLite database.
+
+A :class:`FileCatalog` keeps, for each file matching a filefinder pattern, its path
+relative to the root directory, its size and modification time, and the values of
+each group of the pattern. Each value is stored in its own indexed column, so that
+selecting files by value is done by SQL queries rather than by matching regular
+expressions against every filename::
+
+    catalog = FileCatalog("catalog.db", "/data/sst", "%(Y)/sst_%(Y)%(m)%(d).nc")
+    catalog.update()
+    files = catalog.query(Y=slice(2010, 2015), m=[1, 2, 3])
+
+The catalog is updated incrementally: only directories whose modification time
+changed since the last update are listed again. Multiple catalogs (for different
+roots or patterns) can be kept in the same database.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Iterator, Sequence
+from os import path
+from typing import TYPE_CHECKING, Any
+
+log = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from filefinder import Finder
+    from filefinder.matches import Matches
+
+
+def _regexp(pattern: str, string: Any) -> bool:
+    return string is not None and re.fullmatch(pattern, str(string)) is not None
+
+
+def _quote(name: str) -> str:
+    """Quote an SQL identifier."""
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+class FileCatalog:
+    """Catalog of files matching a filefinder pattern, stored in SQLite.
+
+    Parameters
+    ----------
+    database
+        Filename of the SQLite database. It is created if needed.
+    root
+        Root directory of the files.
+    pattern
+        Filename pattern, relative to the root directory. See the filefinder
+        `documentation <https://filefinder.readthedocs.io/en/latest/>`__.
+    """
+
+    def __init__(
+        self, database: str | os.PathLike, root: str | os.PathLike, pattern: str
+    ) -> None:
+        from filefinder import Finder
+
+        self.database = str(database)
+        self.root = str(root)
+        self.pattern = pattern
+        self.finder: Finder = Finder(self.root, pattern)
+        """Unfixed finder, used to match filenames."""
+        self.group_names: list[str] = sorted(self.finder.get_group_names())
+
+        self.connection = sqlite3.connect(self.database, check_same_thread=False)
+        self.connection.create_function("regexp", 2, _regexp, deterministic=True)
+        self._lock = threading.RLock()
+
+        key = hashlib.sha256(f"{self.root}\0{pattern}".encode()).hexdigest()[:16]
+        self._files = _quote(f"files_{key}")
+        self._dirs = _quote(f"dirs_{key}")
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        groups = "".join(
+            f", {_quote('v_' + name)}, {_quote('s_' + name)} TEXT"
+            for name in self.group_names
+        )
+        with self._lock, self.connection as con:
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._dirs} "
+                "(path TEXT PRIMARY KEY, parent TEXT, mtime INTEGER)"
+            )
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._files} "
+                f"(path TEXT PRIMARY KEY, dir TEXT, size INTEGER, mtime INTEGER{groups})"
+            )
+            con.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(self._files[1:-1] + '_dir')} "
+                f"ON {self._files} (dir)"
+            )
+            for name in self.group_names:
+                index = _quote(f"{self._files[1:-1]}_v_{name}")
+                con.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index} "
+                    f"ON {self._files} ({_quote('v_' + name)})"
+                )
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        self.connection.close()
+
+    def __len__(self) -> int:
+        """Return the number of files in the catalog."""
+        with self._lock:
+            return self.connection.execute(
+                f"SELECT COUNT(*) FROM {self._files}"
+            ).fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over all (absolute) filenames."""
+        return iter(self.query())
+
+    def _get_values(self, matches: Matches) -> list[Any]:
+        values = []
+        for name in self.group_names:
+            try:
+                string = matches.get_value(name, parse=False, keep_discard=True)
+            except KeyError:
+                values += [None, None]
+                continue
+            try:
+                value = matches.get_value(name, keep_discard=True)
+            except ValueError:
+                value = string
+            if not isinstance(value, int | float | str):
+                value = str(value)
+            values += [value, string]
+        return values
+
+    def _scan_directory(
+        self,
+        directory: str,
+        depth: int,
+        subpatterns: list[re.Pattern],
+        full_pattern: re.Pattern,
+        dirs: dict[str, int],
+        children: dict[str, list[str]],
+        counts: list[int],
+    ) -> None:
+        """Update a directory, and recursively its sub-directories."""
+        maxdepth = len(subpatterns) - 1
+        absolute = path.join(self.root, directory)
+        try:
+            mtime = os.stat(absolute).st_mtime_ns
+        except OSError:
+            return
+
+        if dirs.get(directory) == mtime:
+            # no entry was added or removed
+            if depth < maxdepth:
+                for d in children.get(directory, []):
+                    self._scan_directory(
+                        d, depth + 1, subpatterns, full_pattern, dirs, children, counts
+                    )
+            return
+
+        con = self.connection
+        files: dict[str, os.stat_result] = {}
+        subdirs: list[str] = []
+        try:
+            with os.scandir(absolute) as entries:
+                for entry in entries:
+                    relpath = path.join(directory, entry.name)
+                    if entry.is_dir():
+                        if depth < maxdepth and subpatterns[depth].fullmatch(
+                            entry.name
+                        ):
+                            subdirs.append(relpath)
+                    elif depth == maxdepth and full_pattern.fullmatch(relpath):
+                        files[relpath] = entry.stat()
+        except OSError:
+            return
+
+        con.execute(
+            f"INSERT OR REPLACE INTO {self._dirs} VALUES (?, ?, ?)",
+            (directory, path.dirname(directory) if directory else None, mtime),
+        )
+
+        # removed sub-directories
+        for d in set(children.get(directory, [])) - set(subdirs):
+            counts[1] += self._delete_tree(d)
+        for d in subdirs:
+            self._scan_directory(
+                d, depth + 1, subpatterns, full_pattern, dirs, children, counts
+            )
+
+        if depth < maxdepth:
+            return
+
+        # files of this directory
+        stored = {
+            f: (size, mt)
+            for f, size, mt in con.execute(
+                f"SELECT path, size, mtime FROM {self._files} WHERE dir = ?",
+                (directory,),
+            )
+        }
+        removed = [(f,) for f in stored if f not in files]
+        con.executemany(f"DELETE FROM {self._files} WHERE path = ?", removed)
+        counts[1] += len(removed)
+
+        rows = []
+        for f, st in files.items():
+            info = (st.st_size, st.st_mtime_ns)
+            if stored.get(f) == info:
+                continue
+            if f not in stored:
+                counts[0] += 1
+            matches = self.finder.get_matches(f)
+            assert matches is not None
+            rows.append((f, directory, *info, *self._get_values(matches)))
+        if rows:
+            placeholders = ", ".join("?" * len(rows[0]))
+            con.executemany(
+                f"INSERT OR REPLACE INTO {self._files} VALUES ({placeholders})", rows
+            )
+
+    def _delete_tree(self, directory: str) -> int:
+        """Remove a directory and everything below it, return number of files."""
+        con = self.connection
+        bounds = (directory, directory + os.sep, directory + chr(ord(os.sep) + 1))
+        n_files = con.execute(
+            f"DELETE FROM {self._files} WHERE dir = ? OR (dir >= ? AND dir < ?)",
+            bounds,
+        ).rowcount
+        con.execute(
+            f"DELETE FROM {self._dirs} WHERE path = ? OR (path >= ? AND path < ?)",
+            bounds,
+        )
+        return n_files
+
+    def update(self) -> tuple[int, int]:
+        """Update the catalog from the filesystem.
+
+        Directories whose modification time did not change are not listed again.
+        Files present in a listed directory are stat-ed, those whose size or
+        modification time changed are updated.
+
+        .. note::
+
+            A file modified in place does not change the modification time of its
+            directory. Use :meth:`clear` and update again to refresh all files.
+
+        Returns
+        -------
+        added
+            Number of files added.
+        removed
+            Number of files removed.
+        """
+        subpatterns = [re.compile(rgx) for rgx in self.finder.get_regex_subdirs()]
+        full_pattern = re.compile(self.finder.get_regex())
+        counts = [0, 0]
+        with self._lock, self.connection as con:
+            dirs: dict[str, int] = {}
+            children: dict[str, list[str]] = {}
+            for d, parent, mtime in con.execute(
+                f"SELECT path, parent, mtime FROM {self._dirs}"
+            ):
+                dirs[d] = mtime
+                if parent is not None:
+                    children.setdefault(parent, []).append(d)
+
+            if not path.isdir(self.root):
+                counts[1] = con.execute(f"DELETE FROM {self._files}").rowcount
+                con.execute(f"DELETE FROM {self._dirs}")
+            else:
+                self._scan_directory(
+                    "", 0, subpatterns, full_pattern, dirs, children, counts
+                )
+
+        if any(counts):
+            log.debug("Catalog %s updated: %d added, %d removed", self.root, *counts)
+        return counts[0], counts[1]
+
+    def clear(self) -> None:
+        """Remove all files and directories from the catalog."""
+        with self._lock, self.connection as con:
+            con.execute(f"DELETE FROM {self._files}")
+            con.execute(f"DELETE FROM {self._dirs}")
+
+    def _get_condition(self, name: str, value: Any) -> tuple[str, list[Any]]:
+        if name not in self.group_names:
+            raise KeyError(f"No group '{name}' in pattern '{self.pattern}'.")
+        column = _quote("v_" + name)
+        if isinstance(value, str):
+            # strings are regular expressions, like for Finder.fix_group
+            return f"{_quote('s_' + name)} REGEXP ?", [value]
+        if isinstance(value, slice):
+            conditions, args = [], []
+            if value.start is not None:
+                conditions.append(f"{column} >= ?")
+                args.append(value.start)
+            if value.stop is not None:
+                conditions.append(f"{column} <= ?")
+                args.append(value.stop)
+            return " AND ".join(conditions) or "1", args
+        if isinstance(value, Sequence | set | frozenset | range):
+            values = list(value)
+            if any(isinstance(v, str) for v in values):
+                return f"{_quote('s_' + name)} REGEXP ?", [
+                    "|".join(f"(?:{v})" for v in values)
+                ]
+            return f"{column} IN (SELECT value FROM json_each(?))", [
+                json.dumps(values, default=str)
+            ]
+        return f"{column} = ?", [value]
+
+    def query(self, **fixes: Any) -> list[str]:
+        """Return sorted absolute filenames with the given group values.
+
+        Parameters
+        ----------
+        fixes
+            Values of groups to select. A value can be:
+
+            * a string, used as a regular expression on the matched string (like
+              :meth:`filefinder.Finder.fix_group`),
+            * a list (or any sequence, set or range) of values,
+            * a slice, to select values between its start and stop (inclusive),
+              either can be None,
+            * any other value, compared to the parsed value. Booleans are stored
+              as integers.
+        """
+        conditions, args = [], []
+        for name, value in fixes.items():
+            cond, cond_args = self._get_condition(name, value)
+            conditions.append(cond)
+            args += cond_args
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            cursor = self.connection.execute(
+                f"SELECT path FROM {self._files}{where} ORDER BY path", args
+            )
+            return [path.join(self.root, f) for (f,) in cursor]
+
+    def lookup(self, filename: str, relative: bool = False) -> dict[str, Any] | None:
+        """Return information on a file, or None if it is not in the catalog.
+
+        Parameters
+        ----------
+        filename
+            Filename to look for.
+        relative
+            If True, `filename` is relative to the root directory.
+
+        Returns
+        -------
+        info
+            Dictionary with the size, modification time (in nanoseconds) and the
+            parsed value of each group.
+        """
+        if not relative:
+            filename = path.relpath(filename, self.root)
+        columns = ["size", "mtime"] + [_quote("v_" + name) for name in self.group_names]
+        with self._lock:
+            row = self.connection.execute(
+                f"SELECT {', '.join(columns)} FROM {self._files} WHERE path = ?",
+                (filename,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["size", "mtime", *self.group_names], row, strict=True))
@@ -0,0 +1,251 @@
+"""Compact list of filenames.
+
+A :class:`FileList` stores filenames relative to a root directory (stored only
+once) in a single contiguous buffer of bytes, with an array of offsets. For millions
+of files, this takes a fraction of the memory of a list of strings. It behaves as a
+list: it supports ``len``, indexing, slicing, iteration and membership tests, and
+can be compared to a list.
+
+Filenames are decoded when accessed. Modifications (insertion, deletion) copy the
+buffer, they are meant to be occasional.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable, Iterator, MutableSequence
+from itertools import pairwise
+from os import path
+from typing import Any, overload
+
+import numpy as np
+
+
+class FileList(MutableSequence[str]):
+    """List of filenames stored compactly.
+
+    Parameters
+    ----------
+    filenames
+        Filenames to store. They must all be in `root`.
+    root
+        Root directory, removed from each filename before storing. If empty
+        (default), filenames are stored as is.
+
+    Raises
+    ------
+    ValueError
+        A filename is not in the root directory.
+    """
+
+    __slots__ = ("root", "_prefix", "_buffer", "_offsets", "_sorted")
+
+    def __init__(
+        self, filenames: Iterable[str] = (), root: str | os.PathLike = ""
+    ) -> None:
+        root = str(root)
+        prefix = path.join(root, "") if root else ""
+        encoded = []
+        for f in filenames:
+            if not f.startswith(prefix):
+                raise ValueError(f"File '{f}' is not in root directory '{root}'.")
+            encoded.append(os.fsencode(f[len(prefix) :]))
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        self._set(root, buffer, offsets, all(a <= b for a, b in pairwise(encoded)))
+
+    @classmethod
+    def _from_arrays(
+        cls, root: str, buffer: np.ndarray, offsets: np.ndarray, is_sorted: bool
+    ) -> FileList:
+        new = cls.__new__(cls)
+        new._set(root, buffer, offsets, is_sorted)
+        return new
+
+    def _set(
+        self, root: str, buffer: np.ndarray, offsets: np.ndarray, is_sorted: bool
+    ) -> None:
+        self.root: str = root
+        """Root directory of all files."""
+        self._prefix = path.join(root, "") if root else ""
+        self._buffer = buffer
+        self._offsets = offsets
+        self._sorted = is_sorted
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the buffer and offsets."""
+        return self._buffer.nbytes + self._offsets.nbytes
+
+    def relative(self) -> FileList:
+        """Return the filenames relative to the root directory.
+
+        The buffer is shared, nothing is copied or computed.
+        """
+        return self._from_arrays("", self._buffer, self._offsets, self._sorted)
+
+    def __len__(self) -> int:
+        """Return number of files."""
+        return self._offsets.size - 1
+
+    def _get_bytes(self, index: int) -> bytes:
+        return self._buffer[self._offsets[index] : self._offsets[index + 1]].tobytes()
+
+    def _encode(self, filename: str) -> bytes | None:
+        """Return the stored form of a filename, None if not in root directory."""
+        if not filename.startswith(self._prefix):
+            return None
+        return os.fsencode(filename[len(self._prefix) :])
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> FileList: ...
+
+    def __getitem__(self, index: int | slice) -> str | FileList:
+        """Return a filename, or a FileList for a slice."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return FileList([self[i] for i in range(start, stop, step)], self.root)
+            stop = max(start, stop)
+            offsets = self._offsets[start : stop + 1]
+            buffer = self._buffer[offsets[0] : offsets[-1]]
+            return self._from_arrays(
+                self.root, buffer, offsets - offsets[0], self._sorted
+            )
+
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("FileList index out of range")
+        return self._prefix + os.fsdecode(self._get_bytes(index))
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over filenames."""
+        data = self._buffer.tobytes()
+        offsets = self._offsets.tolist()
+        prefix = self._prefix
+        for start, end in pairwise(offsets):
+            yield prefix + os.fsdecode(data[start:end])
+
+    def _bisect(self, encoded: bytes) -> int:
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._get_bytes(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __contains__(self, filename: object) -> bool:
+        """Return True if the filename is in the list.
+
+        Use a binary search if the list is sorted.
+        """
+        if not isinstance(filename, str):
+            return False
+        encoded = self._encode(filename)
+        if encoded is None:
+            return False
+        if self._sorted:
+            i = self._bisect(encoded)
+            return i < len(self) and self._get_bytes(i) == encoded
+        return any(self._get_bytes(i) == encoded for i in range(len(self)))
+
+    def index(self, filename: Any, start: int = 0, stop: int | None = None) -> int:
+        """Return the first index of a filename."""
+        if self._sorted and start == 0 and stop is None and isinstance(filename, str):
+            encoded = self._encode(filename)
+            if encoded is not None:
+                i = self._bisect(encoded)
+                if i < len(self) and self._get_bytes(i) == encoded:
+                    return i
+            raise ValueError(f"'{filename}' is not in FileList")
+        return super().index(filename, start, len(self) if stop is None else stop)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare filenames with another FileList or a list/tuple."""
+        if isinstance(other, FileList | list | tuple):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other, strict=True)
+            )
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        """Return a short description."""
+        return f"<FileList: {len(self)} files in '{self.root}'>"
+
+    def insert(self, index: int, filename: str) -> None:
+        """Insert a filename before index. Copy the buffer."""
+        encoded = self._encode(filename)
+        if encoded is None:
+            raise ValueError(
+                f"File '{filename}' is not in root directory '{self.root}'."
+            )
+        n = len(self)
+        index = min(max(index + n if index < 0 else index, 0), n)
+        if self._sorted and (
+            (index > 0 and self._get_bytes(index - 1) > encoded)
+            or (index < n and self._get_bytes(index) < encoded)
+        ):
+            self._sorted = False
+
+        pos = self._offsets[index]
+        self._buffer = np.concatenate(
+            [
+                self._buffer[:pos],
+                np.frombuffer(encoded, dtype=np.uint8),
+                self._buffer[pos:],
+            ]
+        )
+        self._offsets = np.concatenate(
+            [
+                self._offsets[: index + 1],
+                self._offsets[index:] + len(encoded),
+            ]
+        )
+
+    def __delitem__(self, index: int | slice) -> None:
+        """Remove a filename, or a slice of filenames. Copy the buffer."""
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                for i in sorted(range(start, stop, step), reverse=True):
+                    del self[i]
+                return
+            stop = max(start, stop)
+        else:
+            n = len(self)
+            start = index + n if index < 0 else index
+            if not 0 <= start < n:
+                raise IndexError("FileList index out of range")
+            stop = start + 1
+
+        begin, end = self._offsets[start], self._offsets[stop]
+        self._buffer = np.concatenate([self._buffer[:begin], self._buffer[end:]])
+        self._offsets = np.concatenate(
+            [self._offsets[:start], self._offsets[stop:] - (end - begin)]
+        )
+
+    @overload
+    def __setitem__(self, index: int, value: str) -> None: ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[str]) -> None: ...
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        """Replace a filename. Copy the buffer."""
+        if isinstance(index, slice):
+            raise TypeError("FileList does not support slice assignment.")
+        if index < 0:
+            index += len(self)
+        del self[index]
+        self.insert(index, value)
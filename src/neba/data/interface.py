@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
+import asyncio
 import copy
 import logging
-from collections.abc import Callable, Mapping, Sequence
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Mapping, Sequence
 from typing import Any, Generic, Literal, Self
 
 from traitlets import Bunch
@@ -12,9 +14,11 @@ from traitlets import Bunch
 from neba.config.section import Section
 
 from .loader import LoaderAbstract
-from .module import CachedModule, Module
+from .memory import MemoryMonitor
+from .module import CachedModule, CacheStats, Module, ModuleMix
 from .params import ParametersAbstract
-from .source import SourceAbstract
+from .profiling import Profiler
+from .source import CachedMultiFileSource, FileFollower, SourceAbstract
 from .types import T_Data, T_Params, T_Source
 from .writer import WriterAbstract
 
@@ -70,9 +74,25 @@ class DataInterface(Generic[T_Params, T_Source, T_Data]):
     number of keyword arguments.
     """
 
+    profiler: Profiler
+    """Time operations of the interface and its modules.
+
+    Attach sinks to it to receive timings (see :mod:`neba.data.profiling`).
+    """
+
+    repr_cache_stats: bool = False
+    """If True, show statistics of cached entries in the interface repr."""
+
+    memory_monitor: MemoryMonitor | None = None
+    """Record memory used when loading and writing data, if not None.
+
+    Can be set on an interface class to account for all its instances.
+    """
+
     def __init__(self, params: Any | None = None, **kwargs: Any) -> None:
         self._modules = {}
         self._reset_callbacks = {}
+        self.profiler = Profiler()
 
         # Instantiate modules
         for instance_attr, type_attr in self._modules_attributes.items():
@@ -113,8 +133,28 @@ class DataInterface(Generic[T_Params, T_Source, T_Data]):
         s = [self.__str__()]
         for mod in self._modules.values():
             s += mod._lines()
+        if self.repr_cache_stats:
+            s.append("Cache statistics:")
+            for name, stats in self.cache_stats().items():
+                s += [f"\t{name}.{key}: {st!r}" for key, st in stats.items()]
         return "\n".join(s)
 
+    def cache_stats(self) -> dict[str, dict[str, CacheStats]]:
+        """Return statistics of autocached entries of each cached module.
+
+        Modules are referred by their attribute name (``source`` for instance). Base
+        modules of a :class:`.ModuleMix` are referred as ``{mix}.{base class name}``.
+        """
+        stats = {}
+        for name, mod in self._modules.items():
+            if isinstance(mod, CachedModule):
+                stats[name] = mod.get_cache_stats()
+            if isinstance(mod, ModuleMix):
+                for base_name, base in mod.base_modules.items():
+                    if isinstance(base, CachedModule):
+                        stats[f"{name}.{base_name}"] = base.get_cache_stats()
+        return stats
+
     def save_excursion(self, save_cache: bool = False) -> _ParamsContext:
         """Save and restore current parameters after a with block.
 
@@ -184,21 +224,96 @@ class DataInterface(Generic[T_Params, T_Source, T_Data]):
 
         Wraps around ``source.get_source()``.
         """
-        return self.source.get_source(*args, **kwargs)
+        with self.profiler.span("get_source"):
+            return self.source.get_source(*args, **kwargs)
 
     def get_data(self, *args: Any, **kwargs: Any) -> T_Data:
         """Return data object.
 
         Wraps around ``loader.get_data()``.
         """
-        return self.loader.get_data(*args, **kwargs)
+        with self.profiler.span("get_data"):
+            return self.loader.get_data(*args, **kwargs)
+
+    def _get_follower(self, window: float | None) -> FileFollower:
+        if not isinstance(self.source, CachedMultiFileSource):
+            raise TypeError(
+                f"Cannot follow new files of {type(self.source)}, "
+                "source must be a CachedMultiFileSource."
+            )
+        return FileFollower(self.source, window=window)
+
+    def _load_batch(self, batch: list[str], window: float | None, **kwargs: Any) -> Any:
+        return self.get_data(source=batch if window is not None else batch[0], **kwargs)
+
+    def follow(
+        self,
+        interval: float = 1.0,
+        window: float | None = None,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> Iterator[T_Data]:
+        """Yield data of new files as they appear.
+
+        The source must be a :class:`.CachedMultiFileSource`. New files are found
+        with its watcher (see :meth:`.CachedMultiFileSource.follow`), files present
+        when starting are ignored.
+
+        Parameters
+        ----------
+        interval
+            Time between two checks for new files, in seconds.
+        window
+            If None, the data of each new file is yielded on its own. Otherwise, new
+            files are loaded together in batches: a batch is loaded `window` seconds
+            after its first file appeared.
+        timeout
+            If not None, stop if no new file appeared for this many seconds.
+        kwargs
+            Passed to :meth:`get_data`.
+        """
+        follower = self._get_follower(window)
+        while True:
+            for batch in follower.poll():
+                yield self._load_batch(batch, window, **kwargs)
+            if follower.idle(timeout):
+                for batch in follower.flush():
+                    yield self._load_batch(batch, window, **kwargs)
+                return
+            time.sleep(interval)
+
+    async def afollow(
+        self,
+        interval: float = 1.0,
+        window: float | None = None,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[T_Data]:
+        """Yield data of new files as they appear, asynchronously.
+
+        Same as :meth:`follow`, but the source is scanned and polled, and data is
+        loaded, in a separate thread: the event loop is free while waiting for new
+        files.
+        """
+        follower = await asyncio.to_thread(self._get_follower, window)
+        while True:
+            batches = await asyncio.to_thread(follower.poll)
+            idle = follower.idle(timeout)
+            if idle:
+                batches += follower.flush()
+            for batch in batches:
+                yield await asyncio.to_thread(self._load_batch, batch, window, **kwargs)
+            if idle:
+                return
+            await asyncio.sleep(interval)
 
     def write(self, *args: Any, **kwargs: Any) -> Any:
         """Write data to target.
 
         Wraps around ``writer.write()``.
         """
-        return self.writer.write(*args, **kwargs)
+        with self.profiler.span("write"):
+            return self.writer.write(*args, **kwargs)
 
     def get_data_sets(
         self,
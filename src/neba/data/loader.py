@@ -43,21 +43,33 @@ class LoaderAbstract(Generic[T_Source_contra, T_Data], Module):
         kwargs:
             Arguments passed to the postprocessing function.
         """
-        if source is None:
-            source = self.di.get_source()
-
-        if load_kwargs is None:
-            load_kwargs = {}
-        data = self.load_data_concrete(source, **load_kwargs)
+        with self.measure_memory("get_data") as record:
+            if source is None:
+                source = self.di.get_source()
+
+            if load_kwargs is None:
+                load_kwargs = {}
+            with self.span("load"):
+                data = self.load_data_concrete(source, **load_kwargs)
+
+            if not ignore_postprocess:
+                try:
+                    with self.span("postprocess"):
+                        data = self.postprocess(data, **kwargs)
+                except NotImplementedError:
+                    pass
+
+            if record is not None:
+                record.nbytes = self.estimate_nbytes(data)
+        return data
 
-        if ignore_postprocess:
-            return data
+    def estimate_nbytes(self, data: T_Data) -> int | None:
+        """Return the size of data in memory, or None if it cannot be estimated.
 
-        try:
-            data = self.postprocess(data, **kwargs)
-        except NotImplementedError:
-            pass
-        return data
+        By default, use the ``nbytes`` attribute of data (present for Numpy arrays
+        and Xarray objects) if there is one.
+        """
+        return getattr(data, "nbytes", None)
 
     def postprocess(self, data: T_Data) -> T_Data:
         """Run operation after loading data.
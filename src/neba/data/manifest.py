@@ -0,0 +1,303 @@
+"""Keep track of written targets in sidecar manifests."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from os import path
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+def stat_target(target: str | os.PathLike) -> tuple[int, float]:
+    """Return size and modification time of a target.
+
+    Targets can be files or directories (like Zarr stores). For directories, the
+    total size of all files inside it and their most recent modification time are
+    returned.
+    """
+    if not path.isdir(target):
+        stat = os.stat(target)
+        return stat.st_size, stat.st_mtime
+
+    size = 0
+    mtime = os.stat(target).st_mtime
+    for dirpath, _, filenames in os.walk(os.fspath(target)):
+        for f in filenames:
+            stat = os.stat(path.join(dirpath, f))
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+def _get_hasher(algorithm: str) -> Callable[[], Any]:
+    """Return constructor of hash object."""
+    if algorithm.startswith("xxh"):
+        import xxhash
+
+        return getattr(xxhash, algorithm)
+    return getattr(hashlib, algorithm)
+
+
+def hash_target(
+    target: str | os.PathLike, algorithm: str = "blake2b", blocksize: int = 2**20
+) -> str:
+    """Return hash of the content of a target.
+
+    For directories (like Zarr stores), the hash is computed over the relative path
+    and content of all files inside it, in sorted order.
+
+    Parameters
+    ----------
+    algorithm
+        Name of a hash algorithm from :mod:`hashlib`, or from the :mod:`xxhash`
+        package if it starts with "xxh" (for instance "xxh3_64").
+    blocksize
+        Size of blocks read at once.
+
+    Returns
+    -------
+    Hexadecimal digest prefixed by the algorithm name (``algorithm:digest``).
+    """
+    hasher = _get_hasher(algorithm)()
+    target = os.fspath(target)
+
+    if path.isdir(target):
+        files = sorted(
+            path.relpath(path.join(dirpath, f), target)
+            for dirpath, _, filenames in os.walk(target)
+            for f in filenames
+        )
+    else:
+        files = [""]
+
+    for f in files:
+        if f:
+            hasher.update(f.encode())
+        with open(path.join(target, f) if f else target, "rb") as fp:
+            while block := fp.read(blocksize):
+                hasher.update(block)
+
+    return f"{algorithm}:{hasher.hexdigest()}"
+
+
+def remove_target(target: str | os.PathLike) -> None:
+    """Remove a file or a directory (like Zarr stores)."""
+    if path.isdir(target):
+        shutil.rmtree(target)
+    elif path.lexists(target):
+        os.remove(target)
+
+
+class WriteManifest:
+    """Records of written targets.
+
+    Each directory containing targets has a sidecar manifest file (named
+    :attr:`filename`). It is a JSON-lines file where each line is the record of a
+    target: its name (relative to the directory), status, fingerprint, size and
+    modification time. Records are only appended, the last record of a target takes
+    precedence. Manifests are loaded lazily when a target of their directory is
+    first accessed.
+
+    Before a target is written it is marked as "pending", and as "done" once the
+    writing call completes. A target that is still pending when the manifest is
+    read again was not written completely.
+
+    If `checksum` is True, the hash of each finished target is recorded as well. It
+    is computed in a pool of threads right after the target is written, while it is
+    likely still in the page cache. Call :meth:`wait` (or :meth:`compact`) to make
+    sure all hashes are recorded. Targets can be checked again with :meth:`verify`.
+
+    Parameters
+    ----------
+    checksum
+        If True, record the hash of finished targets.
+    """
+
+    filename: str = ".neba_manifest.jsonl"
+    """Name of the manifest file in each directory."""
+
+    hash_algorithm: str = "blake2b"
+    """Algorithm used to hash targets. See :func:`hash_target`."""
+
+    max_workers: int = 4
+    """Maximum number of threads hashing targets."""
+
+    def __init__(self, checksum: bool = False) -> None:
+        self.checksum = checksum
+        self._records: dict[str, dict[str, dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._hashing: list[Future] = []
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Pool of threads used for hashing."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor
+
+    def _split(self, target: str | os.PathLike) -> tuple[str, str]:
+        directory, name = path.split(path.abspath(target))
+        return directory, name
+
+    def _load(self, directory: str) -> dict[str, dict[str, Any]]:
+        if directory in self._records:
+            return self._records[directory]
+
+        records: dict[str, dict[str, Any]] = {}
+        manifest = path.join(directory, self.filename)
+        if path.isfile(manifest):
+            with open(manifest) as fp:
+                for line in fp:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # interrupted while appending a record
+                        continue
+                    records[record.pop("name")] = record
+            log.debug("Loaded %d records from %s", len(records), manifest)
+
+        self._records[directory] = records
+        return records
+
+    def _append(self, target: str | os.PathLike, **record: Any) -> None:
+        directory, name = self._split(target)
+        with self._lock:
+            self._load(directory)[name] = record
+            with open(path.join(directory, self.filename), "a") as fp:
+                fp.write(json.dumps(dict(name=name, **record)) + "\n")
+
+    def get(self, target: str | os.PathLike) -> dict[str, Any] | None:
+        """Return the last record for this target, or None if there is none."""
+        directory, name = self._split(target)
+        with self._lock:
+            return self._load(directory).get(name, None)
+
+    def is_up_to_date(self, target: str | os.PathLike, fingerprint: str) -> bool:
+        """Return True if the target was completely written with this fingerprint.
+
+        The target must also still exist with the same size and modification time.
+        """
+        record = self.get(target)
+        if (
+            record is None
+            or record["status"] != "done"
+            or record["fingerprint"] != fingerprint
+            or not path.exists(target)
+        ):
+            return False
+        return list(stat_target(target)) == [record["size"], record["mtime"]]
+
+    def start(self, target: str | os.PathLike, fingerprint: str) -> None:
+        """Mark target as pending, remove any previous (possibly partial) version."""
+        if path.exists(target):
+            log.debug("Removing outdated or partial target %s", target)
+            remove_target(target)
+        self._append(target, status="pending", fingerprint=fingerprint)
+
+    def finish(self, target: str | os.PathLike, fingerprint: str | None) -> None:
+        """Mark target as completely written.
+
+        If :attr:`checksum` is True, the target is hashed in the background and the
+        record is only added once that is done.
+        """
+        size, mtime = stat_target(target)
+        record = dict(status="done", fingerprint=fingerprint, size=size, mtime=mtime)
+        if not self.checksum:
+            self._append(target, **record)
+            return
+
+        def add_hash() -> None:
+            digest = hash_target(target, self.hash_algorithm)
+            self._append(target, **record, hash=digest)
+
+        self._hashing.append(self.executor.submit(add_hash))
+
+    def wait(self) -> None:
+        """Wait for all hashes to be recorded, raise the first error if any."""
+        done, _ = wait(self._hashing)
+        self._hashing = []
+        for future in done:
+            future.result()
+
+    def verify(self, directory: str | os.PathLike | None = None) -> dict[str, str]:
+        """Check that finished targets still match their records.
+
+        Targets are checked concurrently. Their size must be unchanged, and their hash
+        if it was recorded (their modification time otherwise).
+
+        Parameters
+        ----------
+        directory
+            Directory whose manifest to check. If None, check all manifests loaded so
+            far.
+
+        Returns
+        -------
+        Mapping of targets that do not match to the reason: "missing", "size",
+        "mtime" or "hash".
+        """
+        self.wait()
+        if directory is not None:
+            directories = [path.abspath(directory)]
+        else:
+            directories = list(self._records)
+
+        items = []
+        with self._lock:
+            for d in directories:
+                for name, record in self._load(d).items():
+                    if record["status"] == "done":
+                        items.append((path.join(d, name), record))
+
+        def check(item: tuple[str, dict[str, Any]]) -> str | None:
+            target, record = item
+            if not path.exists(target):
+                return "missing"
+            size, mtime = stat_target(target)
+            if size != record["size"]:
+                return "size"
+            if (digest := record.get("hash", None)) is None:
+                return None if mtime == record["mtime"] else "mtime"
+            algorithm = digest.split(":", 1)[0]
+            if hash_target(target, algorithm) != digest:
+                return "hash"
+            return None
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            results = list(executor.map(check, items))
+
+        problems = {
+            target: reason
+            for (target, _), reason in zip(items, results)
+            if reason is not None
+        }
+        if problems:
+            log.warning("%d targets do not match the manifest.", len(problems))
+        return problems
+
+    def compact(self) -> None:
+        """Rewrite manifests files with only the last record of each target.
+
+        Wait for hashes to be recorded beforehand.
+        """
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        with self._lock:
+            for directory, records in self._records.items():
+                manifest = path.join(directory, self.filename)
+                tmp = manifest + ".tmp"
+                with open(tmp, "w") as fp:
+                    for name, record in records.items():
+                        fp.write(json.dumps(dict(name=name, **record)) + "\n")
+                os.replace(tmp, manifest)
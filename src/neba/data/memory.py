@@ -0,0 +1,248 @@
+"""Memory accounting of loading and writing operations.
+
+Attach a :class:`MemoryMonitor` to an interface (or to an interface class to
+account for all its instances)::
+
+    monitor = MemoryMonitor()
+    MyInterface.memory_monitor = monitor
+    ...
+    print(monitor.report())
+
+Each call to :meth:`.LoaderAbstract.get_data` and each call sent by
+:meth:`.WriterAbstract.send_calls` is then recorded with the memory used, and the
+estimated size of the data loaded or written.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Literal
+
+from neba.utils import format_nbytes, get_classname
+
+if TYPE_CHECKING:
+    from .interface import DataInterface
+
+log = logging.getLogger(__name__)
+
+_PROC_STATUS = "/proc/self/status"
+
+
+def get_rss() -> int | None:
+    """Return the resident set size of this process in bytes.
+
+    Read from ``/proc/self/status``. Returns None if it is not available (on
+    non-Linux platforms for instance).
+    """
+    try:
+        with open(_PROC_STATUS, "rb") as fp:
+            for line in fp:
+                if line.startswith(b"VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemoryRecord:
+    """Memory used by one operation.
+
+    Memory is the resident set size of the process if the monitor uses ``"rss"``, or
+    the memory allocated by Python if it uses ``"tracemalloc"``.
+    """
+
+    __slots__ = (
+        "interface",
+        "operation",
+        "attrs",
+        "start",
+        "end",
+        "peak",
+        "nbytes",
+        "duration",
+    )
+
+    def __init__(self, interface: str, operation: str, attrs: dict[str, Any]) -> None:
+        self.interface = interface
+        """Name of the interface class."""
+        self.operation = operation
+        """Name of the operation ("get_data" or "write_call")."""
+        self.attrs = attrs
+        """Additional information on the operation."""
+        self.start: int = 0
+        """Memory at the start of the operation."""
+        self.end: int = 0
+        """Memory at the end of the operation."""
+        self.peak: int = 0
+        """Maximum of memory during the operation."""
+        self.nbytes: int | None = None
+        """Estimated size of data loaded or written."""
+        self.duration: float = 0.0
+        """Duration in seconds."""
+
+    @property
+    def delta(self) -> int:
+        """Memory difference between the end and start of the operation."""
+        return self.end - self.start
+
+    @property
+    def peak_delta(self) -> int:
+        """Peak memory above the start of the operation."""
+        return self.peak - self.start
+
+    def __str__(self) -> str:
+        """Return a one line summary."""
+        sign = "-" if self.delta < 0 else "+"
+        nbytes = "?" if self.nbytes is None else format_nbytes(self.nbytes)
+        return (
+            f"{self.interface}.{self.operation}: "
+            f"{sign}{format_nbytes(abs(self.delta))} "
+            f"(peak +{format_nbytes(max(self.peak_delta, 0))}), data {nbytes}"
+        )
+
+
+class _Sampler(threading.Thread):
+    """Poll the RSS in the background and keep the maximum."""
+
+    def __init__(self, interval: float, start: int) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = start
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            rss = get_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+class MemoryMonitor:
+    """Record memory used by interfaces operations.
+
+    Records are kept in :attr:`records`, and aggregated by interface class with
+    :meth:`summary`.
+
+    Parameters
+    ----------
+    method
+        If "rss", measure the resident set size of the process, from
+        ``/proc/self/status`` (Linux only). The peak is obtained by polling every
+        :attr:`interval` seconds in a background thread, so short peaks might be
+        missed. If "tracemalloc", measure memory allocated by Python (including
+        Numpy arrays) with :mod:`tracemalloc`, which is started if necessary. This
+        is precise but slows down allocations significantly. The peak is shared by
+        all threads.
+    """
+
+    interval: float = 0.01
+    """Interval between RSS samples, in seconds."""
+
+    def __init__(self, method: Literal["rss", "tracemalloc"] = "rss") -> None:
+        if method not in ["rss", "tracemalloc"]:
+            raise ValueError(f"Unknown method '{method}'.")
+        if method == "rss" and get_rss() is None:
+            raise OSError(f"Cannot read RSS from {_PROC_STATUS}.")
+        self.method = method
+        self.records: list[MemoryRecord] = []
+        self._local = threading.local()
+
+    def _get_memory(self) -> int:
+        if self.method == "rss":
+            return get_rss() or 0
+        return tracemalloc.get_traced_memory()[0]
+
+    @contextmanager
+    def measure(
+        self, di: DataInterface, operation: str, **attrs: Any
+    ) -> Iterator[MemoryRecord]:
+        """Record memory used in a with block.
+
+        The record is yielded so that its :attr:`~MemoryRecord.nbytes` can be set.
+        """
+        record = MemoryRecord(get_classname(di, module=False), operation, attrs)
+
+        sampler = None
+        if self.method == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # A nested measure resets the peak, it reports its own to its parent
+            stack = self._local.__dict__.setdefault("stack", [])
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+            stack.append(record)
+            tracemalloc.reset_peak()
+
+        record.start = self._get_memory()
+        if self.method == "rss":
+            sampler = _Sampler(self.interval, record.start)
+            sampler.start()
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.duration = time.perf_counter() - start
+            record.end = self._get_memory()
+            if sampler is not None:
+                record.peak = max(sampler.stop(), record.end)
+            else:
+                record.peak = max(
+                    record.peak, tracemalloc.get_traced_memory()[1], record.end
+                )
+                stack.pop()
+                if stack:
+                    stack[-1].peak = max(stack[-1].peak, record.peak)
+
+            self.records.append(record)
+            log.debug("%s", record)
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Aggregate records by interface class.
+
+        Returns
+        -------
+        summary
+            For each interface class name: the number of calls, the total and maximum
+            of memory deltas, the maximum peak above start, and the total of data
+            sizes (of known sizes).
+        """
+        summary: dict[str, dict[str, Any]] = {}
+        for rec in self.records:
+            agg = summary.setdefault(
+                rec.interface,
+                dict(calls=0, total_delta=0, max_delta=0, max_peak=0, total_nbytes=0),
+            )
+            agg["calls"] += 1
+            agg["total_delta"] += rec.delta
+            agg["max_delta"] = max(agg["max_delta"], rec.delta)
+            agg["max_peak"] = max(agg["max_peak"], rec.peak_delta)
+            if rec.nbytes is not None:
+                agg["total_nbytes"] += rec.nbytes
+        return summary
+
+    def report(self) -> str:
+        """Return a human readable summary by interface class."""
+        lines = []
+        for name, agg in self.summary().items():
+            lines.append(
+                f"{name}: {agg['calls']} calls, "
+                f"max peak +{format_nbytes(agg['max_peak'])}, "
+                f"max delta {format_nbytes(agg['max_delta'])}, "
+                f"data {format_nbytes(agg['total_nbytes'])}"
+            )
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        """Remove all records."""
+        self.records = []
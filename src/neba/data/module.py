@@ -3,16 +3,25 @@
 from __future__ import annotations
 
 import functools
+import hashlib
 import inspect
+import json
 import logging
-from collections.abc import Callable, Sequence
-from typing import TYPE_CHECKING, Any, Generic, Literal, TypeVar, overload
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Sequence
+from contextlib import AbstractContextManager, nullcontext
+from typing import TYPE_CHECKING, Any, Generic, Literal, TypeVar, cast, overload
 
 from neba.utils import get_classname
 
 if TYPE_CHECKING:
     from .interface import DataInterface
+    from .memory import MemoryRecord
     from .params import ParametersAbstract
+    from .profiling import _NullSpan, _SpanContext
 
 log = logging.getLogger(__name__)
 
@@ -48,16 +57,115 @@ class Module:
         """Initialize module."""
         pass
 
+    def span(self, name: str, **attrs: Any) -> _SpanContext | _NullSpan:
+        """Time an operation in a with block.
+
+        Wraps around the :attr:`~.DataInterface.profiler` of the parent interface.
+        """
+        return self.di.profiler.span(name, **attrs)
+
+    def measure_memory(
+        self, operation: str, **attrs: Any
+    ) -> AbstractContextManager[MemoryRecord | None]:
+        """Record memory used in a with block.
+
+        Uses the :attr:`~.DataInterface.memory_monitor` of the parent interface. If
+        there is none, does nothing and yields None.
+        """
+        monitor = self.di.memory_monitor
+        if monitor is None:
+            return nullcontext()
+        return monitor.measure(self.di, operation, **attrs)
+
+
+class CacheStats:
+    """Statistics of an autocached entry."""
+
+    __slots__ = ("hits", "misses", "invalidations", "time")
+
+    def __init__(self) -> None:
+        self.hits: int = 0
+        """Number of times the cached value was returned."""
+        self.misses: int = 0
+        """Number of times the value was computed."""
+        self.invalidations: int = 0
+        """Number of times the value was removed from the cache."""
+        self.time: float = 0.0
+        """Total time spent computing the value, in seconds."""
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of accesses that returned the cached value."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return statistics as a dictionary."""
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses ({self.time:.3f}s), "
+            f"{self.invalidations} invalidations"
+        )
+
+
+def _fingerprint_default(o: Any) -> Any:
+    """Serialize objects in a reproducible manner."""
+    if isinstance(o, set | frozenset):
+        return sorted(o, key=repr)
+    return repr(o)
+
+
+class SharedCache(dict):
+    """Cache that can be shared between modules.
+
+    Unlike a plain dictionary, it can be weakly referenced.
+    """
+
+
+_shared_caches: weakref.WeakValueDictionary[Hashable, SharedCache] = (
+    weakref.WeakValueDictionary()
+)
+"""Registry of caches shared by modules, by key."""
+_shared_caches_lock = threading.Lock()
+
+
+def get_shared_cache(key: Hashable) -> SharedCache:
+    """Return the shared cache for this key, creating it if necessary.
+
+    Caches are only kept in the registry as long as a module uses them.
+    """
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = SharedCache()
+    return cache
+
 
 class CachedModule(Module):
     """Module containing a cache.
 
     The cache is voided on a call of :meth:`.DataInterface.trigger_callbacks`. This is
     typically done everytime the parameters change.
+
+    Accesses to :func:`autocached` entries are counted in :attr:`cache_stats`.
     """
 
     _add_void_callback = True
 
+    shared_cache: bool = False
+    """If True, share the cache with other instances of the same class and parameters.
+
+    The cache is taken from a process-wide registry, with the key given by
+    :meth:`get_cache_key`. It is freed when no module uses it anymore. Cached values
+    must only depend on the module class and the interface parameters, and should
+    not be modified in place.
+    """
+
+    cache_stats: dict[str, CacheStats]
+    """Statistics of each autocached entry."""
+
     def setup(self) -> None:
         """Set up cache.
 
@@ -66,6 +174,9 @@ class CachedModule(Module):
         cls_name = get_classname(self)
         log.debug("Setting up cache for %s", cls_name)
         self.cache: dict[str, Any] = {}
+        self.cache_stats = {}
+        if self._is_cache_shared():
+            self.cache = get_shared_cache(self.get_cache_key())
 
         def callback(di: DataInterface, **kwargs: Any) -> None:
             self.void_cache()
@@ -75,18 +186,58 @@ class CachedModule(Module):
             self.di.register_callback(key, callback)
 
     def void_cache(self) -> None:
-        """Clear the cache."""
-        self.cache.clear()
+        """Clear the cache.
+
+        If the cache is shared, it is not cleared (other modules might use it), but
+        replaced by the shared cache corresponding to the current parameters.
+        """
+        for key in self.cache:
+            if key in self.cache_stats:
+                self.cache_stats[key].invalidations += 1
+        if self._is_cache_shared():
+            self.cache = get_shared_cache(self.get_cache_key())
+        elif isinstance(self.cache, SharedCache):
+            # stop sharing, do not clear the cache of other modules
+            self.cache = {}
+        else:
+            self.cache.clear()
+
+    def _is_cache_shared(self) -> bool:
+        """Return True if the cache should be shared. By default, :attr:`shared_cache`."""
+        return self.shared_cache
+
+    def get_cache_key(self) -> Hashable:
+        """Return the key of the shared cache.
+
+        Made of the module class and a hash of the interface parameters.
+        """
+        try:
+            params = dict(self.parameters.direct)
+        except (AttributeError, TypeError):
+            params = {}
+        serialized = json.dumps(params, sort_keys=True, default=_fingerprint_default)
+        return (type(self), hashlib.sha256(serialized.encode()).hexdigest())
+
+    def get_cache_stats(self) -> dict[str, CacheStats]:
+        """Return statistics of each autocached entry."""
+        return dict(self.cache_stats)
+
+
+# Typevar to preserve autocached methods' type.
+F = TypeVar("F", bound=Callable[..., Any])
+
 
+@overload
+def autocached(func: F, /) -> F: ...
 
-# Typevar to preserve autocached properties' type.
-R = TypeVar("R")
-T_CachedMod = TypeVar("T_CachedMod", bound=CachedModule)
+
+@overload
+def autocached(*, maxsize: int | None = 128) -> Callable[[F], F]: ...
 
 
 def autocached(
-    func: Callable[[T_CachedMod], R],
-) -> Callable[[T_CachedMod], R]:
+    func: F | None = None, /, *, maxsize: int | None = 128
+) -> F | Callable[[F], F]:
     """Make a method autocached.
 
     When the method is accessed, it will first check if a key with the same name (as
@@ -97,23 +248,83 @@ def autocached(
     There is no check on the module containing a cache. If not it will raise an
     AttributeError on accessing the method.
 
+    Hits, misses and computing time are counted in
+    :attr:`CachedModule.cache_stats`.
+
     This also works for properties. Make sure you autocache the method first::
 
         @property
         @autocached
         def my_property(self): ...
+
+    Methods with arguments are also supported. Results are then stored for each set
+    of arguments (which must be hashable, otherwise the result is not cached) in a
+    dictionary in the cache. The least recently used results are discarded past
+    `maxsize` results (or never if None)::
+
+        @autocached(maxsize=16)
+        def my_method(self, a, b=0): ...
     """
-    property_name = func.__name__
+    if func is None:
+        return functools.partial(_autocached, maxsize=maxsize)
+    return _autocached(func, maxsize)
+
+
+def _autocached(func: F, maxsize: int | None) -> F:
+    name = func.__name__
+    signature = inspect.signature(func)
+
+    def get_stats(self: CachedModule) -> CacheStats:
+        stats = self.cache_stats.get(name)
+        if stats is None:
+            stats = self.cache_stats[name] = CacheStats()
+        return stats
+
+    if len(signature.parameters) <= 1:
+
+        @functools.wraps(func)
+        def wrap(self: CachedModule) -> Any:
+            stats = get_stats(self)
+            if name in self.cache:
+                stats.hits += 1
+                return self.cache[name]
+            start = time.perf_counter()
+            result = func(self)
+            stats.time += time.perf_counter() - start
+            stats.misses += 1
+            self.cache[name] = result
+            return result
+
+        return cast(F, wrap)
 
     @functools.wraps(func)
-    def wrap(self: T_CachedMod) -> R:
-        if property_name in self.cache:
-            return self.cache[property_name]
-        result = func(self)
-        self.cache[property_name] = result
+    def wrap_args(self: CachedModule, *args: Any, **kwargs: Any) -> Any:
+        # normalize arguments so that defaults are part of the key
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (bound.args[1:], tuple(sorted(bound.kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(self, *args, **kwargs)
+
+        stats = get_stats(self)
+        results: OrderedDict = self.cache.setdefault(name, OrderedDict())
+        if key in results:
+            stats.hits += 1
+            results.move_to_end(key)
+            return results[key]
+
+        start = time.perf_counter()
+        result = func(self, *args, **kwargs)
+        stats.time += time.perf_counter() - start
+        stats.misses += 1
+        results[key] = result
+        if maxsize is not None and len(results) > maxsize:
+            results.popitem(last=False)
         return result
 
-    return wrap
+    return cast(F, wrap_args)
 
 
 T_Mod = TypeVar("T_Mod", bound=Module)
@@ -0,0 +1,272 @@
+"""Timing of operations of an interface.
+
+Operations of the interface and its modules (scanning for source files, loading,
+post-processing, splitting, writing each call, etc.) are wrapped in nested *spans*.
+Finished spans are sent to the sinks attached to the :class:`Profiler` of the
+interface::
+
+    di.profiler.add_sink(LoggingSink())
+    di.profiler.add_sink(ChromeTraceSink("trace.json"))
+    di.get_data()
+    di.profiler.close()
+
+When no sink is attached, spans are not created at all.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+class Span:
+    """Timing of one operation.
+
+    Parameters
+    ----------
+    name
+        Name of the operation.
+    attrs
+        Additional information on the operation.
+    parent
+        Span that was running when this one started (in the same thread), if any.
+    """
+
+    __slots__ = ("name", "attrs", "parent", "depth", "path", "thread", "start", "end")
+
+    def __init__(
+        self, name: str, attrs: dict[str, Any], parent: Span | None = None
+    ) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.depth: int = 0 if parent is None else parent.depth + 1
+        self.path: str = name if parent is None else f"{parent.path}/{name}"
+        """Names of the span and its parents, separated by slashes."""
+        self.thread: int = threading.get_ident()
+        self.start: float = 0.0
+        """Start time in seconds (from :func:`time.perf_counter`)."""
+        self.end: float = 0.0
+        """End time in seconds (from :func:`time.perf_counter`)."""
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return self.end - self.start
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a serializable description of the span."""
+        return dict(
+            name=self.name,
+            path=self.path,
+            depth=self.depth,
+            thread=self.thread,
+            start=self.start,
+            duration=self.duration,
+            attrs=self.attrs,
+        )
+
+
+class SpanSink:
+    """Receive finished spans.
+
+    Sinks may be called from multiple threads.
+    """
+
+    def emit(self, span: Span) -> None:
+        """Process a finished span.
+
+        :Not implemented: implement in a subclass.
+        """
+        raise NotImplementedError("Implement in a subclass.")
+
+    def close(self) -> None:
+        """Flush and release resources."""
+        pass
+
+
+class LoggingSink(SpanSink):
+    """Log spans, indented by depth.
+
+    Parameters
+    ----------
+    logger
+        Logger to use. By default, the logger of this module.
+    level
+        Logging level. Default is DEBUG.
+    """
+
+    def __init__(
+        self, logger: logging.Logger | None = None, level: int = logging.DEBUG
+    ) -> None:
+        self.logger = log if logger is None else logger
+        self.level = level
+
+    def emit(self, span: Span) -> None:
+        """Log the span."""
+        attrs = " ".join(f"{k}={v}" for k, v in span.attrs.items())
+        self.logger.log(
+            self.level,
+            "%s%s: %.3fs %s",
+            "  " * span.depth,
+            span.name,
+            span.duration,
+            attrs,
+        )
+
+
+class JSONLinesSink(SpanSink):
+    """Append spans to a file, one JSON object per line.
+
+    See :meth:`Span.to_dict` for the content of each line.
+    """
+
+    def __init__(self, filename: str | os.PathLike) -> None:
+        self.filename = filename
+        self._file = open(filename, "a")
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        """Write the span to file."""
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        """Close file."""
+        self._file.close()
+
+
+class ChromeTraceSink(SpanSink):
+    """Write spans in the Chrome trace event format.
+
+    The file can be opened with ``chrome://tracing``, `Perfetto
+    <https://ui.perfetto.dev>`__ or `Speedscope <https://www.speedscope.app>`__. Spans
+    are kept in memory and written to file on :meth:`flush` or :meth:`close`.
+    """
+
+    def __init__(self, filename: str | os.PathLike) -> None:
+        self.filename = filename
+        self.events: list[dict[str, Any]] = []
+
+    def emit(self, span: Span) -> None:
+        """Add a complete event."""
+        self.events.append(
+            dict(
+                name=span.name,
+                cat="neba",
+                ph="X",
+                ts=span.start * 1e6,
+                dur=span.duration * 1e6,
+                pid=os.getpid(),
+                tid=span.thread,
+                args={k: str(v) for k, v in span.attrs.items()},
+            )
+        )
+
+    def flush(self) -> None:
+        """Write all events to file."""
+        with open(self.filename, "w") as fp:
+            json.dump(dict(traceEvents=self.events, displayTimeUnit="ms"), fp)
+
+    def close(self) -> None:
+        """Write all events to file."""
+        self.flush()
+
+
+class _NullSpan:
+    """Do nothing, returned when no sink is attached."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _SpanContext:
+    __slots__ = ("profiler", "span")
+
+    def __init__(self, profiler: Profiler, name: str, attrs: dict[str, Any]) -> None:
+        self.profiler = profiler
+        self.span = Span(name, attrs, profiler.current)
+
+    def __enter__(self) -> Span:
+        self.profiler._local.current = self.span
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type: type | None, *args: Any) -> None:
+        span = self.span
+        span.end = time.perf_counter()
+        self.profiler._local.current = span.parent
+        if exc_type is not None:
+            span.attrs["error"] = exc_type.__name__
+        self.profiler.emit(span)
+
+
+class Profiler:
+    """Create nested spans and send them to sinks.
+
+    Spans are nested within each thread: a span started in a thread is the parent of
+    those started (in the same thread) before it ends.
+    """
+
+    def __init__(self) -> None:
+        self.sinks: list[SpanSink] = []
+        self._local = threading.local()
+
+    @property
+    def current(self) -> Span | None:
+        """Span currently running in this thread."""
+        return getattr(self._local, "current", None)
+
+    def add_sink(self, sink: SpanSink) -> None:
+        """Attach a sink."""
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink: SpanSink) -> None:
+        """Detach a sink (without closing it)."""
+        self.sinks.remove(sink)
+
+    def close(self) -> None:
+        """Close and detach all sinks."""
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+
+    def span(self, name: str, **attrs: Any) -> _SpanContext | _NullSpan:
+        """Time the operation in a with block.
+
+        If no sink is attached, this returns a context manager that does nothing.
+
+        Parameters
+        ----------
+        name
+            Name of the operation.
+        attrs
+            Additional information on the operation.
+        """
+        if not self.sinks:
+            return _NULL_SPAN
+        return _SpanContext(self, name, attrs)
+
+    def emit(self, span: Span) -> None:
+        """Send finished span to all sinks."""
+        for sink in self.sinks:
+            try:
+                sink.emit(span)
+            except Exception as e:
+                log.warning("Sink %s failed to process span: %s", sink, e)
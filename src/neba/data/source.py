@@ -2,21 +2,35 @@
 
 from __future__ import annotations
 
+import bisect
+import functools
+import glob
 import itertools
 import logging
 import os
-from collections.abc import Sequence
+import re
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from os import path
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Generic, TypeVar
+from typing import TYPE_CHECKING, Any, Generic, Literal, TypeVar
 
-from .module import CachedModule, Module, ModuleMix, autocached
+from .module import CachedModule, Module, ModuleMix, SharedCache, autocached
 from .types import T_Source_co
+from .watch import Watcher, get_watcher
 
 log = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
+    import datetime
+
+    import numpy as np
     from filefinder import Finder
+    from filefinder.group import Group
+    from filefinder.matches import Matches
+
+    from .catalog import FileCatalog
 
 
 class SourceAbstract(Generic[T_Source_co], Module):
@@ -47,6 +61,98 @@ class SimpleSource(SourceAbstract[T_Source_co]):
         return [f"Source directly specified: {self.get_source()}"]
 
 
+@functools.lru_cache
+def _glob_regex(pattern: str, recursive: bool = True) -> re.Pattern[str]:
+    """Return a regular expression matching the same paths as a glob pattern."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        at_start = i == 0 or pattern[i - 1] == "/"
+        if recursive and at_start and pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if recursive and at_start and pattern[i:] == "**":
+            regex += ".*"
+            break
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            regex += "[^/]*"
+        elif c == "?":
+            regex += "[^/]"
+        elif c == "[" and (j := pattern.find("]", i + 1)) != -1:
+            content = pattern[i:j].replace("\\", "\\\\")
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            regex += f"[{content}]"
+            i = j + 1
+        else:
+            regex += re.escape(c)
+    return re.compile(regex)
+
+
+_compile_regex = functools.lru_cache(maxsize=64)(re.compile)
+"""Compile regular expressions of Finders, kept between cache generations."""
+
+
+def _in_set(value: Any, values: frozenset) -> bool:
+    return value in values
+
+
+def _in_interval(value: Any, low: Any, high: Any) -> bool:
+    return low <= value <= high
+
+
+def _match_paths(
+    regex: str, groups: list[Group], relpaths: list[str]
+) -> list[tuple[str, list[tuple[str, int, int, bool, Any]]]]:
+    """Match paths against the regex of a Finder, and parse the values of groups.
+
+    Run by workers in :meth:`FileFinderSource.scan_parallel`. For each path that
+    matches, return the matched string, start and end indices, whether it could be
+    parsed and the parsed value of each group.
+    """
+    from filefinder.matches import Matches
+
+    pattern = _compile_regex(regex)
+    out = []
+    for relpath in relpaths:
+        matches = Matches.from_filename(relpath, pattern, groups)
+        if matches is None:
+            continue
+        values = []
+        for m in matches:
+            parsed = m.can_parse()
+            values.append(
+                (
+                    m.match_str,
+                    m.start,
+                    m.end,
+                    parsed,
+                    m.match_parsed if parsed else None,
+                )
+            )
+        out.append((relpath, values))
+    return out
+
+
+def _fix_by_membership(finder: Finder, name: str, values: Any) -> None:
+    """Keep files whose value for the group is in `values`, after scanning.
+
+    If `values` are consecutive integers, the value is compared to the bounds,
+    otherwise it is looked up in a set.
+    """
+    values = frozenset(values)
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values) and (
+        max(values) - min(values) + 1 == len(values)
+    ):
+        func = functools.partial(_in_interval, low=min(values), high=max(values))
+    else:
+        func = functools.partial(_in_set, values=values)
+    finder.fix_by_filter(name, func)
+
+
 class MultiFileSource(SourceAbstract[str]):
     """Abstract class for source consisting of multiple files.
 
@@ -57,6 +163,14 @@ class MultiFileSource(SourceAbstract[str]):
     asking the source. If they are many files, caching this can make sense.
     """
 
+    compact_datafiles: bool = False
+    """If True, store the datafiles in a compact :class:`.filelist.FileList`.
+
+    The root directory is stored once and relative paths are kept in a single buffer,
+    which saves a lot of memory for large numbers of files. It behaves like a list,
+    but modifying it copies the buffer. Requires Numpy.
+    """
+
     def get_root_directory(self) -> str | os.PathLike | list[str] | list[os.PathLike]:
         """Return the directory containing all datafiles.
 
@@ -98,10 +212,37 @@ class MultiFileSource(SourceAbstract[str]):
             log.warning("No files found for %s", repr(self))
 
         if relative:
-            datafiles = [path.relpath(f, self.root_directory) for f in datafiles]
+            if self.compact_datafiles and getattr(datafiles, "root", None) == str(
+                self.root_directory
+            ):
+                # the FileList already stores relative paths
+                datafiles = datafiles.relative()  # type: ignore[attr-defined]
+            else:
+                datafiles = [path.relpath(f, self.root_directory) for f in datafiles]
 
         return datafiles
 
+    def pack_datafiles(self, files: list[str]) -> list[str]:
+        """Return files in a :class:`.filelist.FileList` if :attr:`compact_datafiles`.
+
+        Files are stored relative to the root directory if they are all in it.
+        Otherwise, or if :attr:`compact_datafiles` is False, `files` are returned as
+        is.
+        """
+        if not self.compact_datafiles:
+            return files
+        from .filelist import FileList
+
+        try:
+            root = str(self.root_directory)
+        except NotImplementedError:
+            root = ""
+        try:
+            packed = FileList(files, root)
+        except ValueError:
+            packed = FileList(files)
+        return packed  # type: ignore[return-value]
+
     @property
     def datafiles(self) -> list[str]:
         """List of source files.
@@ -111,7 +252,256 @@ class MultiFileSource(SourceAbstract[str]):
         raise NotImplementedError("Implement in a module subclass.")
 
 
-class GlobSource(MultiFileSource, CachedModule):
+class CachedMultiFileSource(MultiFileSource, CachedModule):
+    """Multiple files source with cached list of files.
+
+    The list of files (:attr:`datafiles`) is scanned once and cached until the cache
+    is voided (when parameters change). If :attr:`watch_files` is True, the root
+    directory is watched (see :mod:`neba.data.watch`) and the cached list is updated
+    with files created or deleted since, without scanning again.
+    """
+
+    watch_files: bool = False
+    """If True, update the cached datafiles with changes in the root directory.
+
+    Changes are applied by :meth:`update_datafiles`, which is called by
+    :meth:`get_source`. The cached datafiles are then modified in place, so a
+    watched source does not share its cache (:attr:`~.CachedModule.shared_cache` is
+    ignored).
+    """
+
+    watcher_kind: Literal["auto", "inotify", "poll"] = "auto"
+    """Kind of watcher to use. See :func:`.watch.get_watcher`."""
+
+    watcher: Watcher | None = None
+    """Current watcher, if any."""
+
+    def get_source(self, relative: bool = False, _warn: bool = True) -> list[str]:  # type: ignore[override]
+        """Return list of filenames.
+
+        The result is cached, a shallow copy is returned so that it can be modified
+        freely. If :attr:`watch_files` is True, changes in the root directory are
+        applied first. See :meth:`.MultiFileSource.get_source`.
+        """
+        self.update_datafiles()
+        datafiles = self._get_source(relative=relative)
+        if _warn and len(datafiles) == 0:
+            log.warning("No files found for %s", repr(self))
+        return datafiles[:]
+
+    @autocached(maxsize=2)
+    def _get_source(self, relative: bool = False) -> list[str]:
+        return super().get_source(relative=relative, _warn=False)
+
+    def get_watch_directory(self) -> str:
+        """Return the directory to watch. By default, the root directory."""
+        return str(self.root_directory)
+
+    def match_datafile(self, filename: str) -> bool:
+        """Return True if this (absolute) filename is a valid datafile.
+
+        :Not implemented: implement in a module subclass.
+        """
+        raise NotImplementedError("Implement in a module subclass.")
+
+    def start_watcher(self) -> None:
+        """Start watching for changes (stops the current watcher if any).
+
+        If the cache is shared, the source stops sharing it.
+        """
+        self.stop_watcher()
+        if isinstance(self.cache, SharedCache):
+            self.cache = {}
+        self.watcher = get_watcher(self.get_watch_directory(), kind=self.watcher_kind)
+        log.debug("Watching %s with %s", self.watcher.root, type(self.watcher))
+
+    def stop_watcher(self) -> None:
+        """Stop watching for changes."""
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+    def void_cache(self) -> None:
+        """Clear the cache and stop the watcher.
+
+        The root directory might change with the parameters.
+        """
+        super().void_cache()
+        self.stop_watcher()
+
+    def _is_cache_shared(self) -> bool:
+        return self.shared_cache and not self.watch_files
+
+    def _void_datafiles(self) -> None:
+        """Remove the cached datafiles and what depends on them, to scan again."""
+        self.cache.pop("datafiles", None)
+        self.cache.pop("_get_source", None)
+
+    def _add_datafile(self, filename: str) -> bool:
+        """Insert file in cached datafiles, return False if already present."""
+        datafiles = self.cache["datafiles"]
+        i = bisect.bisect_left(datafiles, filename)
+        if i < len(datafiles) and datafiles[i] == filename:
+            return False
+        datafiles.insert(i, filename)
+        return True
+
+    def _remove_datafiles(self, filename: str) -> list[str]:
+        """Remove file, or all files in directory, from cached datafiles."""
+        datafiles = self.cache["datafiles"]
+        removed = []
+        i = bisect.bisect_left(datafiles, filename)
+        if i < len(datafiles) and datafiles[i] == filename:
+            removed.append(datafiles.pop(i))
+        prefix = filename + os.sep
+        i = bisect.bisect_left(datafiles, prefix)
+        j = i
+        while j < len(datafiles) and datafiles[j].startswith(prefix):
+            j += 1
+        removed += datafiles[i:j]
+        del datafiles[i:j]
+        return removed
+
+    def update_datafiles(self) -> tuple[list[str], list[str]]:
+        """Apply changes reported by the watcher to the cached datafiles.
+
+        Does nothing if :attr:`watch_files` is False. If datafiles are not cached, the
+        watcher is started (they will be scanned on next access).
+
+        Returns
+        -------
+        added
+            Files added to the datafiles.
+        removed
+            Files removed from the datafiles.
+        """
+        if not self.watch_files:
+            return [], []
+        if self.watcher is None or "datafiles" not in self.cache:
+            # start before scanning so that no change is missed
+            self.start_watcher()
+            return [], []
+
+        added: list[str] = []
+        removed: list[str] = []
+        for kind, filename in self.watcher.poll():
+            if kind == "overflow":
+                # events were lost, scan again
+                old = set(self.cache["datafiles"])
+                self._void_datafiles()
+                new = set(self.datafiles)
+                added = sorted(new - old)
+                removed = sorted(old - new)
+                break
+            if kind == "created":
+                if self.match_datafile(filename) and self._add_datafile(filename):
+                    added.append(filename)
+            else:
+                removed += self._remove_datafiles(filename)
+
+        if added or removed:
+            log.debug(
+                "Datafiles updated: %d added, %d removed", len(added), len(removed)
+            )
+            self.cache.pop("_get_source", None)
+        return added, removed
+
+    def follow(
+        self,
+        interval: float = 1.0,
+        window: float | None = None,
+        timeout: float | None = None,
+    ) -> Iterator[list[str]]:
+        """Yield new datafiles as they appear.
+
+        Files present when starting are not yielded. The watcher is used to find new
+        files (:attr:`watch_files` is set to True).
+
+        Parameters
+        ----------
+        interval
+            Time between two checks for new files, in seconds.
+        window
+            If None, each new file is yielded on its own (in a list). Otherwise, new
+            files are grouped: a batch is yielded `window` seconds after its first
+            file appeared.
+        timeout
+            If not None, stop if no new file appeared for this many seconds. The
+            current batch is then yielded.
+        """
+        follower = FileFollower(self, window=window)
+        while True:
+            yield from follower.poll()
+            if follower.idle(timeout):
+                yield from follower.flush()
+                return
+            time.sleep(interval)
+
+
+class FileFollower:
+    """Collect new files of a source, in batches.
+
+    Used by :meth:`CachedMultiFileSource.follow`. Each :meth:`poll` returns the
+    batches that are ready.
+
+    Parameters
+    ----------
+    source
+        Source to follow. Its :attr:`~CachedMultiFileSource.watch_files` attribute is
+        set to True.
+    window
+        If None, each file is a batch. Otherwise, batches are ready `window` seconds
+        after their first file appeared.
+    """
+
+    def __init__(
+        self, source: CachedMultiFileSource, window: float | None = None
+    ) -> None:
+        self.source = source
+        self.window = window
+        self.pending: list[str] = []
+        self.batch_start = 0.0
+        self.last_file = time.monotonic()
+
+        source.watch_files = True
+        # scan now, new files are relative to this
+        source.get_source(_warn=False)
+
+    def poll(self) -> list[list[str]]:
+        """Return batches of new files that are ready."""
+        added, _ = self.source.update_datafiles()
+        if "datafiles" not in self.source.cache:
+            # the cache was voided, the watcher restarted
+            self.source.get_source(_warn=False)
+
+        now = time.monotonic()
+        if added:
+            if not self.pending:
+                self.batch_start = now
+            self.pending += added
+            self.last_file = now
+
+        if self.window is None or (
+            self.pending and now - self.batch_start >= self.window
+        ):
+            return self.flush()
+        return []
+
+    def flush(self) -> list[list[str]]:
+        """Return the pending files, even if the batch is not complete."""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return []
+        if self.window is None:
+            return [[f] for f in pending]
+        return [pending]
+
+    def idle(self, timeout: float | None) -> bool:
+        """Return True if no file appeared for `timeout` seconds."""
+        return timeout is not None and time.monotonic() - self.last_file >= timeout
+
+
+class GlobSource(CachedMultiFileSource):
     """Find files using glob patterns.
 
     Relies on the function :func:`glob.glob`.
@@ -140,22 +530,45 @@ class GlobSource(MultiFileSource, CachedModule):
     @autocached
     def datafiles(self) -> list[str]:
         """Cached list of files found by using glob."""
-        import glob
-
         try:
             root = self.root_directory
         except NotImplementedError:
             root = None
 
         pattern = self.get_glob_pattern()
-        files = glob.glob(pattern, root_dir=root, **self.GLOB_KWARGS)
+        with self.span("scan", pattern=pattern):
+            files = glob.glob(pattern, root_dir=root, **self.GLOB_KWARGS)
 
         if root is not None:
             files = [path.join(root, f) for f in files]
 
         files = sorted(files)
 
-        return files
+        return self.pack_datafiles(files)
+
+    def get_watch_directory(self) -> str:
+        """Return the root directory, or the start of the pattern if it is absolute."""
+        try:
+            return str(self.root_directory)
+        except NotImplementedError:
+            pass
+        parts = []
+        for part in self.get_glob_pattern().split(os.sep):
+            if glob.has_magic(part):
+                break
+            parts.append(part)
+        return os.sep.join(parts) or os.curdir
+
+    def match_datafile(self, filename: str) -> bool:
+        """Return True if the filename matches the glob pattern."""
+        try:
+            filename = path.relpath(filename, self.root_directory)
+        except NotImplementedError:
+            pass
+        regex = _glob_regex(
+            self.get_glob_pattern(), self.GLOB_KWARGS.get("recursive", False)
+        )
+        return regex.fullmatch(filename) is not None
 
     def _lines(self) -> list[str]:
         """Human readable description."""
@@ -167,7 +580,7 @@ class GlobSource(MultiFileSource, CachedModule):
         return lines
 
 
-class FileFinderSource(MultiFileSource, CachedModule):
+class FileFinderSource(CachedMultiFileSource):
     """Multifiles manager using Filefinder.
 
     Written for datasets comprising of many datafiles, either because of they have long
@@ -197,6 +610,51 @@ class FileFinderSource(MultiFileSource, CachedModule):
 
     """
 
+    catalog_file: str | None = None
+    """SQLite database to keep a catalog of datafiles in. If None (default), the
+    root directory is scanned instead.
+
+    The catalog (see :class:`.catalog.FileCatalog`) is updated incrementally each
+    time :attr:`datafiles` is computed, and fixed parameters are selected with SQL
+    queries instead of regular expressions. Filters added to the :attr:`filefinder`
+    are not applied.
+    """
+
+    default_date: datetime.datetime | dict[str, int] | None = None
+    """Default date elements for filenames that do not specify all of them.
+
+    Used to build the :attr:`date_index`. See
+    :meth:`filefinder.matches.Matches.get_date`.
+    """
+
+    match_workers: int | None = None
+    """Number of workers matching scanned paths against the pattern.
+
+    If None (default) or 1, paths are matched by the Finder while scanning. Otherwise
+    see :meth:`scan_parallel`.
+    """
+
+    match_executor: Literal["process", "thread"] = "process"
+    """Use a pool of processes or threads to match paths.
+
+    The :mod:`re` module holds the GIL, so threads are only useful on free-threaded
+    builds of Python.
+    """
+
+    match_chunksize: int = 10_000
+    """Number of paths sent to a worker at once."""
+
+    max_regex_values: int = 16
+    """Maximum number of values of a parameter to fix in the regex of the Finder.
+
+    A parameter set to more values (a long list or :class:`~neba.config.Range`)
+    would make a long alternation in the regular expression, slow to compile and to
+    match. Instead, files are selected after scanning: the parsed value is tested
+    for membership in a set of the values (or in an interval for consecutive
+    integers). Does not apply to lists containing strings, which are regular
+    expressions.
+    """
+
     def get_filename_pattern(self) -> str:
         """Return the filename pattern.
 
@@ -208,11 +666,12 @@ class FileFinderSource(MultiFileSource, CachedModule):
         """
         raise NotImplementedError("Implement in your Source module subclass.")
 
+    @autocached(maxsize=256)
     def get_filename(self, relative: bool = False, **fixes: Any) -> str:
         """Create a filename corresponding to a set of parameters values.
 
         All parameters must be defined, either by the interface parameters, or by the
-        ``fixes`` arguments.
+        ``fixes`` arguments. Filenames are cached for each set of arguments.
 
         Parameters
         ----------
@@ -229,10 +688,7 @@ class FileFinderSource(MultiFileSource, CachedModule):
                 raise KeyError(f"Parameter {f} cannot be fixed '{self}'.")
 
         # In case parameters were changed sneakily and the cache was not invalidated
-        fixable_params = {
-            p: self.di.parameters[p] for p in self.fixable if p in self.di.parameters
-        }
-        fixes = fixable_params | fixes
+        fixes = self._get_fixes(self.fixable) | fixes
 
         # Remove parameters set to None, FileFinder is not equipped for that
         fixes = {p: value for p, value in fixes.items() if value is not None}
@@ -256,11 +712,41 @@ class FileFinderSource(MultiFileSource, CachedModule):
         # infinite recursion
         fixable = finder.get_group_names()
 
-        for p in fixable:
-            if (value := self.di.parameters.get(p, None)) is not None:
+        for p, value in self._get_fixes(fixable).items():
+            if self._is_filtered_fix(value):
+                _fix_by_membership(finder, p, value)
+            else:
                 finder.fix_group(p, value)
         return finder
 
+    def _get_fixes(self, names: Iterable[str]) -> dict[str, Any]:
+        """Return values of parameters in `names` that are set and not None."""
+        return {
+            p: value
+            for p in names
+            if (value := self.di.parameters.get(p, None)) is not None
+        }
+
+    def _is_filtered_fix(self, value: Any) -> bool:
+        """Return True if this value is to be applied after scanning."""
+        return (
+            isinstance(value, list | tuple | set | frozenset | range)
+            and len(value) > self.max_regex_values
+            and not any(isinstance(v, str) for v in value)
+        )
+
+    @property
+    @autocached
+    def catalog(self) -> FileCatalog | None:
+        """Catalog of datafiles, if :attr:`catalog_file` is set."""
+        if self.catalog_file is None:
+            return None
+        from .catalog import FileCatalog
+
+        return FileCatalog(
+            self.catalog_file, self.root_directory, self.get_filename_pattern()
+        )
+
     @property
     @autocached
     def fixable(self) -> set[str]:
@@ -299,16 +785,276 @@ class FileFinderSource(MultiFileSource, CachedModule):
         """Datafiles available.
 
         Use the :attr:`filefinder` object to scan for files corresponding to
-        the filename pattern.
+        the filename pattern. If :attr:`catalog_file` is set, the :attr:`catalog` is
+        updated and queried instead.
+        """
+        finder = self.filefinder
+        catalog = self.catalog
+        if catalog is not None:
+            fixes = self._get_fixes(self.fixable)
+            with self.span("catalog", root=finder.root):
+                catalog.update()
+                return self.pack_datafiles(catalog.query(**fixes))
+
+        with self.span("scan", root=finder.root):
+            if self.match_workers is not None and self.match_workers > 1:
+                self.scan_parallel()
+            return self.pack_datafiles(finder.get_files())
+
+    def _list_paths(self, finder: Finder) -> list[str]:
+        """Return paths (relative to root) that can match the pattern of the finder.
+
+        Sub-directories are selected with the regex of each level, as the Finder
+        does, unless it scans everything (up to its ``max_scan_depth``).
+        """
+        root = finder.root
+        if finder.scan_everything:
+            root_depth = root.rstrip(os.sep).count(os.sep)
+            relpaths = []
+            for dirpath, dirnames, filenames in os.walk(root):
+                depth = dirpath.rstrip(os.sep).count(os.sep) - root_depth
+                if depth > finder.max_scan_depth:
+                    dirnames.clear()
+                relpaths += [
+                    path.relpath(path.join(dirpath, f), root) for f in filenames
+                ]
+            return relpaths
+
+        subpatterns = [_compile_regex(rgx) for rgx in finder.get_regex_subdirs()]
+        maxdepth = len(subpatterns) - 1
+        relpaths = []
+        stack = [("", 0)]
+        while stack:
+            directory, depth = stack.pop()
+            try:
+                with os.scandir(path.join(root, directory)) as entries:
+                    for entry in entries:
+                        relpath = path.join(directory, entry.name)
+                        if entry.is_dir():
+                            if depth < maxdepth and subpatterns[depth].fullmatch(
+                                entry.name
+                            ):
+                                stack.append((relpath, depth + 1))
+                        elif depth == maxdepth:
+                            relpaths.append(relpath)
+            except OSError as e:
+                log.debug("Cannot list %s: %s", directory, e)
+        return relpaths
+
+    def scan_parallel(self) -> None:
+        """Scan for datafiles, matching paths in parallel.
+
+        Paths are listed first, then split in chunks of :attr:`match_chunksize` that
+        are matched against the pattern by :attr:`match_workers` workers. Parsed
+        values of groups are sent back with the paths, and stored in the
+        :attr:`filefinder` as if it scanned itself (filters are applied).
+
+        .. note::
+
+            Parsed values and scanned files are set through private attributes of
+            filefinder (``Match._parsed``, ``Finder._files``), which is why its
+            version is pinned.
+        """
+        from filefinder.matches import Match, Matches
+
+        finder = self.filefinder
+        relpaths = self._list_paths(finder)
+        n = self.match_chunksize
+        chunks = [relpaths[i : i + n] for i in range(0, len(relpaths), n)]
+        regex = finder.get_regex()
+        groups = finder.groups
+
+        executor = (
+            ProcessPoolExecutor
+            if self.match_executor == "process"
+            else ThreadPoolExecutor
+        )
+        files = []
+        with executor(max_workers=self.match_workers) as pool:
+            for chunk in pool.map(
+                _match_paths, itertools.repeat(regex), itertools.repeat(groups), chunks
+            ):
+                for relpath, values in chunk:
+                    match_list = []
+                    for grp, (string, start, end, parsed, value) in zip(
+                        groups, values, strict=True
+                    ):
+                        match = Match(grp, string, start, end)
+                        if parsed:
+                            match._parsed = value
+                        match_list.append(match)
+                    matches = Matches(match_list, groups)
+                    matches.date_is_first_class = finder.date_is_first_class
+                    if finder.filters.is_valid(finder, relpath, matches):
+                        files.append((relpath, matches))
+
+        # same state as after Finder.find_files, fixing a group voids it
+        files.sort(key=lambda x: x[0])
+        finder._files = files
+        finder.scanned = True
+        log.debug(
+            "Matched %d paths in %d chunks, found %d files",
+            len(relpaths),
+            len(chunks),
+            len(files),
+        )
+
+    def iter_matches(
+        self, filenames: Iterable[str] | None = None
+    ) -> Iterator[tuple[str, Matches]]:
+        """Yield filenames with their matches.
+
+        Matches found when scanning are reused, others are matched against the
+        pattern.
+
+        Parameters
+        ----------
+        filenames
+            Absolute filenames. By default, the :attr:`datafiles`.
+
+        Raises
+        ------
+        ValueError
+            A filename does not match the filename pattern.
         """
-        return self.filefinder.get_files()
+        finder = self.filefinder
+        if filenames is None:
+            filenames = self.datafiles
+        known = dict(finder.files) if finder.scanned else {}
+        for f in filenames:
+            relpath = finder.get_relative(f)
+            matches = known.get(relpath) or finder.get_matches(relpath)
+            if matches is None:
+                raise ValueError(f"File '{f}' does not match the pattern.")
+            yield f, matches
+
+    @property
+    @autocached
+    def date_index(self) -> tuple[np.ndarray, list[str]]:
+        """Dates of the datafiles, sorted.
+
+        Dates are parsed from the filenames (see :attr:`default_date`). Cached along
+        with the :attr:`datafiles`.
+
+        Returns
+        -------
+        dates
+            Sorted array of dates (``datetime64[us]``).
+        filenames
+            Corresponding datafiles. Files with the same date keep their order.
+
+        Raises
+        ------
+        ValueError
+            A datafile does not match the filename pattern.
+        """
+        import numpy as np
+
+        datafiles = self.datafiles
+        dates = [
+            matches.get_date(default_date=self.default_date)
+            for _, matches in self.iter_matches(datafiles)
+        ]
+
+        array = np.array(dates, dtype="datetime64[us]")
+        order = np.argsort(array, kind="stable")
+        return array[order], [datafiles[i] for i in order]
+
+    def between(self, start: Any, end: Any) -> list[str]:
+        """Return datafiles whose date is between `start` and `end` (inclusive).
+
+        Use a binary search in :attr:`date_index`. Files are sorted by date.
+
+        Parameters
+        ----------
+        start, end
+            Bounds of the range, anything that can be converted to
+            :class:`numpy.datetime64` (a string, a datetime object, etc.). If None,
+            the range is not bounded on that side.
+        """
+        import numpy as np
+
+        dates, filenames = self.date_index
+        i = 0 if start is None else dates.searchsorted(np.datetime64(start), "left")
+        j = (
+            len(dates)
+            if end is None
+            else dates.searchsorted(np.datetime64(end), "right")
+        )
+        return filenames[i:j]
+
+    def nearest(self, date: Any) -> str:
+        """Return the datafile whose date is nearest to `date`.
+
+        If two files are at the same distance, the earliest is returned.
+
+        Raises
+        ------
+        IndexError
+            If there are no datafiles.
+        """
+        import numpy as np
+
+        dates, filenames = self.date_index
+        if len(dates) == 0:
+            raise IndexError("No datafiles.")
+        date = np.datetime64(date)
+        i = int(dates.searchsorted(date))
+        if i == len(dates) or (i > 0 and date - dates[i - 1] <= dates[i] - date):
+            i -= 1
+        return filenames[i]
+
+    def update_datafiles(self) -> tuple[list[str], list[str]]:
+        """Apply changes reported by the watcher, and reset the :attr:`date_index`.
+
+        See :meth:`.CachedMultiFileSource.update_datafiles`.
+        """
+        added, removed = super().update_datafiles()
+        if added or removed:
+            self.cache.pop("date_index", None)
+        return added, removed
+
+    def _void_datafiles(self) -> None:
+        # the Finder keeps its scanned files, reset it while keeping its filters
+        super()._void_datafiles()
+        self.cache.pop("date_index", None)
+        if "filefinder" in self.cache and (finder := self.filefinder).scanned:
+            finder.files.clear()
+            finder.scanned = False
+
+    def match_datafile(self, filename: str) -> bool:
+        """Return True if the filename matches the pattern and the fixed values."""
+        finder = self.filefinder
+        relpath = finder.get_relative(filename)
+        matches = finder.get_matches(relpath)
+        return matches is not None and finder.filters.is_valid(finder, relpath, matches)
+
+    def _add_datafile(self, filename: str) -> bool:
+        # keep the files of the Finder in sync, Finder.files is the cached list
+        if not super()._add_datafile(filename):
+            return False
+        finder = self.filefinder
+        if finder.scanned:
+            relpath = finder.get_relative(filename)
+            matches = finder.get_matches(relpath)
+            if matches is not None:
+                bisect.insort(finder.files, (relpath, matches), key=lambda x: x[0])
+        return True
+
+    def _remove_datafiles(self, filename: str) -> list[str]:
+        removed = super()._remove_datafiles(filename)
+        finder = self.filefinder
+        if removed and finder.scanned:
+            relpaths = {finder.get_relative(f) for f in removed}
+            finder.files[:] = [(f, m) for f, m in finder.files if f not in relpaths]
+        return removed
 
     def _lines(self) -> list[str]:
         """Human readable description."""
         s = [f"FileFinder pattern '{self.get_filename_pattern()}'"]
         if "filefinder" in self.cache:
             fixes = {}
-            for grp in self.filefinder.groups:
+            for grp in self.cache["filefinder"].groups:
                 if grp.fixed:
                     fixes[grp.name] = grp.fixed_value
             if fixes:
@@ -316,25 +1062,157 @@ class FileFinderSource(MultiFileSource, CachedModule):
                     "\twith fixed values: "
                     + ", ".join([f"{name}: {value}" for name, value in fixes.items()])
                 )
+            filtered = [
+                f"{name} ({len(value)} values)"
+                for name, value in self._get_fixes(sorted(self.fixable)).items()
+                if self._is_filtered_fix(value)
+            ]
+            if filtered:
+                s.append(
+                    "\twith values selected after scanning: " + ", ".join(filtered)
+                )
         s.append(f"In root directory '{self.root_directory}'")
         if "datafiles" in self.cache:
-            s.append(f"Found {len(self.datafiles)} files")
+            s.append(f"Found {len(self.cache['datafiles'])} files")
         return s
 
 
+_DATE_GROUPS: dict[str, Callable[[datetime.datetime], Any]] = {
+    "Y": lambda d: d.year,
+    "m": lambda d: d.month,
+    "d": lambda d: d.day,
+    "j": lambda d: d.timetuple().tm_yday,
+    "H": lambda d: d.hour,
+    "M": lambda d: d.minute,
+    "S": lambda d: d.second,
+    "x": lambda d: int(d.strftime("%Y%m%d")),
+    "X": lambda d: int(d.strftime("%H%M%S")),
+    "F": lambda d: d.strftime("%Y-%m-%d"),
+    "B": lambda d: d.strftime("%B"),
+}
+"""Functions returning the value of date groups of filefinder from a datetime.
+
+Values have the type of the parsed values (integers for x and X).
+"""
+
+
+def _stat_exists(filenames: list[str]) -> list[bool]:
+    exists = []
+    for f in filenames:
+        try:
+            os.stat(f)
+        except OSError:
+            exists.append(False)
+        else:
+            exists.append(True)
+    return exists
+
+
+class GeneratedSource(FileFinderSource):
+    """Multifiles source whose files are generated from the pattern.
+
+    For datasets that are known to be complete, there is no need to scan the
+    filesystem: the :attr:`datafiles` are built for every combination of values of
+    the parameters in the filename pattern. Date elements (``Y``, ``m``, ``d``,
+    ``j``, ``H``, ``M``, ``S``, ``x``, ``X``, ``F``, ``B``) are taken from each date
+    returned by :meth:`get_dates`. Other parameters take the value (or list of
+    values) of the interface parameters, and they must all be set.
+
+    If :attr:`check_exists` is True, only files that exist are kept. The catalog
+    (:attr:`~FileFinderSource.catalog_file`) and parallel matching
+    (:attr:`~FileFinderSource.match_workers`) are not used.
+    """
+
+    check_exists: bool = True
+    """Only keep files that exist. If False, the filesystem is not accessed at all."""
+
+    stat_workers: int = 16
+    """Number of threads checking that files exist."""
+
+    stat_chunksize: int = 1000
+    """Number of files checked by a thread at once."""
+
+    def get_dates(self) -> Iterable[datetime.datetime] | None:
+        """Return dates of the datafiles.
+
+        Dates are used to fill the date elements of the pattern. For instance a
+        :func:`pandas.date_range`. By default, return None: date elements are
+        parameters like the others.
+        """
+        return None
+
+    def _get_combinations(self) -> Iterator[dict[str, Any]]:
+        """Yield the fixes of each file to generate."""
+        names = list(dict.fromkeys(g.name for g in self.filefinder.groups))
+        dates = self.get_dates()
+        date_names = [] if dates is None else [n for n in names if n in _DATE_GROUPS]
+        others = [n for n in names if n not in date_names]
+
+        values = []
+        for name in others:
+            value = self.di.parameters.get(name, None)
+            if value is None:
+                raise ValueError(
+                    f"Parameter '{name}' must be set to generate filenames ({self})."
+                )
+            if not isinstance(value, list | tuple | range | set | frozenset):
+                value = [value]
+            values.append(value)
+
+        date_fixes: Iterable[dict[str, Any]] = [{}]
+        if dates is not None:
+            date_fixes = (
+                {name: _DATE_GROUPS[name](date) for name in date_names}
+                for date in dates
+            )
+        for fixes in date_fixes:
+            for combination in itertools.product(*values):
+                yield fixes | dict(zip(others, combination, strict=True))
+
+    def filter_existing(self, filenames: list[str]) -> list[str]:
+        """Return the filenames that exist.
+
+        Files are stat-ed in chunks of :attr:`stat_chunksize` by :attr:`stat_workers`
+        threads.
+        """
+        n = self.stat_chunksize
+        chunks = [filenames[i : i + n] for i in range(0, len(filenames), n)]
+        with ThreadPoolExecutor(max_workers=self.stat_workers) as pool:
+            exists = itertools.chain.from_iterable(pool.map(_stat_exists, chunks))
+            return list(itertools.compress(filenames, exists))
+
+    @property
+    @autocached
+    def datafiles(self) -> list[str]:
+        """Datafiles generated from the pattern and parameters.
+
+        Checked for existence if :attr:`check_exists` is True.
+        """
+        finder = self.filefinder
+        with self.span("generate", root=finder.root):
+            filenames = sorted(
+                {finder.make_filename(fixes) for fixes in self._get_combinations()}
+            )
+        if self.check_exists:
+            with self.span("stat", n_files=len(filenames)):
+                filenames = self.filter_existing(filenames)
+        return self.pack_datafiles(filenames)
+
+
 T_ModSource = TypeVar("T_ModSource", bound=SourceAbstract)
 
 
 class _SourceMix(SourceAbstract, ModuleMix[T_ModSource]):
     def _get_grouped_source(self) -> list[list[Any]]:
         grouped = self.apply_all("get_source", _warn=False)
-        # I expect grouped to be list[list[Any] | Any]
+        # I expect grouped to be list[Sequence[Any] | Any]
         # we make sure we only have lists: list[list[Any]]
+        # (a FileList for instance is a sequence, but not a list)
         source = []
         for grp in grouped:
-            if not isinstance(grp, list | tuple):
+            if isinstance(grp, str | bytes) or not isinstance(grp, Sequence):
                 grp = [grp]
-            source.append(grp)
+            source.append(list(grp))
         return source
 
 
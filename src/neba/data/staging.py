@@ -0,0 +1,130 @@
+"""Write to a local directory before moving to the final target."""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from os import path
+from typing import Any
+
+from .manifest import remove_target
+
+log = logging.getLogger(__name__)
+
+
+class StagingArea:
+    """Stage written targets in a fast local directory.
+
+    Targets are first written to a temporary directory (typically on a local disk),
+    and moved to their final location by a pool of threads. The move is atomic: the
+    target is first copied next to its final location under a temporary name, then
+    renamed.
+
+    Use as a context manager. When exiting, wait for all transfers to complete (or
+    call :meth:`wait`), and remove the staging directory. The first error that
+    occurred during a transfer is then raised. Staged files that could not be moved
+    are removed, as well as partially copied ones.
+
+    Parameters
+    ----------
+    directory
+        Directory in which to create the staging directory. If None, use ``$TMPDIR``
+        or the default temporary directory (see :func:`tempfile.gettempdir`).
+    """
+
+    max_workers: int = 4
+    """Maximum number of threads moving staged targets."""
+
+    suffix: str = ".neba-staging"
+    """Suffix of the temporary name of targets being copied to their location."""
+
+    def __init__(self, directory: str | os.PathLike | None = None) -> None:
+        if directory is None:
+            directory = os.environ.get("TMPDIR", None) or tempfile.gettempdir()
+        self.directory = tempfile.mkdtemp(prefix="neba-", dir=directory)
+        self._counter = itertools.count()
+        self._executor = ThreadPoolExecutor(self.max_workers)
+        self._transfers: list[Future] = []
+
+    def stage(self, target: str | os.PathLike) -> str:
+        """Return a location in the staging directory for this target.
+
+        The basename (and extension) of the target is kept.
+        """
+        return path.join(
+            self.directory, f"{next(self._counter)}_{path.basename(target)}"
+        )
+
+    def discard(self, staged: str) -> None:
+        """Remove a staged target."""
+        remove_target(staged)
+
+    def _move(self, staged: str, target: str | os.PathLike) -> None:
+        tmp = str(target) + self.suffix
+        try:
+            remove_target(tmp)
+            shutil.move(staged, tmp)
+            if path.isdir(tmp):
+                # directories cannot be replaced
+                remove_target(target)
+            os.replace(tmp, target)
+        except BaseException:
+            remove_target(tmp)
+            remove_target(staged)
+            raise
+        log.debug("Moved staged %s to %s", staged, target)
+
+    def move(
+        self,
+        staged: str,
+        target: str | os.PathLike,
+        callback: Callable[[], Any] | None = None,
+    ) -> Future:
+        """Move a staged target to its final location, in the background.
+
+        Parameters
+        ----------
+        callback
+            Called without arguments in the background thread once the move
+            succeeded.
+        """
+
+        def transfer() -> None:
+            self._move(staged, target)
+            if callback is not None:
+                callback()
+
+        future = self._executor.submit(transfer)
+        self._transfers.append(future)
+        return future
+
+    def wait(self) -> None:
+        """Wait for all transfers to complete, raise the first error if any."""
+        done, _ = wait(self._transfers)
+        self._transfers = []
+        errors = [
+            exc
+            for f in done
+            if not f.cancelled() and (exc := f.exception()) is not None
+        ]
+        if errors:
+            log.warning("%d staged targets could not be moved.", len(errors))
+            raise errors[0]
+
+    def __enter__(self) -> StagingArea:
+        return self
+
+    def __exit__(self, exc_type: type | None, *args: Any) -> None:
+        try:
+            if exc_type is not None:
+                for future in self._transfers:
+                    future.cancel()
+            self.wait()
+        finally:
+            self._executor.shutdown()
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,308 @@
+"""Watch directories for files being created or deleted.
+
+Watchers report changes in a directory tree since their last poll, so that a list of
+files can be updated without scanning the whole tree again. Events are tuples of a
+kind and an absolute path:
+
+* ``("created", path)`` when a file has been written or moved in,
+* ``("deleted", path)`` when a file or a directory has been deleted or moved out (in
+  the case of a directory, all files below are gone),
+* ``("overflow", root)`` when events were lost. The directory tree must be scanned
+  again.
+
+:class:`InotifyWatcher` relies on the Linux inotify API. :class:`PollingWatcher`
+compares the modification time of directories. Use :func:`get_watcher` to get the
+first available.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from os import path
+from typing import Any, Literal
+
+log = logging.getLogger(__name__)
+
+FileEvent = tuple[Literal["created", "deleted", "overflow"], str]
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _walk_files(directory: str) -> list[str]:
+    """Return all files below a directory."""
+    return [
+        path.join(dirpath, f)
+        for dirpath, _, filenames in os.walk(directory)
+        for f in filenames
+    ]
+
+
+class Watcher:
+    """Report changes in a directory tree.
+
+    Parameters
+    ----------
+    root
+        Directory to watch, with all its sub-directories.
+    """
+
+    def __init__(self, root: str | os.PathLike) -> None:
+        self.root = str(root)
+
+    def poll(self) -> list[FileEvent]:
+        """Return events that happened since the last poll, without blocking.
+
+        :Not implemented: implement in a subclass.
+        """
+        raise NotImplementedError("Implement in a subclass.")
+
+    def close(self) -> None:
+        """Stop watching."""
+        pass
+
+    def __enter__(self) -> Watcher:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class InotifyWatcher(Watcher):
+    """Watch a directory tree with inotify (Linux only).
+
+    A watch is added on every sub-directory. Files are reported as created once they
+    are closed after writing, or moved in. New sub-directories are watched as well.
+
+    Raises
+    ------
+    OSError
+        If inotify is not available.
+    """
+
+    _libc: Any = None
+
+    def __init__(self, root: str | os.PathLike) -> None:
+        super().__init__(root)
+        libc = self._get_libc()
+        self._inotify_add_watch = libc.inotify_add_watch
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd: int = fd
+        self.directories: dict[int, str] = {}
+        """Directories watched by their watch descriptor."""
+        try:
+            self._add_tree(self.root)
+        except BaseException:
+            # the watch limit may be reached, do not leak the descriptor
+            self.close()
+            raise
+
+    @classmethod
+    def _get_libc(cls) -> Any:
+        if cls._libc is None:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            if not hasattr(libc, "inotify_init1"):
+                raise OSError("inotify is not available.")
+            libc.inotify_add_watch.argtypes = [
+                ctypes.c_int,
+                ctypes.c_char_p,
+                ctypes.c_uint32,
+            ]
+            cls._libc = libc
+        return cls._libc
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        self.directories[wd] = directory
+
+    def _add_tree(self, directory: str) -> None:
+        for dirpath, _, _ in os.walk(directory):
+            self._add_watch(dirpath)
+
+    def _read(self) -> bytes:
+        buffer = b""
+        while True:
+            try:
+                data = os.read(self.fd, 2**16)
+            except BlockingIOError:
+                return buffer
+            if not data:
+                return buffer
+            buffer += data
+
+    def poll(self) -> list[FileEvent]:
+        """Return events that happened since the last poll."""
+        buffer = self._read()
+        events: list[FileEvent] = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                log.warning("Inotify queue overflowed for %s", self.root)
+                events.append(("overflow", self.root))
+                continue
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            if wd not in self.directories or mask & IN_DELETE_SELF:
+                continue
+
+            filename = path.join(self.directories[wd], name)
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                if mask & IN_ISDIR:
+                    # forget the directory, it is watched again if moved in the tree
+                    prefix = filename + os.sep
+                    for w, d in list(self.directories.items()):
+                        if d == filename or d.startswith(prefix):
+                            self.directories.pop(w)
+                events.append(("deleted", filename))
+            elif mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # files may have been added before the directory was watched
+                    try:
+                        self._add_tree(filename)
+                    except OSError:
+                        continue
+                    events += [("created", f) for f in _walk_files(filename)]
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                events.append(("created", filename))
+
+        return events
+
+    def close(self) -> None:
+        """Close the inotify file descriptor."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Watch a directory tree by comparing modification times of directories.
+
+    On each poll, all directories of the tree are stat-ed, and only those whose
+    modification time changed are listed again. Files are reported as soon as they
+    appear, even if they are still being written.
+    """
+
+    def __init__(self, root: str | os.PathLike) -> None:
+        super().__init__(root)
+        self.directories: dict[str, tuple[int, set[str], set[str]]] = {}
+        """Modification time, files and sub-directories of each directory."""
+        self._add_tree(self.root)
+
+    def _list(self, directory: str) -> tuple[int, set[str], set[str]] | None:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+            files, subdirs = set(), set()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.add(entry.name)
+                    else:
+                        files.add(entry.name)
+        except OSError:
+            return None
+        return mtime, files, subdirs
+
+    def _add_tree(self, directory: str) -> list[str]:
+        """Add directory and sub-directories, return files found."""
+        listing = self._list(directory)
+        if listing is None:
+            return []
+        self.directories[directory] = listing
+        _, files, subdirs = listing
+        found = [path.join(directory, f) for f in files]
+        for d in subdirs:
+            found += self._add_tree(path.join(directory, d))
+        return found
+
+    def _remove_tree(self, directory: str) -> None:
+        prefix = directory + os.sep
+        for d in [
+            d for d in self.directories if d == directory or d.startswith(prefix)
+        ]:
+            self.directories.pop(d)
+
+    def poll(self) -> list[FileEvent]:
+        """Return changes since the last poll."""
+        events: list[FileEvent] = []
+        for directory, (mtime, files, subdirs) in list(self.directories.items()):
+            if directory not in self.directories:  # removed during this poll
+                continue
+            try:
+                if os.stat(directory).st_mtime_ns == mtime:
+                    continue
+            except OSError:
+                continue  # parent directory will report it
+            listing = self._list(directory)
+            if listing is None:
+                continue
+            self.directories[directory] = listing
+            _, new_files, new_subdirs = listing
+
+            for f in sorted(files - new_files):
+                events.append(("deleted", path.join(directory, f)))
+            for d in sorted(subdirs - new_subdirs):
+                self._remove_tree(path.join(directory, d))
+                events.append(("deleted", path.join(directory, d)))
+            for f in sorted(new_files - files):
+                events.append(("created", path.join(directory, f)))
+            for d in sorted(new_subdirs - subdirs):
+                found = self._add_tree(path.join(directory, d))
+                events += [("created", f) for f in found]
+
+        return events
+
+
+def get_watcher(
+    root: str | os.PathLike, kind: Literal["auto", "inotify", "poll"] = "auto"
+) -> Watcher:
+    """Return a watcher for a directory tree.
+
+    Parameters
+    ----------
+    kind
+        If "auto", use :class:`InotifyWatcher` if available, :class:`PollingWatcher`
+        otherwise.
+    """
+    if kind in ["auto", "inotify"]:
+        try:
+            return InotifyWatcher(root)
+        except OSError as e:
+            if kind == "inotify":
+                raise
+            log.debug("Cannot use inotify (%s), polling modification times.", e)
+    return PollingWatcher(root)
@@ -2,13 +2,20 @@
 
 from __future__ import annotations
 
+import hashlib
 import inspect
 import json
 import logging
 import os
+import queue
+import shutil
 import socket
 import subprocess
-from collections.abc import Callable, Iterable, Mapping, Sequence
+import threading
+from collections import Counter
+from collections.abc import Callable, Hashable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 from os import path
 from typing import (
@@ -21,14 +28,17 @@ from typing import (
     overload,
     runtime_checkable,
 )
+from weakref import WeakKeyDictionary
 
 from traitlets import Bool, Int, List, Unicode
 
 from neba.config import Section
 from neba.config.loaders.json import JsonEncoderTypes
-from neba.utils import get_classname
+from neba.utils import format_nbytes, get_classname
 
-from .module import Module
+from .manifest import WriteManifest
+from .module import Module, _fingerprint_default
+from .staging import StagingArea
 from .types import T_Data, T_Source, T_Source_contra
 
 if TYPE_CHECKING:
@@ -214,6 +224,114 @@ class MetadataOptions(Section):
         help="Files and folders to ignore when creating git diff.",
     )
 
+    git_cache = Bool(
+        True,
+        help=(
+            "If True, reuse the commit hash of a repository as long as its HEAD "
+            "and index are not modified. The diff is always computed."
+        ),
+    )
+
+
+_T = TypeVar("_T")
+
+_git_cache: dict[tuple[str, Hashable], tuple[tuple, Any]] = {}
+"""Results of git commands, by repository toplevel and key.
+
+Each entry stores the state of the repository (see :func:`_git_state`) at the time
+the result was obtained."""
+
+
+def _find_git_repository(directory: str) -> tuple[str, str] | None:
+    """Return the toplevel and git directory of the repository containing directory.
+
+    Walk up parent directories until a ``.git`` folder or file (for worktrees and
+    submodules) is found. Return None if there is none.
+    """
+    directory = path.abspath(directory)
+    while True:
+        dotgit = path.join(directory, ".git")
+        if path.isdir(dotgit):
+            return directory, dotgit
+        if path.isfile(dotgit):
+            with open(dotgit) as fp:
+                line = fp.readline().strip()
+            if line.startswith("gitdir:"):
+                gitdir = line.removeprefix("gitdir:").strip()
+                return directory, path.normpath(path.join(directory, gitdir))
+        parent = path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def _git_state(gitdir: str) -> tuple:
+    """Return modification times of HEAD, the current branch reference and index."""
+    # shared directory of worktrees
+    commondir = gitdir
+    if path.isfile(common_file := path.join(gitdir, "commondir")):
+        with open(common_file) as fp:
+            commondir = path.normpath(path.join(gitdir, fp.read().strip()))
+
+    files = [path.join(gitdir, "HEAD"), path.join(gitdir, "index")]
+    try:
+        with open(files[0]) as fp:
+            head = fp.read().strip()
+    except OSError:
+        head = ""
+    if head.startswith("ref:"):
+        files.append(path.join(commondir, head.removeprefix("ref:").strip()))
+        files.append(path.join(commondir, "packed-refs"))
+
+    def mtime(file: str) -> int | None:
+        try:
+            return os.stat(file).st_mtime_ns
+        except OSError:
+            return None
+
+    return (head, *(mtime(f) for f in files))
+
+
+def cached_git(
+    directory: str, key: Hashable, func: Callable[[], _T], use_cache: bool = True
+) -> _T:
+    """Return result of a git-related function, cached per repository.
+
+    The result is reused as long as the HEAD, current branch and index of the
+    repository containing `directory` are not modified. Changes to the working tree
+    that are not staged are thus not detected.
+
+    Parameters
+    ----------
+    directory
+        Directory inside the repository.
+    key
+        Identify the result inside the repository cache.
+    func
+        Function computing the result if it is not cached. Raised exceptions are not
+        cached.
+    use_cache
+        If False, always call `func`.
+    """
+    repo = _find_git_repository(directory) if use_cache else None
+    if repo is None:
+        return func()
+
+    toplevel, gitdir = repo
+    state = _git_state(gitdir)
+    cached = _git_cache.get((toplevel, key), None)
+    if cached is not None and cached[0] == state:
+        log.debug("Using cached git information '%s' for %s", key, toplevel)
+        return cached[1]
+
+    result = func()
+    _git_cache[toplevel, key] = (state, result)
+    return result
+
+
+_methods_cache: WeakKeyDictionary[type, dict[str, MetadataMethod]] = WeakKeyDictionary()
+"""Metadata methods of each generator class."""
+
 
 class MetadataGenerator:
     """Generate metadata from interface.
@@ -243,11 +361,22 @@ class MetadataGenerator:
         options = self.options_defaults | kwargs
         self.options = self.options_cls(**options)
 
-        self.methods: dict[str, MetadataMethod] = {}
-        for basetype in reversed(self.__class__.mro()):
-            for key, value in basetype.__dict__.items():
-                if isinstance(value, MetadataMethod):
-                    self.methods[key] = value
+        self.methods: dict[str, MetadataMethod] = dict(self.get_class_methods())
+
+    @classmethod
+    def get_class_methods(cls) -> dict[str, MetadataMethod]:
+        """Return metadata methods of this class, from all its parents.
+
+        The result is cached for each class.
+        """
+        if (methods := _methods_cache.get(cls, None)) is None:
+            methods = {}
+            for basetype in reversed(cls.mro()):
+                for key, value in basetype.__dict__.items():
+                    if isinstance(value, MetadataMethod):
+                        methods[key] = value
+            _methods_cache[cls] = methods
+        return methods
 
     def get_methods(self) -> list[str]:
         """Return methods names, skipping those not selected by user."""
@@ -316,12 +445,17 @@ class MetadataGenerator:
             ):
                 return session
 
+        # walk frames up to the outermost, without loading source context
         script = None
-        for stack in inspect.stack():
+        frame = inspect.currentframe()
+        while frame is not None:
+            filename = frame.f_code.co_filename
             # we can still be in a IPython console
-            if "IPython" in stack.filename:
+            if "IPython" in filename:
                 break
-            script = stack.filename
+            script = filename
+            frame = frame.f_back
+        del frame
 
         if script is None:
             raise ValueError
@@ -351,9 +485,14 @@ class MetadataGenerator:
         # use the directory of the calling script
         gitdir = path.dirname(self.metadata.get("creation_script", "."))
 
-        cmd = ["git", "-C", gitdir, "rev-parse", "HEAD"]
-        ret = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return ret.stdout.strip()
+        def get_commit() -> str:
+            cmd = ["git", "-C", gitdir, "rev-parse", "HEAD"]
+            ret = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            return ret.stdout.strip()
+
+        return cached_git(
+            gitdir, "commit", get_commit, use_cache=self.options.git_cache
+        )
 
     @method(items=["creation_diff_short", "creation_diff_long"])
     def creation_diff(self) -> dict[str, Any] | None:
@@ -363,7 +502,9 @@ class MetadataGenerator:
         * ``creation_diff_long``: full diff, truncated at
           :attr:`~.MetadataOptions.max_diff_lines`
 
-        Use the `creation_script` if present in metadata, or ``"."`` otherwise.
+        Use the `creation_script` if present in metadata, or ``"."`` otherwise. The
+        diff is not cached (see :func:`cached_git`) since it depends on the working
+        tree.
         """
         if "creation_commit" not in self.metadata:
             return None
@@ -386,13 +527,13 @@ class MetadataGenerator:
         gitdir = path.dirname(self.metadata.get("creation_script", "."))
 
         # get top level (necessary for exclude arguments)
-        gitdir = git_cmd(["git", "-C", gitdir, "rev-parse", "--show-toplevel"])
+        toplevel = git_cmd(["git", "-C", gitdir, "rev-parse", "--show-toplevel"])
 
         # check if there is diff
         diffcmd = [
             "git",
             "-C",
-            gitdir,
+            toplevel,
             "--no-pager",
             "diff",
             "-w",
@@ -419,11 +560,226 @@ class MetadataGenerator:
         return metadata
 
 
+class WritePlan(Generic[T_Source_contra, T_Data]):
+    """Writing calls, checked once before being sent.
+
+    Gathers the checks that are done before writing: duplicate targets, creation of
+    missing directories (concurrently), and comparison of the estimated size of the
+    output with the free disk space. :meth:`report` describes the plan without
+    writing (or computing) anything.
+
+    Parameters
+    ----------
+    calls
+        Calls made of a target and the data to write to it.
+    estimate_nbytes
+        Function returning the estimated size in bytes of data once written, or None
+        if it cannot be estimated.
+    """
+
+    max_workers: int = 8
+    """Maximum number of threads used to check and create directories."""
+
+    def __init__(
+        self,
+        calls: Iterable[tuple[T_Source_contra, T_Data]],
+        estimate_nbytes: Callable[[T_Data], int | None] | None = None,
+    ) -> None:
+        self.calls: list[tuple[T_Source_contra, T_Data]] = list(calls)
+        self.targets: list[T_Source_contra] = [target for target, _ in self.calls]
+
+        self.nbytes: list[int | None]
+        """Estimated size of each call output."""
+        if estimate_nbytes is None:
+            self.nbytes = [None] * len(self.calls)
+        else:
+            self.nbytes = [estimate_nbytes(data) for _, data in self.calls]
+
+        self.directories: list[str] = sorted(
+            {path.dirname(cast(str | os.PathLike, t)) for t in self.targets}
+        )
+        self.checked: bool = False
+        """Whether the checks have been run already."""
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def __iter__(self) -> Iterator[tuple[T_Source_contra, T_Data]]:
+        return iter(self.calls)
+
+    @property
+    def total_nbytes(self) -> int | None:
+        """Estimated size of all outputs, or None if no call could be estimated."""
+        known = [n for n in self.nbytes if n is not None]
+        if not known:
+            return None
+        return sum(known)
+
+    def get_duplicates(self) -> list[T_Source_contra]:
+        """Return targets that appear in multiple calls."""
+        return [t for t, count in Counter(self.targets).items() if count > 1]
+
+    def get_missing_directories(self) -> list[str]:
+        """Return directories that do not exist yet."""
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            exist = list(executor.map(path.isdir, self.directories))
+        return [d for d, e in zip(self.directories, exist) if not e]
+
+    def get_free_space(self) -> dict[str, int]:
+        """Return free space of each filesystem the targets are written to.
+
+        Keys are the first existing directory found for each filesystem (directories
+        may not exist yet).
+        """
+        free: dict[int, tuple[str, int]] = {}
+        for d in self.directories:
+            existing = path.abspath(d)
+            while not path.isdir(existing) and path.dirname(existing) != existing:
+                existing = path.dirname(existing)
+            device = os.stat(existing).st_dev
+            if device not in free:
+                free[device] = (existing, shutil.disk_usage(existing).free)
+        return dict(free.values())
+
+    def check_duplicates(self) -> None:
+        """Raise ValueError if some calls have the same target."""
+        if duplicates := self.get_duplicates():
+            raise ValueError(
+                f"Multiple writing calls to the same filename·s: {duplicates}"
+            )
+
+    def create_directories(self) -> None:
+        """Create missing directories concurrently."""
+        missing = self.get_missing_directories()
+        for d in missing:
+            log.debug("Creating output directory %s", d)
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            # consume to raise errors
+            list(executor.map(lambda d: os.makedirs(d, exist_ok=True), missing))
+
+    def check_disk_space(self) -> None:
+        """Log a warning if estimated size is larger than free space.
+
+        The estimation does not account for compression and could be largely
+        overestimated, so this does not raise.
+        """
+        total = self.total_nbytes
+        if total is None:
+            return
+        free = self.get_free_space()
+        if len(free) == 1 and total > (available := next(iter(free.values()))):
+            log.warning(
+                "Estimated size of outputs (%s) exceeds free disk space (%s)",
+                format_nbytes(total),
+                format_nbytes(available),
+            )
+
+    def check(self) -> None:
+        """Run all checks and create directories, only once."""
+        if self.checked:
+            return
+        self.check_duplicates()
+        self.create_directories()
+        self.check_disk_space()
+        self.checked = True
+
+    def report(self) -> str:
+        """Return a description of the plan, without running checks."""
+        lines = [
+            f"{len(self.calls)} calls to {len(self.directories)} directories "
+            f"({len(self.get_missing_directories())} to create)"
+        ]
+        total = self.total_nbytes
+        if total is not None:
+            lines.append(f"Estimated size: {format_nbytes(total)}")
+        for directory, free in self.get_free_space().items():
+            lines.append(f"Free space: {format_nbytes(free)} on {directory}")
+        if duplicates := self.get_duplicates():
+            lines.append(f"Duplicate targets: {duplicates}")
+        for target, nbytes in zip(self.targets, self.nbytes):
+            size = "?" if nbytes is None else format_nbytes(nbytes)
+            lines.append(f"\t{target} ({size})")
+        return "\n".join(lines)
+
+
+class BackgroundWriter:
+    """Execute writing functions one after the other in a background thread.
+
+    Tasks wait in a queue of limited size: :meth:`submit` blocks when it is full. This
+    way the main thread can prepare the next call while the previous one is being
+    written, without piling up data in memory.
+
+    An exception raised in the background thread is raised again in the main thread at
+    the next :meth:`submit` or when exiting the context. Remaining tasks are then
+    discarded. Use as a context manager::
+
+        with BackgroundWriter(queue_depth=2) as writer:
+            for i, call in enumerate(calls):
+                writer.submit(i, write_function, call)
+        results = writer.results
+
+    Parameters
+    ----------
+    queue_depth
+        Maximum number of tasks waiting to be executed.
+    """
+
+    def __init__(self, queue_depth: int = 1) -> None:
+        if queue_depth < 1:
+            raise ValueError(f"Queue depth must be positive (got {queue_depth}).")
+        self.queue: queue.Queue[tuple[int, Callable, tuple] | None] = queue.Queue(
+            maxsize=queue_depth
+        )
+        self.results: dict[int, Any] = {}
+        """Results of tasks, by index."""
+        self.error: BaseException | None = None
+        self.cancelled: bool = False
+        self.thread = threading.Thread(
+            target=self._run, name="neba-background-writer", daemon=True
+        )
+
+    def _run(self) -> None:
+        while (task := self.queue.get()) is not None:
+            index, func, args = task
+            if self.error is None and not self.cancelled:
+                try:
+                    self.results[index] = func(*args)
+                except BaseException as exc:
+                    self.error = exc
+
+    def _raise(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, index: int, func: Callable, *args: Any) -> None:
+        """Put a task in the queue, wait if it is full."""
+        self._raise()
+        self.queue.put((index, func, args))
+
+    def __enter__(self) -> BackgroundWriter:
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type: type | None, *args: Any) -> None:
+        if exc_type is not None:
+            self.cancelled = True
+        self.queue.put(None)
+        self.thread.join()
+        if exc_type is None:
+            self._raise()
+
+
 class WriterAbstract(Generic[T_Source_contra, T_Data], Module):
     """Abstract class of Writer module."""
 
     metadata_generator = MetadataGenerator
 
+    fingerprint_ignore: list[str] = ["creation_time", "creation_hostname"]
+    """Metadata items that are not taken into account in fingerprints.
+
+    They change from one run to the next without the written data changing.
+    """
+
     def get_metadata(self, **kwargs: Any) -> dict[str, Any]:
         """Get information on how data was created.
 
@@ -434,8 +790,9 @@ class WriterAbstract(Generic[T_Source_contra, T_Data], Module):
         kwargs
             Options passed to :class:`MetadataOptions`
         """
-        generator = self.metadata_generator(self.di, **kwargs)
-        return generator.generate()
+        with self.span("metadata"):
+            generator = self.metadata_generator(self.di, **kwargs)
+            return generator.generate()
 
     def write(
         self,
@@ -463,21 +820,22 @@ class WriterAbstract(Generic[T_Source_contra, T_Data], Module):
         """
         raise NotImplementedError("Implement in a module subclass.")
 
+    def estimate_nbytes(self, data: T_Data) -> int | None:
+        """Return estimated size in bytes of data once written.
+
+        Return None if it cannot be estimated (default).
+        """
+        return None
+
+    def plan(self, calls: Iterable[tuple[T_Source_contra, T_Data]]) -> WritePlan:
+        """Return a :class:`WritePlan` for these calls."""
+        return WritePlan(calls, estimate_nbytes=self.estimate_nbytes)
+
     def check_directories(
         self, calls: Sequence[tuple[T_Source_contra, T_Data]]
     ) -> None:
         """Check if directories are missing, and create them if necessary."""
-        files = [f for f, _ in calls]
-
-        # Keep only the containing directories, with no duplicate
-        directories = set()
-        for f in files:
-            directories.add(path.dirname(cast(str | os.PathLike, f)))
-
-        for d in directories:
-            if not path.isdir(d):
-                log.debug("Creating output directory %s", d)
-                os.makedirs(d)
+        WritePlan(calls).create_directories()
 
     def check_directory(self, call: tuple[T_Source_contra, T_Data]) -> None:
         """Check if directory is missing, and create it if necessary."""
@@ -487,16 +845,57 @@ class WriterAbstract(Generic[T_Source_contra, T_Data], Module):
         self, calls: Sequence[tuple[T_Source_contra, T_Data]]
     ) -> None:
         """Check if some calls have the same filename."""
-        outfiles = [f for f, _ in calls]
-        duplicates = []
-        for f in set(outfiles):
-            if outfiles.count(f) > 1:
-                duplicates.append(f)
+        WritePlan(calls).check_duplicates()
 
-        if duplicates:
-            raise ValueError(
-                f"Multiple writing calls to the same filename·s: {duplicates}"
-            )
+    def check_calls_stream(
+        self, calls: Iterable[tuple[T_Source_contra, T_Data]]
+    ) -> Iterator[tuple[T_Source_contra, T_Data]]:
+        """Check calls as they are generated.
+
+        Equivalent of :meth:`check_overwriting_calls` and :meth:`check_directories` for
+        calls that are not all known in advance. Only the targets already seen are kept
+        in memory. A duplicate target raises a ValueError when it is reached, calls
+        before it may have been sent already.
+
+        The estimated size of the calls seen so far (see :meth:`estimate_nbytes`) is
+        compared to the free space of their filesystem, as in
+        :meth:`WritePlan.check_disk_space`. A warning is logged once per filesystem.
+        """
+        seen: set[T_Source_contra] = set()
+        directories: dict[str | os.PathLike, int] = {}
+        free: dict[int, int] = {}
+        total: Counter[int] = Counter()
+        for call in calls:
+            outfile = call[0]
+            if outfile in seen:
+                raise ValueError(
+                    f"Multiple writing calls to the same filename: {outfile}"
+                )
+            seen.add(outfile)
+
+            directory = path.dirname(cast(str | os.PathLike, outfile))
+            if directory not in directories:
+                if not path.isdir(directory):
+                    log.debug("Creating output directory %s", directory)
+                    os.makedirs(directory, exist_ok=True)
+                device = os.stat(directory or ".").st_dev
+                if device not in free:
+                    free[device] = shutil.disk_usage(directory or ".").free
+                directories[directory] = device
+
+            nbytes = self.estimate_nbytes(call[1])
+            if nbytes is not None:
+                device = directories[directory]
+                exceeded = total[device] > free[device]
+                total[device] += nbytes
+                if not exceeded and total[device] > free[device]:
+                    log.warning(
+                        "Estimated size of outputs (%s) exceeds free disk space (%s)",
+                        format_nbytes(total[device]),
+                        format_nbytes(free[device]),
+                    )
+
+            yield call
 
     def send_single_call(
         self, call: tuple[T_Source_contra, T_Data], **kwargs: Any
@@ -512,8 +911,97 @@ class WriterAbstract(Generic[T_Source_contra, T_Data], Module):
         """
         raise NotImplementedError("Implement in a module subclass.")
 
+    def prepare_call(
+        self, call: tuple[T_Source_contra, T_Data]
+    ) -> tuple[T_Source_contra, T_Data]:
+        """Prepare a call before it is sent to a background writer.
+
+        This is run in the main thread, the prepared call is then written in the
+        background (see :meth:`send_calls`). Lazy data should be computed here, so
+        that the background thread only writes. By default, return the call as is.
+        """
+        return call
+
+    def tokenize_data(self, data: T_Data) -> str:
+        """Return a token identifying data content.
+
+        Used to compute fingerprints of calls for resumable writes. Metadata items in
+        :attr:`fingerprint_ignore` should be ignored.
+
+        :Not implemented: implement in a module subclass.
+        """
+        raise NotImplementedError("Implement in a module subclass.")
+
+    def get_fingerprint(
+        self, call: tuple[T_Source_contra, T_Data], **kwargs: Any
+    ) -> str:
+        """Return fingerprint of a call.
+
+        It is a hash of the target, the interface parameters, the data token (see
+        :meth:`tokenize_data`) and the arguments passed to the writing function.
+        """
+        target, data = call
+        try:
+            params = dict(self.di.parameters.direct)
+        except AttributeError:
+            params = {}
+
+        items = dict(
+            target=str(target),
+            params=params,
+            data=self.tokenize_data(data),
+            kwargs=kwargs,
+        )
+        serialized = json.dumps(items, sort_keys=True, default=_fingerprint_default)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def iter_outdated_calls(
+        self,
+        calls: Iterable[tuple[T_Source_contra, T_Data]],
+        manifest: WriteManifest,
+        **kwargs: Any,
+    ) -> Iterator[tuple[tuple[T_Source_contra, T_Data], str]]:
+        """Skip calls whose target is up-to-date in the manifest.
+
+        Yields calls that must be (re)written, along with their fingerprint.
+
+        Parameters
+        ----------
+        kwargs
+            Arguments passed to the writing function, used in fingerprints.
+        """
+        skipped = 0
+        for call in calls:
+            fingerprint = self._get_outdated_fingerprint(call, manifest, **kwargs)
+            if fingerprint is None:
+                skipped += 1
+                continue
+            yield call, fingerprint
+
+        if skipped:
+            log.info("Skipped %d up-to-date targets.", skipped)
+
+    def _get_outdated_fingerprint(
+        self,
+        call: tuple[T_Source_contra, T_Data],
+        manifest: WriteManifest,
+        **kwargs: Any,
+    ) -> str | None:
+        """Return fingerprint of a call, or None if its target is up-to-date."""
+        fingerprint = self.get_fingerprint(call, **kwargs)
+        if manifest.is_up_to_date(cast(str, call[0]), fingerprint):
+            log.debug("Skipping up-to-date target %s", call[0])
+            return None
+        return fingerprint
+
     def send_calls(
-        self, calls: Sequence[tuple[T_Source_contra, T_Data]], **kwargs: Any
+        self,
+        calls: Iterable[tuple[T_Source_contra, T_Data]] | WritePlan,
+        resume: bool = False,
+        queue_depth: int | None = None,
+        staging: bool | str | os.PathLike = False,
+        checksum: bool = False,
+        **kwargs: Any,
     ) -> list[Any]:
         """Send multiple calls serially.
 
@@ -522,13 +1010,123 @@ class WriterAbstract(Generic[T_Source_contra, T_Data], Module):
 
         Parameters
         ----------
+        calls
+            Sequence of calls, or a :class:`WritePlan` (that is only checked if it was
+            not already). It can also be an iterable (a generator for instance), in
+            which case each call is checked and sent as soon as it is generated (see
+            :meth:`check_calls_stream`).
+        resume
+            If True, targets are recorded in a :class:`.WriteManifest` with the
+            fingerprint of their call (see :meth:`get_fingerprint`). Targets that were
+            completely written by a call with the same fingerprint are skipped (and
+            their result is None). Others are removed and written again.
+        queue_depth
+            If not None, calls are written by a :class:`BackgroundWriter` thread. The
+            main thread prepares the next calls (see :meth:`prepare_call`), at most
+            `queue_depth` of them waiting to be written. This overlaps computation
+            and writing.
+        staging
+            If True or a directory, each call is first written to a
+            :class:`.StagingArea` inside that directory (by default ``$TMPDIR``), then
+            moved to its target in the background. This returns once all targets are
+            moved.
+        checksum
+            If True, record the size, modification time and hash of each written
+            target in a :class:`.WriteManifest`. Hashes are computed in a pool of
+            threads as soon as targets are written. Use :meth:`.WriteManifest.verify`
+            to check them later.
         kwargs
             Passed to writing function.
         """
-        self.check_overwriting_calls(calls)
-        self.check_directories(calls)
-
-        return [self.send_single_call(call, **kwargs) for call in calls]
+        if isinstance(calls, Sequence):
+            calls = self.plan(calls)
+        if isinstance(calls, WritePlan):
+            calls.check()
+        else:
+            calls = self.check_calls_stream(calls)
+
+        manifest = None
+        if resume or checksum:
+            manifest = WriteManifest(checksum=checksum)
+
+        stage: StagingArea | None = None
+        if staging is not False:
+            stage = StagingArea(None if staging is True else staging)
+            log.info("Staging targets in %s", stage.directory)
+
+        def send(call: tuple[T_Source_contra, T_Data], fingerprint: str | None) -> Any:
+            target = cast(str, call[0])
+
+            def finish() -> None:
+                if manifest is not None:
+                    manifest.finish(target, fingerprint)
+
+            if manifest is not None and fingerprint is not None:
+                manifest.start(target, fingerprint)
+
+            if stage is None:
+                with (
+                    self.span("write_call", target=target),
+                    self.measure_memory("write_call", target=target) as record,
+                ):
+                    result = self.send_single_call(call, **kwargs)
+                    if record is not None:
+                        record.nbytes = self.estimate_nbytes(call[1])
+                finish()
+                return result
+
+            staged = stage.stage(target)
+            try:
+                with (
+                    self.span("write_call", target=target, staged=staged),
+                    self.measure_memory("write_call", target=target) as record,
+                ):
+                    staged_call = (cast(T_Source_contra, staged), call[1])
+                    result = self.send_single_call(staged_call, **kwargs)
+                    if record is not None:
+                        record.nbytes = self.estimate_nbytes(call[1])
+            except BaseException:
+                stage.discard(staged)
+                raise
+            stage.move(staged, target, callback=finish)
+            return result
+
+        results: list[Any] = []
+        skipped = 0
+        background = None if queue_depth is None else BackgroundWriter(queue_depth)
+        with (
+            self.span("send_calls"),
+            stage or nullcontext(),
+            background or nullcontext(),
+        ):
+            for call in calls:
+                fingerprint = None
+                if manifest is not None and resume:
+                    fingerprint = self._get_outdated_fingerprint(
+                        call, manifest, **kwargs
+                    )
+                    if fingerprint is None:
+                        skipped += 1
+                        results.append(None)
+                        continue
+
+                if background is None:
+                    results.append(send(call, fingerprint))
+                else:
+                    with self.span("prepare_call", target=call[0]):
+                        prepared = self.prepare_call(call)
+                    background.submit(len(results), send, prepared, fingerprint)
+                    results.append(None)
+
+        if background is not None:
+            for index, result in background.results.items():
+                results[index] = result
+
+        if skipped:
+            log.info("Skipped %d up-to-date targets.", skipped)
+        if manifest is not None:
+            manifest.compact()
+        return results
 
 
 T = TypeVar("T", covariant=True)
@@ -2,17 +2,23 @@
 
 from __future__ import annotations
 
+import itertools
 import logging
+import math
 import os
-from collections.abc import Callable, Hashable, Mapping, Sequence
+import tempfile
+import time
+from collections.abc import Callable, Hashable, Iterable, Iterator, Mapping, Sequence
 from typing import TYPE_CHECKING, Any, Literal, cast, overload
 
 import xarray as xr
 
-from neba.utils import cut_in_slices
+from neba.utils import format_nbytes, get_classname
 
 from .loader import LoaderAbstract
-from .writer import SplitWriterMixin, WriterAbstract
+from .manifest import WriteManifest, stat_target
+from .source import _DATE_GROUPS, FileFinderSource
+from .writer import SplitWriterMixin, WritePlan, WriterAbstract
 
 if TYPE_CHECKING:
     try:
@@ -22,6 +28,8 @@ if TYPE_CHECKING:
         Delayed = None  # type: ignore
         Client = None  # type: ignore
 
+    from .interface import DataInterface
+
     CallXr = tuple[str, xr.Dataset]
 
 
@@ -79,15 +87,219 @@ class XarrayLoader(LoaderAbstract[str | os.PathLike, xr.Dataset]):
         return ds
 
 
+class EncodingPlanner:
+    """Choose the encoding of variables by trying candidates on a sample.
+
+    For each variable, a sample of its data (at most :attr:`sample_nbytes`, taken
+    along its first dimension) is written with each candidate encoding (see
+    :meth:`get_candidates`) and read back. The compression ratio and the write and
+    read throughputs are measured, and the candidate with the best score for the
+    :attr:`objective` is chosen.
+
+    Choices are cached by format, variable name, data type, dimensions and sizes of
+    the dimensions other than the first (some candidates set chunk sizes from them):
+    later datasets reuse them without benchmarking again.
+    """
+
+    objective: str | Callable[[dict[str, float]], float] = "balanced"
+    """Objective to maximize. Can be:
+
+    * "size": compression ratio
+    * "speed": harmonic mean of write and read throughputs
+    * "balanced": compression ratio, penalized if write throughput is below
+      :attr:`min_throughput`
+    * a function taking the measures (``ratio``, ``write`` and ``read`` throughputs
+      in bytes per second) and returning a score to maximize.
+    """
+
+    min_throughput: float = 50e6
+    """Minimal write throughput (in bytes per second) for the "balanced" objective."""
+
+    sample_nbytes: int = 2**22
+    """Maximum size of the data sample used for benchmarking."""
+
+    compression_levels: list[int] = [1, 4, 9]
+    """Compression levels tried."""
+
+    def __init__(self) -> None:
+        self.cache: dict[tuple, dict[str, Any]] = {}
+
+    def get_sample(self, var: xr.DataArray) -> xr.DataArray:
+        """Return a sample of the variable data, loaded in memory."""
+        n = var.shape[0]
+        if var.nbytes > self.sample_nbytes:
+            n = max(1, n * self.sample_nbytes // var.nbytes)
+        return var.isel({var.dims[0]: slice(0, n)}).compute()
+
+    def get_candidates(
+        self, var: xr.DataArray, format: Literal["nc", "zarr"]
+    ) -> list[dict[str, Any]]:
+        """Return candidate encodings for a variable.
+
+        Without compression or with different compression levels (and once without
+        shuffling), with default chunks or chunks of one element along the first
+        dimension. Chunks are not changed for Zarr if data is backed by Dask.
+        """
+        slice_chunks = (1, *var.shape[1:])
+        mid = self.compression_levels[len(self.compression_levels) // 2]
+        levels = [(level, True) for level in self.compression_levels] + [(mid, False)]
+
+        compressions: list[dict[str, Any]]
+        if format == "nc":
+            compressions = [dict(zlib=False)] + [
+                dict(zlib=True, complevel=level, shuffle=shuffle)
+                for level, shuffle in levels
+            ]
+            chunks = [{}, dict(chunksizes=slice_chunks)]
+        else:
+            import zarr
+
+            if int(zarr.__version__.split(".")[0]) >= 3:
+                from zarr.codecs import BloscCodec
+
+                compressions = [dict(compressors=None)] + [
+                    dict(
+                        compressors=[
+                            BloscCodec(
+                                cname="zstd",
+                                clevel=level,
+                                shuffle="shuffle" if shuffle else "noshuffle",
+                            )
+                        ]
+                    )
+                    for level, shuffle in levels
+                ]
+            else:
+                from numcodecs import Blosc
+
+                compressions = [dict(compressor=None)] + [
+                    dict(
+                        compressor=Blosc(
+                            cname="zstd",
+                            clevel=level,
+                            shuffle=Blosc.SHUFFLE if shuffle else Blosc.NOSHUFFLE,
+                        )
+                    )
+                    for level, shuffle in levels
+                ]
+            chunks = [{}]
+            if var.chunks is None:
+                chunks.append(dict(chunks=slice_chunks))
+
+        return [comp | chunk for comp in compressions for chunk in chunks]
+
+    def benchmark(
+        self,
+        sample: xr.DataArray,
+        encoding: dict[str, Any],
+        format: Literal["nc", "zarr"],
+        directory: str,
+    ) -> dict[str, float]:
+        """Write and read the sample with an encoding, return measures."""
+        ds = sample.to_dataset(name="sample")
+        target = os.path.join(directory, f"sample.{format}")
+
+        start = time.perf_counter()
+        if format == "nc":
+            ds.to_netcdf(target, encoding=dict(sample=encoding))
+        else:
+            ds.to_zarr(target, encoding=dict(sample=encoding), mode="w")
+        write_time = time.perf_counter() - start
+
+        size, _ = stat_target(target)
+
+        start = time.perf_counter()
+        with xr.open_dataset(
+            target, engine="zarr" if format == "zarr" else None
+        ) as read:
+            read["sample"].load()
+        read_time = time.perf_counter() - start
+
+        nbytes = sample.nbytes
+        return dict(
+            ratio=nbytes / max(size, 1),
+            write=nbytes / max(write_time, 1e-9),
+            read=nbytes / max(read_time, 1e-9),
+        )
+
+    def score(self, measures: dict[str, float]) -> float:
+        """Return the score of measures for the objective."""
+        if callable(self.objective):
+            return self.objective(measures)
+        if self.objective == "size":
+            return measures["ratio"]
+        if self.objective == "speed":
+            return 1 / (1 / measures["write"] + 1 / measures["read"])
+        if self.objective == "balanced":
+            penalty = min(1.0, measures["write"] / self.min_throughput)
+            return measures["ratio"] * penalty
+        raise ValueError(f"Unknown objective '{self.objective}'")
+
+    def choose(
+        self, name: Hashable, var: xr.DataArray, format: Literal["nc", "zarr"]
+    ) -> dict[str, Any]:
+        """Return the best encoding for a variable, benchmarking if not cached."""
+        key = (format, name, var.dtype.str, var.dims, var.shape[1:])
+        if key in self.cache:
+            return self.cache[key]
+
+        sample = self.get_sample(var)
+        best, best_score = {}, -math.inf
+        with tempfile.TemporaryDirectory(prefix="neba-encoding-") as directory:
+            for encoding in self.get_candidates(var, format):
+                measures = self.benchmark(sample, encoding, format, directory)
+                score = self.score(measures)
+                log.debug(
+                    "Encoding %s for '%s': ratio %.2f, write %s/s, read %s/s",
+                    encoding,
+                    name,
+                    measures["ratio"],
+                    format_nbytes(measures["write"]),
+                    format_nbytes(measures["read"]),
+                )
+                if score > best_score:
+                    best, best_score = encoding, score
+
+        log.info("Chose encoding %s for variable '%s'", best, name)
+        self.cache[key] = best
+        return best
+
+    def get_encoding(
+        self, ds: xr.Dataset, format: Literal["nc", "zarr"]
+    ) -> dict[Hashable, dict[str, Any]]:
+        """Return encoding for all numerical data variables of a dataset."""
+        return {
+            name: self.choose(name, var, format)
+            for name, var in ds.data_vars.items()
+            if var.ndim > 0 and var.dtype.kind in "biufc"
+        }
+
+
 class XarrayWriter(WriterAbstract[str, xr.Dataset]):
     """Write Xarray dataset."""
 
     to_netcdf_kwargs: dict[str, Any] = {}
-    """Arguments passed to the function writing files."""
+    """Arguments passed to the function writing files.
+
+    If the ``encoding`` argument is "auto", it is chosen by the
+    :attr:`encoding_planner`. This is also true for :attr:`to_zarr_kwargs`.
+    """
+
+    encoding_planner: type[EncodingPlanner] = EncodingPlanner
+    """Class choosing encodings when ``encoding="auto"``. One instance is kept for
+    each writer, so that choices are reused."""
 
     to_zarr_kwargs: dict[str, Any] = {}
     """Arguments passed to the writing function for zarr stores."""
 
+    auto_chop_memory_fraction: float = 0.5
+    """Fraction of the total memory of workers a group of calls can use, when
+    ``chop="auto"``."""
+
+    auto_chop_duration: float = 30.0
+    """Duration of a group of calls (in seconds) that is aimed for, when
+    ``chop="auto"``."""
+
     def _guess_format(self, filename: str) -> Literal["nc", "zarr"]:
         _, ext = os.path.splitext(filename)
         if ext:
@@ -156,13 +368,54 @@ class XarrayWriter(WriterAbstract[str, xr.Dataset]):
         log.debug("Sending single call to %s", outfile)
         if format == "nc":
             kwargs = self.to_netcdf_kwargs | kwargs
+        elif format == "zarr":
+            kwargs = self.to_zarr_kwargs | kwargs
+        else:
+            raise ValueError(f"File format '{format}' not supported.")
+
+        if isinstance(kwargs.get("encoding"), str) and kwargs["encoding"] == "auto":
+            kwargs["encoding"] = self.get_auto_encoding(ds, format)
+
+        if format == "nc":
             return ds.to_netcdf(outfile, **kwargs)
+        return ds.to_zarr(outfile, **kwargs)
 
-        if format == "zarr":
-            kwargs = self.to_zarr_kwargs | kwargs
-            return ds.to_zarr(outfile, **kwargs)
+    def get_auto_encoding(
+        self, ds: xr.Dataset, format: Literal["nc", "zarr"]
+    ) -> dict[Hashable, dict[str, Any]]:
+        """Return encoding chosen by the :attr:`encoding_planner`.
+
+        The planner instance is kept, so choices are only made once per interface.
+        """
+        planner = self.__dict__.get("_encoding_planner", None)
+        if planner is None:
+            planner = self.encoding_planner()
+            self._encoding_planner = planner
+        return planner.get_encoding(ds, format)
+
+    def prepare_call(self, call: CallXr) -> CallXr:
+        """Load the dataset in memory, so that it is only written in background."""
+        outfile, ds = call
+        return outfile, ds.compute()
+
+    def tokenize_data(self, data: xr.Dataset) -> str:
+        """Return a token identifying the dataset.
+
+        Uses :func:`dask.base.tokenize`. For variables backed by Dask this is the token
+        of the task graph, otherwise a hash of the content. Attributes listed in
+        :attr:`~.WriterAbstract.fingerprint_ignore` are not taken into account.
+        """
+        from dask.base import tokenize
+
+        data = data.copy(deep=False)
+        data.attrs = {
+            k: v for k, v in data.attrs.items() if k not in self.fingerprint_ignore
+        }
+        return tokenize(data)
 
-        raise ValueError(f"File format '{format}' not supported.")
+    def estimate_nbytes(self, data: xr.Dataset) -> int:
+        """Return size of the dataset in memory, without compression."""
+        return data.nbytes
 
     def add_metadata(
         self,
@@ -195,10 +448,13 @@ class XarrayWriter(WriterAbstract[str, xr.Dataset]):
 
     def send_calls_together(
         self,
-        calls: Sequence[CallXr],
+        calls: Iterable[CallXr] | WritePlan,
         client: Client,
-        chop: int | None = None,
+        chop: int | Literal["auto"] | None = None,
         format: Literal["nc", "zarr", None] = None,
+        max_in_flight: int | None = None,
+        resume: bool = False,
+        checksum: bool = False,
         **kwargs: Any,
     ) -> None:
         """Send multiple calls together.
@@ -216,41 +472,167 @@ class XarrayWriter(WriterAbstract[str, xr.Dataset]):
 
         Parameters
         ----------
+        calls
+            Sequence of calls, or a :class:`.WritePlan`. It can also be an iterable (a
+            generator for instance), in which case calls are only generated when they
+            are about to be sent (see :meth:`~.WriterAbstract.check_calls_stream`).
         client
             Dask :class:`Client` instance.
         chop
             If None (default), all calls are sent together. If chop is an integer,
             groups of calls of size ``chop`` (at most) will be sent one after the other,
-            calls within each group being run in parallel.
+            calls within each group being run in parallel. If "auto", the size of
+            groups is chosen from the memory of workers and adapted to the time groups
+            take to complete (see :meth:`iter_auto_groups`).
+        max_in_flight
+            If not None, ignore `chop` and keep at most this number of calls running at
+            the same time. A new call is sent as soon as one completes.
+        resume
+            If True, skip targets that are up-to-date. See
+            :meth:`~.WriterAbstract.send_calls`.
+        checksum
+            If True, record the hash of written targets. See
+            :meth:`~.WriterAbstract.send_calls`.
         kwargs
             Passed to writing function. Overwrites the defaults from
             :attr:`to_netcdf_kwargs` or :attr:`to_zarr_kwargs`.
         """
         import distributed
 
-        self.check_overwriting_calls(calls)
-        self.check_directories(calls)
-
-        ncalls = len(calls)
-        if chop is None:
-            chop = ncalls
+        if isinstance(chop, int) and chop < 1:
+            raise ValueError(f"Size of groups of calls must be positive (got {chop}).")
 
-        slices = cut_in_slices(ncalls, chop)
-        log.info("%d total calls in %d groups.", ncalls, len(slices))
+        if isinstance(calls, Sequence):
+            calls = self.plan(calls)
+        if isinstance(calls, WritePlan):
+            calls.check()
+            log.info("%d total calls.", len(calls))
+        else:
+            calls = self.check_calls_stream(calls)
+            if chop is None and max_in_flight is None:
+                # everything is sent at once anyway
+                calls = list(calls)
+
+        manifest = None
+        if resume or checksum:
+            manifest = WriteManifest(checksum=checksum)
+        calls_fingerprints: Iterable[tuple[CallXr, str | None]]
+        if manifest is not None and resume:
+            calls_fingerprints = self.iter_outdated_calls(calls, manifest, **kwargs)
+        else:
+            calls_fingerprints = ((call, None) for call in calls)
 
         kwargs = self.to_netcdf_kwargs | kwargs
         kwargs["compute"] = False
 
-        for slc in slices:
-            log.info("\tslice %s", slc)
+        # target and fingerprint of running calls, by future key
+        running_calls: dict[str, tuple[str, str | None]] = {}
+
+        def submit(items: Sequence[tuple[CallXr, str | None]]) -> list[Any]:
+            for call, fingerprint in items:
+                if manifest is not None and fingerprint is not None:
+                    manifest.start(call[0], fingerprint)
+            delayed = [self.send_single_call(call, **kwargs) for call, _ in items]
+            futures = client.compute(delayed)
+            for future, (call, fingerprint) in zip(futures, items):
+                running_calls[future.key] = (call[0], fingerprint)
+            return futures
+
+        def completed(future: Any) -> None:
+            log.debug("\t\tfuture completed: %s", future)
+            target, fingerprint = running_calls.pop(future.key)
+            if manifest is not None and future.status == "finished":
+                manifest.finish(target, fingerprint)
+
+        if max_in_flight is not None:
+            log.info("Sending calls with at most %d in flight.", max_in_flight)
+            running = distributed.as_completed()
+            for item in calls_fingerprints:
+                if running.count() >= max_in_flight:
+                    completed(next(running))
+                running.update(submit([item]))
+            for future in running:
+                completed(future)
+        else:
+            groups: Iterator[list[tuple[CallXr, str | None]]]
+            if chop == "auto":
+                groups = self.iter_auto_groups(calls_fingerprints, client)
+            else:
+                iterator = iter(calls_fingerprints)
+                groups = iter(lambda: list(itertools.islice(iterator, chop)), [])
 
-            grouped_calls = calls[slc]
-            delayed = [self.send_single_call(c, **kwargs) for c in grouped_calls]
+            for grouped_calls in groups:
+                log.info("\tgroup of %d calls", len(grouped_calls))
 
-            # Futures are deleted as soon as they go out of scope. They do not pile up
-            # but we still return only when all are completed.
-            for future in distributed.as_completed(client.compute(delayed)):
-                log.debug("\t\tfuture completed: %s", future)
+                # Futures are deleted as soon as they go out of scope. They do not pile
+                # up but we still return only when all are completed.
+                with self.span("write_group", size=len(grouped_calls)):
+                    for future in distributed.as_completed(submit(grouped_calls)):
+                        completed(future)
+
+        if manifest is not None:
+            manifest.compact()
+
+    def iter_auto_groups(
+        self, items: Iterable[tuple[CallXr, str | None]], client: Client
+    ) -> Iterator[list[tuple[CallXr, str | None]]]:
+        """Group calls, adapting the size of groups to the cluster.
+
+        A group cannot hold more data (estimated with :meth:`estimate_nbytes`) than
+        :attr:`auto_chop_memory_fraction` of the total memory of workers. The first
+        group has as many calls as there are threads on workers. The size of the
+        following groups is multiplied by the ratio of :attr:`auto_chop_duration` to
+        the duration of the previous group (at most doubled or halved). The consumer
+        must complete each group before asking for the next one.
+
+        Parameters
+        ----------
+        items
+            Calls to send, along with any other information.
+        client
+            Dask :class:`Client` instance used to get the workers memory and number of
+            threads.
+        """
+        workers = client.scheduler_info()["workers"].values()
+        memory = sum(w.get("memory_limit", 0) or 0 for w in workers)
+        budget = self.auto_chop_memory_fraction * memory if memory else None
+        size = max(1, sum(w.get("nthreads", 1) for w in workers))
+        log.info(
+            "Automatic groups of calls: at most %s per group, %d calls at first.",
+            "?" if budget is None else format_nbytes(budget),
+            size,
+        )
+
+        schedule: list[int] = []
+        group: list[tuple[CallXr, str | None]] = []
+        group_nbytes = 0
+        for item in itertools.chain(items, [None]):
+            nbytes = 0 if item is None else self.estimate_nbytes(item[0][1])
+            full = len(group) >= size or (
+                budget is not None and group_nbytes + nbytes > budget
+            )
+            if group and (item is None or full):
+                start = time.perf_counter()
+                yield group
+                duration = time.perf_counter() - start
+
+                schedule.append(len(group))
+                ratio = self.auto_chop_duration / max(duration, 1e-3)
+                size = max(1, round(len(group) * min(max(ratio, 0.5), 2.0)))
+                log.info(
+                    "\tgroup of %d calls (%s) took %.1fs, next group: %d calls",
+                    len(group),
+                    format_nbytes(group_nbytes),
+                    duration,
+                    size,
+                )
+                group, group_nbytes = [], 0
+
+            if item is not None:
+                group.append(item)
+                group_nbytes += nbytes
+
+        log.info("Schedule of groups sizes: %s", schedule)
 
     def write(
         self,
@@ -258,6 +640,11 @@ class XarrayWriter(WriterAbstract[str, xr.Dataset]):
         target: str | Sequence[str] | None = None,
         metadata_kwargs: Mapping[str, Any] | None = None,
         client: Client | None = None,
+        resume: bool = False,
+        dry_run: bool = False,
+        queue_depth: int | None = None,
+        staging: bool | str | os.PathLike = False,
+        checksum: bool = False,
         **kwargs: Any,
     ) -> Any:
         """Write datasets to multiple targets.
@@ -280,6 +667,23 @@ class XarrayWriter(WriterAbstract[str, xr.Dataset]):
         metadata_kwargs
             Passed to the :attr:`~.WriterAbstract.metadata_generator`. See
             :class:`.MetadataOptions` for available options.
+        resume
+            If True, skip targets that were already written with the same parameters,
+            data and metadata. See :meth:`~.WriterAbstract.send_calls`.
+        dry_run
+            If True, do not write anything. The :class:`.WritePlan` is logged (see
+            :meth:`.WritePlan.report`) and returned.
+        queue_depth
+            If not None and calls are sent serially, datasets are written in a
+            background thread while the next ones are computed. See
+            :meth:`~.WriterAbstract.send_calls`.
+        staging
+            If True or a directory, write each target to a local staging directory
+            first, then move it to its location in the background. Only when calls
+            are sent serially. See :meth:`~.WriterAbstract.send_calls`.
+        checksum
+            If True, record the hash of written targets in a manifest. See
+            :meth:`~.WriterAbstract.send_calls`.
         kwargs
             Passed to the function that writes to disk
             (:meth:`xarray.Dataset.to_netcdf` or :meth:`xarray.Dataset.to_zarr`).
@@ -301,13 +705,26 @@ class XarrayWriter(WriterAbstract[str, xr.Dataset]):
                 f"Number of writing targets ({len(target)}) differing from "
                 f"number of datasets ({len(data)})"
             )
-        calls = list(zip(target, data))
-
-        self.check_directories(calls)
-        self.check_overwriting_calls(calls)
-        if len(calls) > 1 and client is not None:
-            return self.send_calls_together(calls, client, **kwargs)
-        return self.send_calls(calls, **kwargs)
+        plan = self.plan(zip(target, data))
+        if dry_run:
+            log.info("Write plan:\n%s", plan.report())
+            return plan
+
+        plan.check()
+        if len(plan) > 1 and client is not None:
+            if staging is not False:
+                raise ValueError("Staging is not supported when using Dask.")
+            return self.send_calls_together(
+                plan, client, resume=resume, checksum=checksum, **kwargs
+            )
+        return self.send_calls(
+            plan,
+            resume=resume,
+            queue_depth=queue_depth,
+            staging=staging,
+            checksum=checksum,
+            **kwargs,
+        )
 
 
 class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
@@ -329,6 +746,10 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
     all at once (``chop=None``, default) or limited to parallels groups of smaller
     size that will run serially.
 
+    Splitting, creating calls and adding metadata are chained generators: the first
+    call is sent as soon as it is ready and only the calls being sent are kept in
+    memory (unless all calls are sent at once with Dask).
+
     Both parts (of splitting the xarray dataset and sending calls) can be used
     separately, if there is a need for more flexibility or missing features.
     """
@@ -351,6 +772,20 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
     The pattern names are arranged in increasing order.
     """
 
+    chunk_alignment: Literal["auto", "rechunk", "warn", "ignore"] = "auto"
+    """What to do when time groups are not aligned with Dask chunks.
+
+    If "auto", rechunk if the estimated cost of reading partial chunks is larger than
+    that of rechunking, and if rechunked chunks are not too large. Otherwise warn. See
+    :meth:`align_time_chunks`.
+    """
+
+    rechunk_cost_factor: float = 0.5
+    """Estimated cost of rechunking, relative to reading the whole data once."""
+
+    max_chunk_nbytes: int = 2**29
+    """Maximum size of chunks obtained by rechunking to time groups."""
+
     def write(  # type: ignore[override]
         self,
         data: xr.Dataset,
@@ -358,10 +793,16 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
         time_freq: str | bool = True,
         squeeze: bool | str | Mapping[Hashable, bool | str] = False,
         client: Client | None = None,
-        chop: int | None = None,
+        chop: int | Literal["auto"] | None = None,
+        max_in_flight: int | None = None,
         metadata_kwargs: Mapping[str, Any] | None = None,
+        resume: bool = False,
+        dry_run: bool = False,
+        queue_depth: int | None = None,
+        staging: bool | str | os.PathLike = False,
+        checksum: bool = False,
         **kwargs: Any,
-    ) -> list[Delayed | xr.backends.ZarrStore | None] | None:
+    ) -> list[Delayed | xr.backends.ZarrStore | None] | WritePlan | None:
         """Write data to disk.
 
         First split datasets following the parameters that vary in the filename pattern.
@@ -407,10 +848,36 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
         chop
             If None (default), all calls are sent together. If chop is an integer,
             groups of calls of size ``chop`` (at most) will be sent one after the other,
-            calls within each group being run in parallel.
+            calls within each group being run in parallel. If "auto", the size of
+            groups is adapted to the cluster (see :meth:`iter_auto_groups`).
+        max_in_flight
+            If not None, keep at most this number of calls running in parallel, a new
+            call being sent as soon as one completes. Takes precedence over `chop`.
         metadata_kwargs
             Passed to the :attr:`~.WriterAbstract.metadata_generator`. See
             :class:`.MetadataOptions` for available options.
+        resume
+            If True, skip files that were already written with the same parameters,
+            data and metadata. Files that were only partially written are replaced.
+            See :meth:`~.WriterAbstract.send_calls`.
+        dry_run
+            If True, do not write anything. All calls are generated (without computing
+            any data) in a :class:`.WritePlan` that is logged (see
+            :meth:`.WritePlan.report`) and returned. Otherwise, calls are checked as
+            they are generated, including the free disk space (see
+            :meth:`~.WriterAbstract.check_calls_stream`).
+        queue_depth
+            If not None and calls are sent serially, each file is written in a
+            background thread while the next ones are computed, at most `queue_depth`
+            of them waiting. See :meth:`~.WriterAbstract.send_calls`.
+        staging
+            If True or a directory, write each file to a local staging directory
+            first (by default ``$TMPDIR``), then move it to its location in the
+            background. Only when calls are sent serially. See
+            :meth:`~.WriterAbstract.send_calls`.
+        checksum
+            If True, record the hash of written files in a manifest. See
+            :meth:`~.WriterAbstract.send_calls`.
         kwargs:
             Passed to the function that writes to disk
             (:meth:`xarray.Dataset.to_netcdf`).
@@ -418,26 +885,270 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
         if target is not None:
             raise ValueError("Target files cannot be specified using the SplitWriter.")
 
-        datasets_by_fix = self.split_by_unfixed(data)
+        if metadata_kwargs is None:
+            metadata_kwargs = {}
+        metadata = self.get_metadata(**metadata_kwargs)
+
+        splits = self.iter_splits(data, time_freq=time_freq)
+        calls = (
+            (f, self._add_metadata(ds, metadata))
+            for f, ds in self.iter_calls(splits, squeeze=squeeze)
+        )
+
+        if dry_run:
+            plan = self.plan(calls)
+            log.info("Write plan:\n%s", plan.report())
+            return plan
+
+        if client is not None:
+            if staging is not False:
+                raise ValueError("Staging is not supported when using Dask.")
+            self.send_calls_together(
+                calls,
+                client,
+                chop=chop,
+                max_in_flight=max_in_flight,
+                resume=resume,
+                checksum=checksum,
+                **kwargs,
+            )
+            return None
+        return self.send_calls(
+            calls,
+            resume=resume,
+            queue_depth=queue_depth,
+            staging=staging,
+            checksum=checksum,
+            **kwargs,
+        )
+
+    def write_store(
+        self,
+        data: xr.Dataset,
+        store: str | os.PathLike,
+        time_freq: str | bool = True,
+        append: bool = False,
+        client: Client | None = None,
+        max_in_flight: int | None = None,
+        metadata_kwargs: Mapping[str, Any] | None = None,
+        consolidate: bool = True,
+        **kwargs: Any,
+    ) -> None:
+        """Write data to a single Zarr store, one time group after the other.
+
+        The dataset is split along time (see :meth:`get_time_slices`), each group is
+        then written to its own region of the store.
+
+        By default, the store is first initialized from the full dataset (used as a
+        template): metadata, coordinates and variables without a time dimension are
+        written, but not the data of variables with a time dimension. Each group is
+        then written with ``to_zarr(region=...)``. The Zarr chunks along time are
+        chosen to fit the groups (see :meth:`get_store_time_chunk`), so that no chunk
+        is shared between two groups and groups can be written in parallel without
+        locks. If the groups are irregular (monthly groups of daily data for
+        instance), chunks cannot fit all of them: chunks are then shared between
+        groups, which are written serially (a Dask client is refused).
 
-        datasets_by_all = []
-        for dataset in datasets_by_fix:
-            datasets_by_all += self.split_by_time(dataset, time_freq=time_freq)
+        If `append` is True, groups are instead appended one after the other along the
+        time dimension (to an existing store, or one initialized by the first group).
+        This is done serially.
 
-        calls = self.to_calls(datasets_by_all, squeeze=squeeze)
+        Metadata is added to the dataset attributes, and the store metadata is finally
+        consolidated.
+
+        Parameters
+        ----------
+        data
+            Data to write. It must have a time dimension.
+        store
+            Location of the Zarr store.
+        time_freq
+            How to group the dataset along time. See :meth:`get_time_slices`.
+        append
+            If True, append each time group to the store instead of writing to regions
+            of an initialized store.
+        client
+            Dask :class:`distributed.Client` instance. If present, regions are written
+            in parallel.
+        max_in_flight
+            If not None, keep at most this number of regions being written at the same
+            time when using Dask.
+        metadata_kwargs
+            Passed to the :attr:`~.WriterAbstract.metadata_generator`. See
+            :class:`.MetadataOptions` for available options.
+        consolidate
+            If True (default), consolidate the store metadata once everything is
+            written.
+        kwargs
+            Passed to :meth:`xarray.Dataset.to_zarr`. Overwrites the defaults from
+            :attr:`to_zarr_kwargs`. The ``encoding`` argument is only used when
+            initializing the store, it can be "auto" (see :meth:`get_auto_encoding`).
+        """
+        import zarr
 
-        self.check_directories(calls)
-        self.check_overwriting_calls(calls)
+        if "time" not in data.dims:
+            raise ValueError("Dataset must have a time dimension.")
 
         if metadata_kwargs is None:
             metadata_kwargs = {}
-        metadata = self.get_metadata(**metadata_kwargs)
-        calls = [(f, self._add_metadata(ds, metadata)) for f, ds in calls]
+        data = self.add_metadata(data, **metadata_kwargs)
+
+        kwargs = self.to_zarr_kwargs | kwargs
+        kwargs["consolidated"] = False
+        encoding = kwargs.pop("encoding", {})
+        if isinstance(encoding, str) and encoding == "auto":
+            encoding = self.get_auto_encoding(data, "zarr")
+
+        with self.span("split_time"):
+            slices = self.get_time_slices(data, time_freq=time_freq)
+        log.info("Writing %d time groups to store %s", len(slices), store)
+
+        # variables that are not written group by group
+        static = [
+            name for name, var in data.variables.items() if "time" not in var.dims
+        ]
+
+        if append:
+            for i, slc in enumerate(slices):
+                split = data.isel(time=slc)
+                if i == 0 and not os.path.exists(store):
+                    log.debug("Initializing store with first group")
+                    split.to_zarr(store, mode="w-", encoding=encoding, **kwargs)
+                else:
+                    split.drop_vars(static).to_zarr(store, append_dim="time", **kwargs)
+        else:
+            chunk, aligned = self.get_store_time_chunk(data, slices)
+            if not aligned:
+                if client is not None:
+                    raise ValueError(
+                        "Time groups cannot be aligned with Zarr chunks, they cannot "
+                        "be written in parallel. Use regular groups or no client."
+                    )
+                log.info(
+                    "Time groups are irregular, Zarr chunks of size %d will be "
+                    "shared between groups.",
+                    chunk,
+                )
+                kwargs["safe_chunks"] = False
+            self._init_store(data, store, chunk, encoding=encoding, **kwargs)
+            store_path = os.fspath(store)
+
+            def write_region(slc: slice, compute: bool) -> Any:
+                split = data.isel(time=slc).drop_vars(static)
+                if split.chunks:
+                    # one Dask chunk per Zarr chunk, or a single one for the group
+                    # if it does not start on a chunk boundary
+                    split = split.chunk(time=chunk if aligned else -1)
+                region = {"time": slc}
+                if compute:
+                    return split.to_zarr(
+                        store_path, region=region, compute=True, **kwargs
+                    )
+                return split.to_zarr(store_path, region=region, compute=False, **kwargs)
+
+            if client is None:
+                for slc in slices:
+                    with self.span("write_region", start=slc.start, stop=slc.stop):
+                        write_region(slc, compute=True)
+            else:
+                import distributed
+
+                running = distributed.as_completed()
+                for slc in slices:
+                    if max_in_flight is not None and running.count() >= max_in_flight:
+                        log.debug("\tregion completed: %s", next(running))
+                    running.add(client.compute(write_region(slc, compute=False)))
+                for future in running:
+                    log.debug("\tregion completed: %s", future)
+
+        if consolidate:
+            zarr.consolidate_metadata(store)
+
+    def get_store_time_chunk(
+        self, data: xr.Dataset, slices: Sequence[slice]
+    ) -> tuple[int, bool]:
+        """Return the size of Zarr chunks along time for writing groups to a store.
+
+        If all groups (except the last one) are a multiple of the same size, chunks
+        fit the groups: chunks have the size of the Dask chunks of the input if those
+        divide the groups, otherwise the size of the groups. If groups are irregular,
+        chunks cannot be aligned with them: the size of the Dask chunks (or of the
+        largest group) is used.
 
-        if client is not None:
-            self.send_calls_together(calls, client, chop=chop, **kwargs)
-            return None
-        return self.send_calls(calls, **kwargs)
+        Returns
+        -------
+        chunk
+            Size of chunks along time.
+        aligned
+            True if every group starts on a chunk boundary.
+        """
+        sizes = [slc.stop - slc.start for slc in slices]
+        dask_chunk = None
+        for var in data.variables.values():
+            if var.chunks is not None and "time" in var.dims:
+                dask_chunk = var.chunksizes["time"][0]
+                break
+
+        if len(sizes) == 1:
+            return (sizes[0] if dask_chunk is None else dask_chunk), True
+
+        group = math.gcd(*sizes[:-1])
+        if group == min(sizes[:-1]):
+            if dask_chunk is not None and group % dask_chunk == 0:
+                return dask_chunk, True
+            return group, True
+        return (max(sizes) if dask_chunk is None else dask_chunk), False
+
+    def _init_store(
+        self,
+        data: xr.Dataset,
+        store: str | os.PathLike,
+        chunk: int,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize a Zarr store for writing time regions.
+
+        Zarr chunks along time have size `chunk`, unless specified manually in the
+        `encoding` argument.
+        """
+        log.debug("Chunks of size %d along time", chunk)
+
+        encoding = {k: dict(v) for k, v in kwargs.pop("encoding", {}).items()}
+        template = data.copy(deep=False)
+        for name, var in data.variables.items():
+            if name in data.indexes:
+                continue
+            if "time" not in var.dims:
+                # written now
+                if var.chunks is not None:
+                    template[name] = var.compute()
+                continue
+
+            # only write metadata
+            if var.chunks is None:
+                template[name] = var.chunk()
+            var_encoding = encoding.setdefault(str(name), {})
+            if "chunks" not in var_encoding:
+                var_encoding["chunks"] = tuple(
+                    chunk
+                    if d == "time"
+                    else (var.sizes[d] if var.chunks is None else var.chunksizes[d][0])
+                    for d in var.dims
+                )
+
+        log.debug("Initializing store %s", store)
+        template.to_zarr(store, mode="w", compute=False, encoding=encoding, **kwargs)
+
+    def iter_splits(
+        self, ds: xr.Dataset, time_freq: str | bool = True
+    ) -> Iterator[xr.Dataset]:
+        """Split dataset along unfixed parameters and time.
+
+        Generator chaining :meth:`iter_split_by_unfixed` and
+        :meth:`iter_split_by_time`.
+        """
+        for dataset in self.iter_split_by_unfixed(ds):
+            yield from self.iter_split_by_time(dataset, time_freq=time_freq)
 
     def split_by_time(
         self,
@@ -446,6 +1157,17 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
     ) -> list[xr.Dataset]:
         """Split dataset in time groups.
 
+        Return a list from :meth:`iter_split_by_time`.
+        """
+        return list(self.iter_split_by_time(ds, time_freq=time_freq))
+
+    def iter_split_by_time(
+        self,
+        ds: xr.Dataset,
+        time_freq: str | bool = True,
+    ) -> Iterator[xr.Dataset]:
+        """Split dataset in time groups.
+
         If the frequency of the dataset is the same as the target one, it will not be
         resampled to avoid unecessary work. There might be false positives (offsets
         maybe ?). In which case you should resample before manually, and set `time_freq`
@@ -468,9 +1190,9 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
         params:
             Parameters to replace for writing data.
 
-        Returns
-        -------
-        List of datasets
+        Yields
+        ------
+        Datasets for each time group.
 
         """
         unfixed = self.unfixed()
@@ -480,11 +1202,128 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
         # not time dimension or no unfixed params in filename pattern
         if "time" not in ds.dims or not unfixed:
             log.debug("Not splitting by time.")
-            return [ds]
+            yield ds
+            return
+
+        with self.span("split_time"):
+            slices = self.get_time_slices(ds, time_freq=time_freq)
+            ds = self.align_time_chunks(ds, slices)
+
+        # slices (rather than a list of indices) only return views on numpy arrays
+        for slc in slices:
+            yield ds.isel(time=slc)
+
+    def align_time_chunks(self, ds: xr.Dataset, slices: Sequence[slice]) -> xr.Dataset:
+        """Check that time groups are aligned with Dask chunks.
+
+        If a Dask chunk is shared by two time groups, it will be read (and computed)
+        for both. The extra data read is compared to the cost of rechunking the
+        dataset to the time groups (the data size times :attr:`rechunk_cost_factor`).
+        Depending on :attr:`chunk_alignment`, the dataset is then rechunked (Dask
+        variables only), or a warning is issued with frequencies that would be
+        aligned with the chunks.
+
+        Parameters
+        ----------
+        slices
+            Time groups, contiguous and sorted.
+
+        Returns
+        -------
+        Dataset, rechunked if necessary.
+        """
+        dask_vars = {
+            name: var
+            for name, var in ds.variables.items()
+            if var.chunks is not None and "time" in var.dims
+        }
+        if not dask_vars or self.chunk_alignment == "ignore":
+            return ds
+
+        chunk_bounds = {0}
+        for var in dask_vars.values():
+            chunk_bounds |= set(itertools.accumulate(var.chunksizes["time"]))
+        split_bounds = {slc.start for slc in slices} | {slc.stop for slc in slices}
+        misaligned = split_bounds - chunk_bounds
+        if not misaligned:
+            return ds
+
+        # estimate data read, in number of time steps
+        sorted_bounds = sorted(chunk_bounds)
+        chunks = list(itertools.pairwise(sorted_bounds))
+        touched = sum(
+            stop - start
+            for slc in slices
+            for start, stop in chunks
+            if start < slc.stop and stop > slc.start
+        )
+        size = ds.sizes["time"]
+        step_nbytes = sum(var.nbytes / size for var in dask_vars.values())
+        extra = (touched - size) * step_nbytes
+        rechunk_cost = self.rechunk_cost_factor * size * step_nbytes
+        largest = max(slc.stop - slc.start for slc in slices) * max(
+            var.nbytes / size for var in dask_vars.values()
+        )
+        log.info(
+            "%d time group boundaries are not aligned with Dask chunks. Estimated "
+            "extra data read: %s, cost of rechunking: %s (largest chunk %s).",
+            len(misaligned),
+            format_nbytes(extra),
+            format_nbytes(rechunk_cost),
+            format_nbytes(largest),
+        )
+
+        rechunk = self.chunk_alignment == "rechunk" or (
+            self.chunk_alignment == "auto"
+            and extra > rechunk_cost
+            and largest <= self.max_chunk_nbytes
+        )
+        if rechunk:
+            log.info("Rechunking to time groups.")
+            time_chunks = tuple(
+                b - a for a, b in itertools.pairwise(sorted(split_bounds))
+            )
+            ds = ds.copy()
+            for name, var in dask_vars.items():
+                ds[name] = var.chunk({"time": time_chunks})
+            return ds
+
+        aligned = []
+        for freq in dict.fromkeys(self.time_intervals_groups.values()):
+            try:
+                candidate = self._resample_slices(ds, freq)
+            except ValueError:
+                continue
+            if {slc.stop for slc in candidate} <= chunk_bounds:
+                aligned.append(freq)
+        log.warning(
+            "Time groups are not aligned with Dask chunks, some chunks will be read "
+            "multiple times. Consider rechunking along time%s.",
+            f" or using time_freq in {aligned}" if aligned else "",
+        )
+        return ds
+
+    def get_time_slices(
+        self, ds: xr.Dataset, time_freq: str | bool = True
+    ) -> list[slice]:
+        """Return the slices of each time group along the time dimension.
+
+        Groups are contiguous and sorted, empty groups are skipped.
+
+        Parameters
+        ----------
+        time_freq:
+            If it is a string, use it as a frequency/period for
+            :meth:`xarray.Dataset.resample`. If False, one group for each time index. If
+            True the frequency will be guessed from the filename pattern. See
+            :meth:`iter_split_by_time` for details.
+        """
+        size = ds.time.size
+        steps = [slice(i, i + 1) for i in range(size)]
 
         # user asked to not resample
         if not time_freq:
-            return [ds.isel(time=[i]) for i in range(ds.time.size)]
+            return steps
 
         if isinstance(time_freq, str):
             # User defined
@@ -492,29 +1331,56 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
         else:
             # we guess from pattern
             # time_intervals_groups is sorted by period, first hit is smallest period
+            unfixed = self.unfixed()
             for grp in self.time_intervals_groups:
                 if grp in unfixed:
                     freq = self.time_intervals_groups[grp]
                     break
+            else:
+                raise ValueError(
+                    "Could not guess time frequency from the filename pattern, "
+                    "specify it with `time_freq`."
+                )
 
         log.debug("Split with frequency %s", freq)
 
         # Check if dataset frequency is equal to split frequency (no need to resample)
-        if ds.time.size >= 3:
+        if size >= 3:
             infreq = xr.infer_freq(ds.time)
             if infreq is not None and infreq == freq:
                 log.debug(
                     "Resampling frequency is equal to that of dataset. "
                     "Will not resample."
                 )
-                return [ds.isel(time=[i]) for i in range(ds.time.size)]
+                return steps
+
+        return self._resample_slices(ds, freq)
 
-        resample = ds.resample(time=freq)
-        return [ds_unit for _, ds_unit in resample]
+    def _resample_slices(self, ds: xr.Dataset, freq: str) -> list[slice]:
+        """Return slices of non-empty groups when resampling to `freq`."""
+        size = ds.time.size
+        slices = []
+        for group in ds.resample(time=freq).groups.values():
+            if isinstance(group, slice):
+                start, stop = group.start, group.stop
+            else:
+                start, stop = group[0], group[-1] + 1
+            start = 0 if start is None else int(start)
+            stop = size if stop is None else int(stop)
+            if stop > start:
+                slices.append(slice(start, stop))
+        return slices
 
     def split_by_unfixed(self, ds: xr.Dataset) -> list[xr.Dataset]:
         """Use parameters in the filename pattern to guess how to group.
 
+        Return a list from :meth:`iter_split_by_unfixed`.
+        """
+        return list(self.iter_split_by_unfixed(ds))
+
+    def iter_split_by_unfixed(self, ds: xr.Dataset) -> Iterator[xr.Dataset]:
+        """Use parameters in the filename pattern to guess how to group.
+
         The dataset is split in sub-datasets such that each sub-dataset correspond
         to a unique combinaison of unfixed parameter values which will give a
         unique filename.
@@ -534,25 +1400,39 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
 
         # No parameter to split
         if not unfixed:
-            return [ds]
+            yield ds
+            return
 
         log.debug("Split by parameters %s", unfixed)
 
         stack_vars = list(unfixed)
-        stacked = ds.stack(__filename_vars__=stack_vars)
-
-        out = [ds_unit.unstack() for _, ds_unit in stacked.groupby("__filename_vars__")]
+        with self.span("split_unfixed"):
+            stacked = ds.stack(__filename_vars__=stack_vars)
+            groups = stacked.groupby("__filename_vars__")
 
-        return out
+        for _, ds_unit in groups:
+            yield ds_unit.unstack()
 
     def to_calls(
         self,
-        datasets: Sequence[xr.Dataset],
+        datasets: Iterable[xr.Dataset],
         squeeze: bool | str | Mapping[Hashable, bool | str] = False,
     ) -> list[CallXr]:
         """Transform sequence of datasets into writing calls.
 
+        Return a list from :meth:`iter_calls`.
+        """
+        return list(self.iter_calls(datasets, squeeze=squeeze))
+
+    def iter_calls(
+        self,
+        datasets: Iterable[xr.Dataset],
+        squeeze: bool | str | Mapping[Hashable, bool | str] = False,
+    ) -> Iterator[CallXr]:
+        """Transform datasets into writing calls.
+
         A writing call being a tuple of a dataset and the filename to write it to.
+        Datasets are only consumed when the next call is asked for.
 
         Parameters
         ----------
@@ -569,7 +1449,6 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
         present_time_fix = unfixed & set(self.time_intervals_groups)
         unfixed -= set(self.time_intervals_groups)
 
-        calls: list[CallXr] = []
         for ds in datasets:
             # Find unfixed parameters values. They should all be of dimension 1.
             # Note .values.item() to retrieve a scalar
@@ -599,6 +1478,165 @@ class XarraySplitWriter(SplitWriterMixin, XarrayWriter):
                 if squeeze:
                     ds = ds.squeeze(None, drop=(squeeze == "drop"))
 
-            calls.append((outfile, ds))
+            yield (outfile, ds)
+
+
+def get_repartition_groups(
+    source: DataInterface, target: DataInterface
+) -> dict[str, list[str]]:
+    """Group the files of an interface by the file of another interface they go to.
+
+    Parameters
+    ----------
+    source
+        Interface whose source module is a :class:`.FileFinderSource`. Its
+        :attr:`~.FileFinderSource.datafiles` are grouped, dates are parsed with its
+        :attr:`~.FileFinderSource.default_date`.
+    target
+        Interface whose source module is a :class:`.FileFinderSource`. Its unfixed
+        parameters are taken from the groups of the same name in source files, or
+        computed from the date of source files for date elements (year, month,
+        ...).
+
+    Returns
+    -------
+    Mapping of target filenames to the source files they contain, sorted.
+
+    Raises
+    ------
+    TypeError
+        If the source module of either interface is not a :class:`.FileFinderSource`.
+    """
+    for di in [source, target]:
+        if not isinstance(di.source, FileFinderSource):
+            raise TypeError(
+                f"Source module of {get_classname(di)} must be a FileFinderSource "
+                f"(found {type(di.source).__name__})."
+            )
+    source_module = cast(FileFinderSource, source.source)
+    target_module = cast(FileFinderSource, target.source)
+
+    source_groups = source_module.filefinder.get_group_names()
+    unfixed = target_module.unfixed
+
+    groups: dict[str, list[str]] = {}
+    for filename, matches in source_module.iter_matches():
+        fixes: dict[str, Any] = {}
+        date = None
+        for name in unfixed:
+            if name in source_groups:
+                fixes[name] = matches.get_value(name)
+            elif name in _DATE_GROUPS:
+                if date is None:
+                    date = matches.get_date(default_date=source_module.default_date)
+                fixes[name] = _DATE_GROUPS[name](date)
+            else:
+                raise KeyError(
+                    f"Cannot find value of parameter '{name}' for file {filename}."
+                )
+        outfile = target_module.get_filename(**fixes)
+        groups.setdefault(outfile, []).append(filename)
+
+    return {outfile: sorted(files) for outfile, files in groups.items()}
+
+
+def repartition(
+    source: DataInterface,
+    target: DataInterface,
+    client: Client | None = None,
+    max_in_flight: int | None = None,
+    verify: bool = True,
+    remove: bool = False,
+    metadata_kwargs: Mapping[str, Any] | None = None,
+    **kwargs: Any,
+) -> dict[str, list[str]]:
+    """Rewrite the files of an interface into (fewer) files of another interface.
+
+    For instance to compact daily files into monthly ones. Files of `source` are
+    grouped by target file (see :func:`get_repartition_groups`). Each group is loaded
+    with the source loader (without post-processing) and written by the target
+    writer (an :class:`XarrayWriter`), one output file after the other. Outputs are
+    generated lazily, and sent as soon as they are ready.
+
+    Parameters
+    ----------
+    source
+        Interface with a :class:`.FileFinderSource` and an :class:`XarrayLoader`.
+    target
+        Interface with a :class:`.FileFinderSource` and an :class:`XarrayWriter`.
+    client
+        Dask :class:`distributed.Client` instance. If present, output files are
+        written in parallel.
+    max_in_flight
+        Maximum number of output files written at the same time when using Dask.
+        Defaults to the number of threads of the workers.
+    verify
+        If True (default), each output file is read back and compared to its source
+        files (ignoring attributes).
+    remove
+        If True, remove source files once their output file has been verified.
+        Requires `verify`.
+    metadata_kwargs
+        Passed to the metadata generator of the target writer.
+    kwargs
+        Passed to the writing function.
+
+    Returns
+    -------
+    Mapping of output files to the source files they contain.
+
+    Raises
+    ------
+    RuntimeError
+        If some output files do not contain the same data as their source files. Their
+        source files are not removed.
+    """
+    if remove and not verify:
+        raise ValueError("Source files can only be removed after verification.")
+
+    groups = get_repartition_groups(source, target)
+    log.info(
+        "Repartitioning %d files into %d files.",
+        sum(len(files) for files in groups.values()),
+        len(groups),
+    )
+
+    def load(files: list[str]) -> xr.Dataset:
+        return source.loader.get_data(source=files, ignore_postprocess=True)
+
+    writer = cast(XarrayWriter, target.writer)
+    metadata = writer.get_metadata(**(metadata_kwargs or {}))
+    calls = (
+        (outfile, writer._add_metadata(load(files), metadata))
+        for outfile, files in groups.items()
+    )
 
-        return calls
+    if client is not None:
+        if max_in_flight is None:
+            workers = client.scheduler_info()["workers"].values()
+            max_in_flight = max(1, sum(w.get("nthreads", 1) for w in workers))
+        writer.send_calls_together(calls, client, max_in_flight=max_in_flight, **kwargs)
+    else:
+        writer.send_calls(calls, **kwargs)
+
+    if not verify:
+        return groups
+
+    failed = []
+    for outfile, files in groups.items():
+        engine = "zarr" if outfile.endswith(".zarr") else None
+        with load(files) as original, xr.open_dataset(outfile, engine=engine) as out:
+            if not original.equals(out):
+                log.error("Output file %s differs from its source files.", outfile)
+                failed.append(outfile)
+                continue
+        log.debug("Verified %s", outfile)
+
+        if remove:
+            for f in files:
+                os.remove(f)
+            log.debug("Removed %d source files for %s", len(files), outfile)
+
+    if failed:
+        raise RuntimeError(f"Output files differ from their source files: {failed}")
+    return groups
@@ -56,3 +56,14 @@ def did_you_mean(suggestions: Iterable[str], wrong_key: str) -> str | None:
             closest_key = suggestion
 
     return closest_key
+
+
+def format_nbytes(nbytes: float) -> str:
+    """Return a human readable size in bytes (with binary prefixes)."""
+    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
+        if abs(nbytes) < 1024 or unit == "TiB":
+            break
+        nbytes /= 1024
+    if unit == "B":
+        return f"{nbytes:.0f} B"
+    return f"{nbytes:.1f} {unit}"
@@ -1,5 +1,10 @@
 """Test main interface and modules features."""
 
+import json
+import logging
+import tracemalloc
+
+import numpy as np
 import pytest
 
 from neba.data import (
@@ -10,7 +15,9 @@ from neba.data import (
     SourceAbstract,
     WriterAbstract,
 )
+from neba.data.memory import MemoryMonitor
 from neba.data.module import ModuleMix
+from neba.data.profiling import ChromeTraceSink, JSONLinesSink, LoggingSink, SpanSink
 
 
 def test_abstract_interface():
@@ -221,6 +228,133 @@ def test_get_data_sets():
     assert di.parameters.direct == dict(a=0, b=0)
 
 
+def test_profiling(tmp_path, caplog):
+    class MySource(SourceAbstract):
+        def get_source(self):
+            return "source"
+
+    class MyLoader(LoaderAbstract):
+        def load_data_concrete(self, source):
+            return [source]
+
+        def postprocess(self, data):
+            with self.span("inner", n=len(data)):
+                return data * 2
+
+    class MyDataInterface(DataInterface):
+        Source = MySource
+        Loader = MyLoader
+
+    class ListSink(SpanSink):
+        def __init__(self):
+            self.spans = []
+
+        def emit(self, span):
+            self.spans.append(span)
+
+    di = MyDataInterface()
+    # no sink, nothing created
+    assert di.profiler.span("test") is di.profiler.span("other")
+    assert di.get_data() == ["source", "source"]
+
+    sink = ListSink()
+    di.profiler.add_sink(sink)
+    di.profiler.add_sink(LoggingSink(level=logging.INFO))
+    di.profiler.add_sink(JSONLinesSink(tmp_path / "spans.jsonl"))
+    di.profiler.add_sink(ChromeTraceSink(tmp_path / "trace.json"))
+    with caplog.at_level(logging.INFO):
+        di.get_data()
+    di.profiler.close()
+    assert not di.profiler.sinks
+
+    # children end first
+    assert [s.path for s in sink.spans] == [
+        "get_data/get_source",
+        "get_data/load",
+        "get_data/postprocess/inner",
+        "get_data/postprocess",
+        "get_data",
+    ]
+    assert sink.spans[2].attrs == dict(n=1)
+    assert sink.spans[2].depth == 2
+    assert all(s.duration >= 0 for s in sink.spans)
+    outer = sink.spans[-1]
+    assert all(outer.start <= s.start and s.end <= outer.end for s in sink.spans)
+    assert di.profiler.current is None
+
+    assert "    inner: " in caplog.text
+
+    with open(tmp_path / "spans.jsonl") as fp:
+        lines = [json.loads(line) for line in fp]
+    assert [line["path"] for line in lines] == [s.path for s in sink.spans]
+
+    with open(tmp_path / "trace.json") as fp:
+        trace = json.load(fp)
+    assert [e["name"] for e in trace["traceEvents"]] == [s.name for s in sink.spans]
+    assert all(e["ph"] == "X" for e in trace["traceEvents"])
+
+    # errors are recorded
+    sink = ListSink()
+    di.profiler.add_sink(sink)
+    with pytest.raises(ValueError), di.profiler.span("failing"):
+        raise ValueError
+    assert sink.spans[0].attrs["error"] == "ValueError"
+    assert di.profiler.current is None
+
+
+@pytest.mark.parametrize("method", ["rss", "tracemalloc"])
+def test_memory_monitor(method):
+    size = 2**24
+
+    class MyLoader(LoaderAbstract):
+        def load_data_concrete(self, source):
+            # temporary allocation, not kept
+            np.ones(2 * size, dtype="u1")
+            return np.ones(size, dtype="u1")
+
+    class MyDataInterface(DataInterface):
+        Loader = MyLoader
+
+    class OtherDataInterface(DataInterface):
+        Loader = MyLoader
+
+    di = MyDataInterface()
+    # no monitor
+    assert di.get_data(source="").nbytes == size
+
+    monitor = MemoryMonitor(method=method)
+    MyDataInterface.memory_monitor = monitor
+    OtherDataInterface.memory_monitor = monitor
+    try:
+        data = [di.get_data(source=""), di.get_data(source="")]
+        OtherDataInterface().get_data(source="")
+    finally:
+        MyDataInterface.memory_monitor = None
+        OtherDataInterface.memory_monitor = None
+        tracemalloc.stop()
+
+    assert len(monitor.records) == 3
+    record = monitor.records[0]
+    assert record.operation == "get_data"
+    assert record.nbytes == size
+    if method == "tracemalloc":
+        assert record.delta >= size
+        assert record.peak_delta >= 2 * size
+
+    summary = monitor.summary()
+    assert list(summary) == [
+        "test_memory_monitor.<locals>.MyDataInterface",
+        "test_memory_monitor.<locals>.OtherDataInterface",
+    ]
+    assert summary["test_memory_monitor.<locals>.MyDataInterface"]["calls"] == 2
+    assert (
+        summary["test_memory_monitor.<locals>.MyDataInterface"]["total_nbytes"]
+        == 2 * size
+    )
+    assert "2 calls" in monitor.report()
+    del data
+
+
 class TestModuleMix:
     def test_setup(self):
         is_setup = set()
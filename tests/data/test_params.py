@@ -1,5 +1,7 @@
 """Test parameters modules."""
 
+import gc
+
 import pytest
 from traitlets import Float, Int, Unicode
 
@@ -14,6 +16,7 @@ from neba.data import (
     ParametersSection,
     autocached,
 )
+from neba.data.module import _shared_caches
 
 
 class TestPassingParams:
@@ -316,6 +319,11 @@ class TestCachedModule:
                 def test_method(self):
                     return 1
 
+                @autocached(maxsize=2)
+                def test_args(self, a, b=0, **kwargs):
+                    self.calls += 1
+                    return a + b + len(kwargs)
+
         return MyDataInterface
 
     def test_autocached(self):
@@ -343,6 +351,90 @@ class TestCachedModule:
         di.trigger_callbacks()
         assert "test_property" in di.loader.cache
 
+    def test_autocached_args(self):
+        di = self.get_interface()()
+        di.loader.calls = 0
+        assert di.loader.test_args(1) == 1
+        assert di.loader.test_args(1, b=0) == 1
+        assert di.loader.test_args(a=1, b=0) == 1
+        assert di.loader.calls == 1
+
+        assert di.loader.test_args(1, c=2) == 2
+        assert di.loader.calls == 2
+        assert len(di.loader.cache["test_args"]) == 2
+
+        # least recently used is discarded
+        assert di.loader.test_args(1) == 1
+        assert di.loader.test_args(2) == 2
+        assert di.loader.calls == 3
+        assert di.loader.test_args(1) == 1
+        assert di.loader.calls == 3
+        assert di.loader.test_args(1, c=2) == 2
+        assert di.loader.calls == 4
+
+        # unhashable are not cached
+        assert di.loader.test_args(1, c=[0]) == 2
+        assert di.loader.calls == 5
+
+        stats = di.loader.cache_stats["test_args"]
+        assert (stats.hits, stats.misses) == (4, 4)
+
+        di.trigger_callbacks()
+        assert di.loader.test_args(1) == 1
+        assert di.loader.calls == 6
+
+    def test_shared_cache(self):
+        di_cls = self.get_interface()
+        di_cls.Loader.shared_cache = True
+
+        di1 = di_cls(a=0)
+        di2 = di_cls(a=0)
+        di3 = di_cls(a=1)
+        assert di1.loader.cache is di2.loader.cache
+        assert di1.loader.cache is not di3.loader.cache
+
+        _ = di1.loader.test_property
+        _ = di2.loader.test_property
+        assert di1.loader.cache_stats["test_property"].misses == 1
+        assert di2.loader.cache_stats["test_property"].hits == 1
+
+        # changing parameters does not affect other instances
+        di2.parameters["a"] = 1
+        assert di2.loader.cache is di3.loader.cache
+        assert "test_property" in di1.loader.cache
+        assert "test_property" not in di2.loader.cache
+        di2.parameters["a"] = 0
+        assert di2.loader.cache is di1.loader.cache
+
+        # released when not used
+        key = di3.loader.get_cache_key()
+        assert key in _shared_caches
+        del di2, di3
+        gc.collect()
+        assert key not in _shared_caches
+
+    def test_cache_stats(self):
+        di = self.get_interface()()
+        assert di.cache_stats() == dict(loader={})
+
+        for _ in range(3):
+            _ = di.loader.test_property
+        di.loader.test_method()
+        di.trigger_callbacks()
+        _ = di.loader.test_property
+
+        stats = di.cache_stats()["loader"]
+        assert stats["test_property"].as_dict() == dict(
+            hits=2, misses=2, invalidations=1, time=stats["test_property"].time
+        )
+        assert stats["test_property"].hit_ratio == 0.5
+        assert stats["test_method"].misses == 1
+        assert stats["test_method"].invalidations == 1
+
+        assert "Cache statistics" not in repr(di)
+        di.repr_cache_stats = True
+        assert "loader.test_property: 2 hits, 2 misses" in repr(di)
+
 
 
 class TestParamsExcursion:
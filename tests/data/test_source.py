@@ -1,19 +1,33 @@
 """Test source modules."""
 
+import asyncio
+import errno
+import logging
+import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
+from filefinder import Finder
 
+from neba.data.filelist import FileList
 from neba.data.interface import DataInterface
+from neba.data.loader import LoaderAbstract
 from neba.data.params import ParametersDict
 from neba.data.source import (
     FileFinderSource,
+    FileFollower,
+    GeneratedSource,
     GlobSource,
     SimpleSource,
     SourceIntersection,
     SourceUnion,
 )
+from neba.data.watch import InotifyWatcher, PollingWatcher, get_watcher
 
 
 def get_simple_source(name, files: list[str]):
@@ -217,7 +231,7 @@ def setup_multiple_files(tmpdir, var: str = "A") -> list[str]:
 
 
 class TestGlob:
-    def test_get_source(self, tmpdir):
+    def test_get_source(self, tmpdir, caplog):
         class MyDataInterface(DataInterface):
             Parameters = ParametersDict
 
@@ -241,11 +255,98 @@ class TestGlob:
 
         # check files cached
         assert di.source.cache["datafiles"] == ref_filenames
+        assert di.get_source(relative=True) == di.get_source(relative=True)
+        assert di.source.cache_stats["_get_source"].misses == 2
+
+        # returned list is a copy
+        di.get_source().clear()
+        assert di.get_source() == ref_filenames
 
         # check void cache
         di.parameters["var"] = "B"
         assert "datafiles" not in di.source.cache
-        assert len(di.get_source()) == 0
+        with caplog.at_level(logging.WARNING):
+            assert len(di.get_source()) == 0
+            assert len(di.get_source()) == 0
+        assert caplog.text.count("No files found") == 2
+
+    @pytest.mark.parametrize("kind", ["inotify", "poll"])
+    def test_watch(self, tmpdir, kind):
+        class MyDataInterface(DataInterface):
+            Parameters = ParametersDict
+
+            class Source(GlobSource):
+                watch_files = True
+                watcher_kind = kind
+
+                def get_root_directory(self):
+                    return str(tmpdir)
+
+                def get_glob_pattern(self):
+                    return "*/A_*.nc"
+
+        ref_filenames = setup_multiple_files(tmpdir, var="A")
+        di = MyDataInterface()
+        assert di.get_source() == ref_filenames
+
+        (tmpdir / "2011" / "A_20110115_01.nc").write_text("", "utf8")
+        (tmpdir / "2011" / "B_20110115_01.nc").write_text("", "utf8")
+        assert di.source.update_datafiles() == (
+            [str(tmpdir / "2011" / "A_20110115_01.nc")],
+            [],
+        )
+        assert len(di.get_source()) == len(ref_filenames) + 1
+        assert di.source.cache_stats["datafiles"].misses == 1
+
+    def test_watch_limit(self, tmpdir, monkeypatch):
+        closed = []
+        close = InotifyWatcher.close
+
+        def add_watch(self, directory):
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC), directory)
+
+        def spy_close(self):
+            closed.append(self.fd)
+            close(self)
+
+        monkeypatch.setattr(InotifyWatcher, "_add_watch", add_watch)
+        monkeypatch.setattr(InotifyWatcher, "close", spy_close)
+        assert isinstance(get_watcher(str(tmpdir)), PollingWatcher)
+        assert len(closed) == 1 and closed[0] >= 0
+
+    def test_watch_shared(self, tmpdir):
+        class MyDataInterface(DataInterface):
+            Parameters = ParametersDict
+
+            class Source(GlobSource):
+                shared_cache = True
+                watcher_kind = "poll"
+
+                def get_root_directory(self):
+                    return str(tmpdir)
+
+                def get_glob_pattern(self):
+                    return "*/A_*.nc"
+
+        ref_filenames = setup_multiple_files(tmpdir, var="A")
+        a, b = MyDataInterface(), MyDataInterface()
+        assert a.source.cache is b.source.cache
+        assert a.get_source() == ref_filenames
+
+        # watched sources stop sharing
+        for di in [a, b]:
+            di.source.watch_files = True
+            assert di.get_source() == ref_filenames
+        assert a.source.cache is not b.source.cache
+        new = str(tmpdir / "2011" / "A_20110115_01.nc")
+        (tmpdir / "2011" / "A_20110115_01.nc").write_text("", "utf8")
+        assert a.source.update_datafiles() == ([new], [])
+        assert b.source.update_datafiles() == ([new], [])
+
+        # and do not share after the cache is voided
+        b.trigger_callbacks()
+        assert a.source.cache is not b.source.cache
+        assert b.get_source() == a.get_source()
 
 
 class TestFileFinder:
@@ -277,12 +378,155 @@ class TestFileFinder:
 
         # check files cached
         assert di.source.cache["datafiles"] == ref_filenames
+        assert di.get_source(relative=True) == di.get_source(relative=True)
+        assert di.source.cache_stats["_get_source"].misses == 2
+
+        filename = di.source.get_filename(Y=2000, m=1, d=1, param=0)
+        assert filename == str(tmpdir / "subdir" / "2000" / "A_20000101_00.nc")
+        assert di.source.get_filename(Y=2000, m=1, d=1, param=0) == filename
+        assert di.source.cache_stats["get_filename"].hits == 1
 
         # check void cache
         di.parameters["var"] = "B"
         assert "datafiles" not in di.source.cache
+        assert "get_filename" not in di.source.cache
         assert len(di.get_source()) == 0
 
+    @pytest.mark.parametrize("kind", ["inotify", "poll"])
+    def test_watch(self, tmpdir, kind):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        di = self.setup_interface(tmpdir)(var="A", param=1)
+        di.source.watch_files = True
+        di.source.watcher_kind = kind
+        ref_filenames = [f for f in ref_filenames if f.endswith("_01.nc")]
+        assert di.get_source() == ref_filenames
+
+        root = Path(tmpdir) / "subdir"
+        new = root / "2011" / "A_20110115_01.nc"
+        new.touch()
+        (root / "2011" / "A_20110115_02.nc").touch()
+        (root / "2012" / "A_20120101_01.nc").rename(root / "2012" / "A_20120102_01.nc")
+        (root / "2013").mkdir()
+        (root / "2013" / "A_20130101_01.nc").touch()
+        (root / "2010" / "A_20100101_01.nc").unlink()
+
+        files = di.get_source()
+        assert str(new) in files
+        assert str(root / "2012" / "A_20120101_01.nc") not in files
+        assert str(root / "2012" / "A_20120102_01.nc") in files
+        assert str(root / "2013" / "A_20130101_01.nc") in files
+        assert str(root / "2010" / "A_20100101_01.nc") not in files
+        assert len(files) == len(ref_filenames) + 1
+        assert files == sorted(files)
+        # the finder is updated as well
+        assert [f for f, _ in di.source.filefinder.files] == [
+            f.removeprefix(str(root) + "/") for f in files
+        ]
+        assert di.source.cache_stats["datafiles"].misses == 1
+
+        # remove a directory
+        for f in (root / "2013").iterdir():
+            f.unlink()
+        (root / "2013").rmdir()
+        _, removed = di.source.update_datafiles()
+        assert removed == [str(root / "2013" / "A_20130101_01.nc")]
+
+        # watcher is stopped with the cache
+        di.parameters["param"] = 2
+        assert di.source.watcher is None
+        assert len(di.get_source()) == len(ref_filenames) + 1
+        assert str(root / "2011" / "A_20110115_02.nc") in di.get_source()
+
+    def test_watch_overflow(self, tmpdir):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        di = self.setup_interface(tmpdir)(var="A", param=1)
+        di.source.watch_files = True
+        di.source.watcher_kind = "poll"
+        ref_filenames = [f for f in ref_filenames if f.endswith("_01.nc")]
+        assert di.get_source() == ref_filenames
+        _ = di.source.date_index
+
+        # events are lost
+        root = Path(tmpdir) / "subdir"
+        new = root / "2011" / "A_20110115_01.nc"
+        new.touch()
+        (root / "2010" / "A_20100101_01.nc").unlink()
+        di.source.watcher.poll = lambda: [("overflow", str(root))]
+        assert di.source.update_datafiles() == (
+            [str(new)],
+            [str(root / "2010" / "A_20100101_01.nc")],
+        )
+        files = di.get_source()
+        assert str(new) in files
+        assert len(files) == len(ref_filenames)
+        assert str(new) in di.source.date_index[1]
+
+    def test_shared_cache(self, tmpdir):
+        setup_multiple_files(tmpdir / "subdir", var="A")
+        di_cls = self.setup_interface(tmpdir)
+        di_cls.Source.shared_cache = True
+        dis = [di_cls(var="A") for _ in range(3)]
+        assert all(di.get_source() == dis[0].get_source() for di in dis)
+        assert dis[1].source.filefinder is dis[0].source.filefinder
+        stats = [di.source.cache_stats for di in dis]
+        assert sum(st["datafiles"].misses for st in stats if "datafiles" in st) == 1
+
+    @pytest.mark.parametrize("window", [None, 10.0])
+    def test_follow(self, tmpdir, window, monkeypatch):
+        setup_multiple_files(tmpdir / "subdir", var="A")
+        di_cls = self.setup_interface(tmpdir)
+
+        class Loader(LoaderAbstract):
+            def load_data_concrete(self, source):
+                return source
+
+        di_cls.Loader = Loader
+        di = di_cls(var="A", param=1)
+        root = Path(tmpdir) / "subdir" / "2011"
+        new = [str(root / f"A_201101{d:02d}_01.nc") for d in [15, 20]]
+
+        def create():
+            time.sleep(0.05)
+            for f in new:
+                Path(f).touch()
+            (root / "A_20110120_02.nc").touch()
+
+        thread = threading.Thread(target=create)
+        thread.start()
+        data = list(di.follow(interval=0.01, window=window, timeout=0.3))
+        thread.join()
+        if window is None:
+            assert data == new
+        else:
+            assert data == [new]
+        assert new[0] in di.get_source()
+
+        # asynchronous
+        async def follow():
+            return [d async for d in di.afollow(interval=0.01, timeout=0.2)]
+
+        # polling does not block the event loop
+        pollers = []
+        poll = FileFollower.poll
+
+        def spy_poll(self):
+            pollers.append(threading.current_thread())
+            return poll(self)
+
+        monkeypatch.setattr(FileFollower, "poll", spy_poll)
+
+        thread = threading.Thread(target=create)
+        new = [str(root / f"A_201101{d:02d}_01.nc") for d in [16, 21]]
+        thread.start()
+        data = asyncio.run(follow())
+        thread.join()
+        assert data == new
+        assert pollers
+        assert threading.main_thread() not in pollers
+
+        with pytest.raises(TypeError):
+            next(DataInterface().follow())
+
     def test_fixes(self, tmpdir):
         ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
 
@@ -297,3 +541,271 @@ class TestFileFinder:
 
         assert di.source.unfixed == ["m", "param"]
         assert di.get_source() == ref_filenames[:6]
+
+    def test_catalog(self, tmpdir):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        di_cls = self.setup_interface(tmpdir)
+        di_cls.Source.catalog_file = str(tmpdir / "catalog.db")
+
+        di = di_cls(var="A")
+        assert di.get_source() == ref_filenames
+        catalog = di.source.catalog
+        assert len(catalog) == len(ref_filenames)
+        info = catalog.lookup(ref_filenames[0])
+        assert info is not None
+        assert info["size"] == 0
+        assert [info[k] for k in ["Y", "m", "d", "param"]] == [2010, 1, 1, 1]
+
+        # same selections as the finder
+        di.parameters.update(Y="2010", d=1, m=[1, 2])
+        assert di.get_source() == ref_filenames[:6]
+        assert catalog.query(Y=slice(2011, None), m=range(1, 3), param=2) == [
+            ref_filenames[i] for i in [37, 40, 73, 76]
+        ]
+        with pytest.raises(KeyError):
+            catalog.query(x=1)
+
+        # incremental update
+        root = Path(tmpdir) / "subdir"
+        (root / "2011" / "A_20110115_01.nc").write_text("data")
+        (root / "2011" / "B_20110115_01.nc").touch()
+        (root / "2010" / "A_20100101_01.nc").unlink()
+        for f in (root / "2012").iterdir():
+            f.unlink()
+        (root / "2012").rmdir()
+        catalog = di.source.catalog
+        assert catalog.update() == (1, 37)
+        assert catalog.update() == (0, 0)
+        assert catalog.lookup("2011/A_20110115_01.nc", relative=True)["size"] == 4
+        assert catalog.query(Y=2011, d=15) == [str(root / "2011" / "A_20110115_01.nc")]
+
+        # kept in database
+        assert len(di_cls(var="A").get_source()) == len(ref_filenames) - 36
+
+    def test_date_index(self, tmpdir):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        di = self.setup_interface(tmpdir)(var="A", param=2)
+        ref_filenames = [f for f in ref_filenames if f.endswith("_02.nc")]
+
+        dates, filenames = di.source.date_index
+        assert filenames == ref_filenames
+        assert dates[0] == np.datetime64("2010-01-01")
+        assert np.all(dates[1:] > dates[:-1])
+
+        assert di.source.between("2010-03-01", "2010-05-01") == ref_filenames[2:5]
+        assert di.source.between(datetime(2012, 11, 15), None) == ref_filenames[-1:]
+        assert di.source.between("2013-01-01", "2014-01-01") == []
+        assert di.source.nearest("2011-01-10") == ref_filenames[12]
+        assert di.source.nearest("2011-01-20") == ref_filenames[13]
+        assert di.source.nearest("2020-01-01") == ref_filenames[-1]
+        assert di.source.cache_stats["date_index"].misses == 1
+
+        # reset with the datafiles
+        di.parameters["param"] = 1
+        assert di.source.between("2010-01-01", "2010-01-01") == [
+            str(tmpdir / "subdir" / "2010" / "A_20100101_01.nc")
+        ]
+
+        # datafile that does not match
+        di.source.cache["datafiles"].append(str(tmpdir / "subdir" / "other.nc"))
+        di.source.cache.pop("date_index")
+        with pytest.raises(ValueError):
+            _ = di.source.date_index
+
+    def test_filtered_fixes(self, tmpdir):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        di = self.setup_interface(tmpdir)(var="A")
+        di.source.max_regex_values = 2
+
+        di.parameters.update(m=[1, 2, 3], param=[1, 3, 5], Y=2010)
+        finder = di.source.filefinder
+        assert not any(g.fixed for g in finder.groups if g.name in ["m", "param"])
+        funcs = sorted(f.user_func.func.__name__ for f in finder.filters)
+        assert funcs == ["_in_interval", "_in_set"]
+        assert di.get_source() == [
+            f for f in ref_filenames[:9] if not f.endswith("_02.nc")
+        ]
+        assert "selected after scanning: m (3 values), param (3 values)" in str(
+            di.source
+        )
+
+        # same result as with a regex
+        files = di.get_source()
+        di.source.max_regex_values = 16
+        di.source.void_cache()
+        assert di.source.filefinder.filters.filters == []
+        assert di.get_source() == files
+
+    @pytest.mark.parametrize("executor", ["process", "thread"])
+    def test_scan_parallel(self, tmpdir, executor):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        (tmpdir / "subdir" / "2010" / "B_20100101_01.nc").write_text("", "utf8")
+        (tmpdir / "subdir" / "other").mkdir()
+        (tmpdir / "subdir" / "other" / "A_20100101_01.nc").write_text("", "utf8")
+        di_cls = self.setup_interface(tmpdir)
+        di_cls.Source.match_workers = 2
+        di_cls.Source.match_executor = executor
+        di_cls.Source.match_chunksize = 10
+
+        di = di_cls(var="A")
+        assert di.get_source() == ref_filenames
+        finder = di.source.filefinder
+        assert finder.scanned
+        relpath, matches = finder.files[0]
+        assert relpath == "2010/A_20100101_01.nc"
+        assert matches["Y"] == 2010
+        assert matches.get_date().year == 2010
+
+        # same as a finder that scanned itself, including after a fix
+        ref = Finder(finder.root, finder.get_pattern())
+        for (f, m), (f_ref, m_ref) in zip(finder.files, ref.files, strict=True):
+            assert f == f_ref
+            assert [m[g] for g in "Ymd"] == [m_ref[g] for g in "Ymd"]
+            assert m.get_date() == m_ref.get_date()
+        finder.fix_group("m", 2)
+        ref.fix_group("m", 2)
+        assert not finder.scanned
+        assert finder.get_files() == ref.get_files()
+        di.source.void_cache()
+
+        # filters and fixes are applied
+        di.parameters.update(Y=2011, param=[1, 2])
+        di.source.filefinder.fix_by_filter("m", lambda m: m > 6)
+        assert (
+            di.get_source()
+            == [f for f in ref_filenames[36:72] if not f.endswith("_03.nc")][12:]
+        )
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_scan_everything(self, tmpdir, workers):
+        class MyDataInterface(DataInterface):
+            Parameters = ParametersDict
+
+            class Source(FileFinderSource):
+                match_workers = workers
+                match_executor = "thread"
+
+                def get_root_directory(self):
+                    return str(tmpdir)
+
+                def get_filename_pattern(self):
+                    return "%(path:fmt=s:rgx=[a-z/]+)/A.nc"
+
+        directory = Path(tmpdir)
+        for sub in ["a", "a/b", "a/b/c"]:
+            (directory / sub).mkdir()
+            (directory / sub / "A.nc").touch()
+
+        di = MyDataInterface()
+        di.source.filefinder.set_scan_everything(True)
+        di.source.filefinder.max_scan_depth = 1
+        assert di.get_source(relative=True) == ["a/A.nc", "a/b/A.nc"]
+
+    @pytest.mark.parametrize("mix", [SourceUnion, SourceIntersection])
+    def test_compact_mix(self, tmpdir, mix):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        compact = self.setup_interface(tmpdir).Source
+        compact.compact_datafiles = True
+        other = get_simple_source("Other", [ref_filenames[0], "other.nc"])
+
+        class MixInterface(DataInterface):
+            Parameters = ParametersDict
+            Source = mix.create([compact, other])
+
+        di = MixInterface(var="A")
+        assert isinstance(di.source.base_modules["Source"].get_source(), FileList)
+        if mix is SourceUnion:
+            assert di.get_source() == ref_filenames + ["other.nc"]
+        else:
+            assert di.get_source() == ref_filenames[:1]
+
+    @pytest.mark.parametrize("kind", ["inotify", "poll"])
+    def test_compact(self, tmpdir, kind):
+        ref_filenames = setup_multiple_files(tmpdir / "subdir", var="A")
+        di_cls = self.setup_interface(tmpdir)
+        di_cls.Source.compact_datafiles = True
+        di_cls.Source.watch_files = True
+        di_cls.Source.watcher_kind = kind
+        di = di_cls(var="A")
+
+        files = di.get_source()
+        assert isinstance(files, FileList)
+        assert files.root == str(tmpdir / "subdir")
+        assert files == ref_filenames
+        assert files[3] == ref_filenames[3]
+        assert files[-2:] == ref_filenames[-2:]
+        assert ref_filenames[10] in files
+        assert str(tmpdir / "subdir" / "2010" / "A_20100115_01.nc") not in files
+        assert files.index(ref_filenames[10]) == 10
+        assert files.index(ref_filenames[10], 5) == 10
+        assert files.index(ref_filenames[10], 5, 11) == 10
+        with pytest.raises(ValueError):
+            files.index(ref_filenames[10], 0, 10)
+        assert files.nbytes < sum(len(f) for f in ref_filenames)
+
+        relative = di.get_source(relative=True)
+        assert isinstance(relative, FileList)
+        assert list(relative) == [
+            f.removeprefix(str(tmpdir / "subdir") + "/") for f in ref_filenames
+        ]
+
+        # updated by the watcher
+        root = Path(tmpdir) / "subdir"
+        new = root / "2010" / "A_20100115_01.nc"
+        new.touch()
+        (root / "2011" / "A_20110101_01.nc").unlink()
+        files = di.get_source()
+        assert isinstance(files, FileList)
+        assert str(new) in files
+        assert str(root / "2011" / "A_20110101_01.nc") not in files
+        assert list(files) == sorted(files)
+        assert len(files) == len(ref_filenames)
+
+
+class TestGenerated:
+    def setup_interface(self, tmpdir) -> type[DataInterface]:
+        class MyDataInterface(DataInterface):
+            Parameters = ParametersDict
+
+            class Source(GeneratedSource):
+                def get_root_directory(self):
+                    return str(tmpdir)
+
+                def get_filename_pattern(self):
+                    return "%(Y)/A_%(Y)%(m)%(d)_%(param:fmt=02d).nc"
+
+                def get_dates(self):
+                    return pd.date_range("2010-01-01", "2012-12-01", freq="1MS")
+
+        return MyDataInterface
+
+    def test_get_source(self, tmpdir):
+        ref_filenames = setup_multiple_files(tmpdir)
+        di_cls = self.setup_interface(tmpdir)
+
+        di = di_cls(param=[1, 2, 3])
+        assert di.get_source() == ref_filenames
+        di.parameters["param"] = 2
+        assert di.get_source() == [f for f in ref_filenames if f.endswith("_02.nc")]
+
+        # missing files
+        di.parameters["param"] = [3, 4]
+        Path(ref_filenames[2]).unlink()
+        assert di.get_source() == [f for f in ref_filenames if f.endswith("_03.nc")][1:]
+
+        # without check
+        di_cls.Source.check_exists = False
+        di = di_cls(param=[3, 4])
+        assert len(di.get_source()) == 2 * 36
+        assert str(tmpdir / "2010" / "A_20100101_04.nc") in di.get_source()
+
+    def test_parameters(self, tmpdir):
+        ref_filenames = setup_multiple_files(tmpdir)
+        di_cls = self.setup_interface(tmpdir)
+        with pytest.raises(ValueError):
+            di_cls().get_source()
+
+        # without dates, all parameters are needed
+        di_cls.Source.get_dates = lambda self: None
+        di = di_cls(Y=2011, m=[1, 2], d=1, param=1)
+        assert di.get_source() == [ref_filenames[i] for i in [36, 39]]
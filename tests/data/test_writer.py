@@ -1,11 +1,20 @@
 """Test common Writer features."""
 
 import os
+import shutil
 
 import pytest
 
 from neba.data import DataInterface, ParametersDict
-from neba.data.writer import MetadataGenerator, WriterAbstract, method
+from neba.data.manifest import WriteManifest, hash_target
+from neba.data.staging import StagingArea
+from neba.data.writer import (
+    BackgroundWriter,
+    MetadataGenerator,
+    WritePlan,
+    WriterAbstract,
+    method,
+)
 
 
 def test_check_directories(tmpdir):
@@ -30,6 +39,128 @@ def test_check_overwriting_calls():
         )
 
 
+def test_check_calls_stream(tmpdir, caplog):
+    writer = WriterAbstract()
+
+    def calls():
+        for name in ["0", "1", "0"]:
+            yield (str(tmpdir / "a" / name), None)
+
+    checked = writer.check_calls_stream(calls())
+    assert next(checked)[0] == str(tmpdir / "a" / "0")
+    assert (tmpdir / "a").exists()
+    next(checked)
+    with pytest.raises(ValueError):
+        next(checked)
+
+    # size is checked as calls come
+    writer.estimate_nbytes = lambda data: data
+    nbytes = int(shutil.disk_usage(tmpdir).free * 0.6)
+    calls = [(str(tmpdir / "b" / str(i)), nbytes) for i in range(3)]
+    checked = writer.check_calls_stream(calls)
+    next(checked)
+    assert "exceeds free disk space" not in caplog.text
+    list(checked)
+    assert caplog.text.count("exceeds free disk space") == 1
+
+
+def test_write_plan(tmpdir, caplog):
+    calls = [(str(tmpdir / d / f"{i}.nc"), i) for d in "ab" for i in range(3)]
+    plan = WritePlan(calls, estimate_nbytes=lambda i: 10 * i)
+
+    assert len(plan) == 6
+    assert plan.total_nbytes == 60
+    assert plan.get_duplicates() == []
+    assert plan.get_missing_directories() == [str(tmpdir / "a"), str(tmpdir / "b")]
+    assert "2 to create" in plan.report()
+    assert not (tmpdir / "a").exists()
+
+    plan.check()
+    assert plan.checked
+    assert (tmpdir / "a").exists() and (tmpdir / "b").exists()
+
+    plan = WritePlan(calls + calls[:1], estimate_nbytes=lambda i: 2**62)
+    assert plan.get_duplicates() == [calls[0][0]]
+    with pytest.raises(ValueError):
+        plan.check()
+    plan.check_disk_space()
+    assert "exceeds free disk space" in caplog.text
+
+
+def test_background_writer():
+    with BackgroundWriter(queue_depth=2) as writer:
+        for i in range(5):
+            writer.submit(i, lambda x: x * 2, i)
+    assert writer.results == {i: 2 * i for i in range(5)}
+
+    def fail(x):
+        if x == 1:
+            raise OSError("disk full")
+        return x
+
+    with pytest.raises(OSError, match="disk full"):
+        with BackgroundWriter() as writer:
+            for i in range(5):
+                writer.submit(i, fail, i)
+    assert 0 in writer.results
+    assert 4 not in writer.results
+
+    with pytest.raises(ValueError):
+        BackgroundWriter(queue_depth=0)
+
+
+def test_staging_area(tmpdir):
+    staging_dir = tmpdir / "staging"
+    staging_dir.mkdir()
+    with StagingArea(staging_dir) as stage:
+        staged = stage.stage(tmpdir / "out.txt")
+        assert staged.endswith("out.txt")
+        with open(staged, "w") as fp:
+            fp.write("a")
+        stage.move(staged, tmpdir / "out.txt")
+    assert (tmpdir / "out.txt").read() == "a"
+    assert staging_dir.listdir() == []
+
+    with pytest.raises(FileNotFoundError):
+        with StagingArea(staging_dir) as stage:
+            staged = stage.stage("out.txt")
+            with open(staged, "w") as fp:
+                fp.write("a")
+            stage.move(staged, tmpdir / "missing" / "out.txt")
+    assert staging_dir.listdir() == []
+
+
+def test_manifest_checksum(tmpdir):
+    files = [str(tmpdir / f"{i}.txt") for i in range(4)]
+    store = tmpdir / "store.zarr"
+    store.mkdir()
+    (store / "chunk").write("data")
+    files.append(str(store))
+
+    manifest = WriteManifest(checksum=True)
+    for i, f in enumerate(files[:-1]):
+        with open(f, "w") as fp:
+            fp.write(str(i) * 10)
+    for f in files:
+        manifest.finish(f, None)
+    manifest.compact()
+
+    assert manifest.get(files[0])["hash"] == hash_target(files[0])
+    assert hash_target(files[0]) != hash_target(files[1])
+    assert manifest.verify() == {}
+
+    # same size, different content
+    with open(files[0], "w") as fp:
+        fp.write("a" * 10)
+    os.remove(files[1])
+    (store / "chunk").write("other")
+    assert WriteManifest().verify(tmpdir) == {
+        files[0]: "hash",
+        files[1]: "missing",
+        files[-1]: "size",
+    }
+
+
 class TestMetadata:
     METH_BASIC = [
         "written_with_interface",
@@ -173,6 +304,104 @@ class TestMetadata:
         if (commit := os.environ.get("GITHUB_SHA")) is not None:
             assert metadata["creation_commit"] == commit
 
+    def test_git_cache(self, tmpdir, monkeypatch):
+        import subprocess
+
+        from neba.data import writer
+
+        repo = str(tmpdir)
+        subprocess.run(["git", "init", "-q", repo], check=True)
+        subprocess.run(
+            [
+                "git",
+                "-C",
+                repo,
+                "-c",
+                "user.name=a",
+                "-c",
+                "user.email=a@a",
+                "commit",
+                "-q",
+                "--allow-empty",
+                "-m",
+                "a",
+            ],
+            check=True,
+        )
+        os.makedirs(tmpdir / "sub")
+        script = str(tmpdir / "sub" / "script.py")
+        with open(script, "w") as fp:
+            fp.write("a = 0\n")
+        subprocess.run(["git", "-C", repo, "add", script], check=True)
+        subprocess.run(
+            [
+                "git",
+                "-C",
+                repo,
+                "-c",
+                "user.name=a",
+                "-c",
+                "user.email=a@a",
+                "commit",
+                "-q",
+                "-m",
+                "script",
+            ],
+            check=True,
+        )
+
+        # count calls to get the commit
+        calls = []
+        run = subprocess.run
+
+        def counting_run(cmd, *args, **kwargs):
+            if cmd[-2:] == ["rev-parse", "HEAD"]:
+                calls.append(cmd)
+            return run(cmd, *args, **kwargs)
+
+        monkeypatch.setattr(writer.subprocess, "run", counting_run)
+
+        di = self.get_interface()
+        first = di.writer.get_metadata(creation_script=script)
+        n_calls = len(calls)
+        assert n_calls > 0
+        assert "creation_diff_short" not in first
+
+        # edits of the working tree are still found
+        with open(script, "w") as fp:
+            fp.write("a = 1\n")
+        second = di.writer.get_metadata(creation_script=script)
+        assert len(calls) == n_calls
+        assert second["creation_commit"] == first["creation_commit"]
+        assert second["creation_diff_short"] == ["sub/script.py:+1:-1"]
+
+        # new commit invalidates the cache
+        run(
+            [
+                "git",
+                "-C",
+                repo,
+                "-c",
+                "user.name=a",
+                "-c",
+                "user.email=a@a",
+                "commit",
+                "-q",
+                "--allow-empty",
+                "-m",
+                "b",
+            ],
+            check=True,
+        )
+        second = di.writer.get_metadata(creation_script=script)
+        assert len(calls) > n_calls
+        assert second["creation_commit"] != first["creation_commit"]
+
+        # no caching
+        n_calls = len(calls)
+        di.writer.get_metadata(creation_script=script, git_cache=False)
+        assert len(calls) > n_calls
+
     def test_none(self):
         """Method that returns None is not added to metadata."""
 
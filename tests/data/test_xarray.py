@@ -1,5 +1,6 @@
 """Test Xarray loading / writing."""
 
+import logging
 from os import path
 
 import numpy as np
@@ -9,7 +10,16 @@ import xarray as xr
 from xarray.testing import assert_equal
 
 from neba.data import DataInterface, FileFinderSource, ParametersDict
-from neba.data.xarray import XarrayLoader, XarraySplitWriter, XarrayWriter
+from neba.data.memory import MemoryMonitor
+from neba.data.profiling import SpanSink
+from neba.data.xarray import (
+    EncodingPlanner,
+    XarrayLoader,
+    XarraySplitWriter,
+    XarrayWriter,
+    get_repartition_groups,
+    repartition,
+)
 
 
 class XarrayInterface(DataInterface):
@@ -231,6 +241,85 @@ class TestWriter:
             time.sleep(0.3)
         raise RuntimeError("Timeout")
 
+    @pytest.mark.parametrize("ext", ["nc", "zarr"])
+    def test_auto_encoding(self, tmpdir, ext, monkeypatch):
+        ref = xr.Dataset(
+            {
+                "test": (("time", "x"), np.zeros((20, 100))),
+                "label": ("x", np.array(["a"] * 100)),
+            }
+        )
+        di = XarrayInterface()
+        monkeypatch.setattr(EncodingPlanner, "objective", "size")
+
+        benchmarked = []
+        benchmark = EncodingPlanner.benchmark
+
+        def counting_benchmark(*args, **kwargs):
+            benchmarked.append(args)
+            return benchmark(*args, **kwargs)
+
+        monkeypatch.setattr(EncodingPlanner, "benchmark", counting_benchmark)
+
+        filenames = [str(tmpdir / f"{i}.{ext}") for i in range(2)]
+        di.write([ref, ref], target=filenames, encoding="auto")
+        n_benchmarks = len(benchmarked)
+        assert n_benchmarks == len(
+            di.writer.encoding_planner().get_candidates(ref.test, ext)
+        )
+
+        # other sizes are benchmarked again, chunk sizes depend on them
+        planner = di.writer.encoding_planner()
+        other = ref.isel(x=slice(0, 50))
+        planner.choose("test", ref.test, ext)
+        planner.choose("test", other.test.isel(time=slice(0, 10)), ext)
+        assert len(benchmarked) == 3 * n_benchmarks
+        chosen = planner.choose("test", other.test, ext)
+        assert len(benchmarked) == 3 * n_benchmarks
+        if "chunksizes" in chosen:
+            assert chosen["chunksizes"][1:] == (50,)
+
+        written = xr.open_dataset(
+            filenames[1], engine="zarr" if ext == "zarr" else None
+        )
+        assert_equal(written.drop_attrs(), ref)
+        # zeros compress well
+        if ext == "nc":
+            assert written.test.encoding["zlib"]
+        else:
+            assert written.test.encoding["compressors"]
+
+    def test_auto_groups(self, monkeypatch):
+        class FakeClient:
+            def scheduler_info(self):
+                worker = dict(memory_limit=400, nthreads=2)
+                return dict(workers=dict(a=worker, b=worker))
+
+        ds = xr.Dataset({"test": ("x", np.arange(10, dtype="int64"))})  # 80 bytes
+        items = [((f"{i}.nc", ds), None) for i in range(20)]
+
+        writer = XarrayInterface().writer
+        groups = writer.iter_auto_groups(items, FakeClient())
+        # as many calls as threads
+        assert len(next(groups)) == 4
+
+        # quick groups grow, up to the memory budget (half of 800 bytes)
+        assert len(next(groups)) == 5
+        assert len(next(groups)) == 5
+
+        # slow groups shrink
+        writer.auto_chop_duration = 0.0
+        assert len(next(groups)) == 2
+
+    def test_multifile_auto(self, tmpdir, client):
+        ref, ref_split, filenames = self.setup_multifile(tmpdir)
+
+        di = XarrayInterface()
+        di.writer.send_calls_together(
+            list(zip(filenames, ref_split)), client, chop="auto"
+        )
+        assert_equal(xr.open_mfdataset(filenames).load(), ref)
+
 
 class TestSplitWriter:
     def get_data(self, freq="1D") -> xr.Dataset:
@@ -332,3 +421,356 @@ class TestSplitWriter:
         assert_equal(splits[1].time, ref.time[4:6])
         assert_equal(splits[2].time, ref.time[6:10])
         assert_equal(splits[3].time, ref.time[10:])
+
+    def get_daily_interface(self, tmpdir) -> type[DataInterface]:
+        class XarrayDataset(DataInterface):
+            Parameters = ParametersDict
+            Writer = XarraySplitWriter
+
+            class Source(FileFinderSource):
+                def get_root_directory(self):
+                    return tmpdir
+
+                def get_filename_pattern(self):
+                    return "%(Y)-%(m)-%(d)_%(y:fmt=02d).nc"
+
+        return XarrayDataset
+
+    def test_chunk_alignment(self, tmpdir, caplog, monkeypatch):
+        caplog.set_level(logging.INFO)
+        ref = self.get_data("1D").chunk(time=3)
+        di = self.get_daily_interface(tmpdir)()
+
+        splits = di.writer.split_by_time(ref, time_freq="2D")
+        assert [s.test.chunksizes["time"] for s in splits] == [(2,), (2,)]
+        assert "Rechunking" in caplog.text
+
+        monkeypatch.setattr(di.writer, "chunk_alignment", "warn")
+        splits = di.writer.split_by_time(ref, time_freq="2D")
+        assert [s.test.chunksizes["time"] for s in splits] == [(2,), (1, 1)]
+        assert "not aligned" in caplog.text
+        assert "'MS'" in caplog.text
+
+        # aligned
+        caplog.clear()
+        di.writer.split_by_time(ref.chunk(time=2), time_freq="2D")
+        assert "not aligned" not in caplog.text
+
+    def test_streaming(self, tmpdir):
+        """Splits and calls are generated lazily."""
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+
+        calls = di.writer.iter_calls(di.writer.iter_splits(ref))
+        outfile, ds = next(calls)
+        assert outfile == str(tmpdir / "2000-01-01_00.nc")
+        assert ds.time.size == 1
+        assert not path.isfile(outfile)
+
+        results = di.writer.send_calls(calls)
+        assert len(results) == 7
+        assert path.isfile(str(tmpdir / "2000-01-04_01.nc"))
+
+    def test_profiling(self, tmpdir):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+
+        class ListSink(SpanSink):
+            def __init__(self):
+                self.spans = []
+
+            def emit(self, span):
+                self.spans.append(span)
+
+        sink = ListSink()
+        di.profiler.add_sink(sink)
+        di.write(ref, time_freq="2D")
+        paths = [s.path for s in sink.spans]
+        assert paths[0] == "write/metadata"
+        assert paths[-1] == "write"
+        assert "write/send_calls/split_time" in paths
+        calls = [s for s in sink.spans if s.name == "write_call"]
+        assert len(calls) == 4
+        assert calls[0].attrs["target"] == str(tmpdir / "2000-01-01_00.nc")
+
+    def test_memory_monitor(self, tmpdir):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+        di.memory_monitor = MemoryMonitor()
+        di.write(ref, time_freq="2D", queue_depth=1)
+
+        records = di.memory_monitor.records
+        assert [r.operation for r in records] == ["write_call"] * 4
+        assert records[0].attrs["target"] == str(tmpdir / "2000-01-01_00.nc")
+        assert sum(r.nbytes for r in records) >= ref.nbytes
+        summary = di.memory_monitor.summary()
+        assert summary[type(di).__qualname__]["calls"] == 4
+
+    @pytest.mark.parametrize("ext", ["nc", "zarr"])
+    def test_background(self, tmpdir, ext):
+        ref = self.get_data("1D").chunk(time=1)
+
+        class XarrayDataset(DataInterface):
+            Parameters = ParametersDict
+            Writer = XarraySplitWriter
+
+            class Source(FileFinderSource):
+                def get_root_directory(self):
+                    return tmpdir
+
+                def get_filename_pattern(self):
+                    return "%(Y)-%(m)-%(d)." + ext
+
+        di = XarrayDataset()
+        results = di.write(ref, queue_depth=2)
+        assert len(results) == 4
+
+        written = xr.open_mfdataset(
+            sorted(str(f) for f in tmpdir.listdir()),
+            engine=None if ext == "nc" else "zarr",
+        )
+        assert_equal(written.drop_attrs(), ref)
+
+    def test_staging(self, tmpdir):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir / "out")()
+        staging_dir = tmpdir / "staging"
+        staging_dir.mkdir()
+        di.write(ref, staging=staging_dir, resume=True)
+
+        assert staging_dir.listdir() == []
+        assert len((tmpdir / "out").listdir(lambda f: f.ext == ".nc")) == 8
+        written = xr.open_dataset(str(tmpdir / "out" / "2000-01-04_01.nc"))
+        np.testing.assert_array_equal(
+            written.test.values.ravel(), ref.test.isel(time=3, y=1).values
+        )
+
+        # all targets were recorded in manifest once moved
+        files = (tmpdir / "out").listdir(lambda f: f.ext == ".nc")
+        mtimes = [f.mtime() for f in files]
+        di.write(ref, staging=staging_dir, resume=True, queue_depth=1)
+        assert [f.mtime() for f in files] == mtimes
+
+    def test_checksum(self, tmpdir, client):
+        from neba.data.manifest import WriteManifest
+
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+        di.write(ref, checksum=True, client=client, max_in_flight=2)
+
+        manifest = WriteManifest()
+        assert manifest.verify(tmpdir) == {}
+        assert manifest.get(str(tmpdir / "2000-01-01_00.nc"))["hash"].startswith(
+            "blake2b:"
+        )
+
+    def test_dry_run(self, tmpdir):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+        plan = di.write(ref, dry_run=True)
+
+        assert len(plan) == 8
+        assert plan.total_nbytes == sum(ds.nbytes for _, ds in plan)
+        assert plan.targets[0] == str(tmpdir / "2000-01-01_00.nc")
+        assert tmpdir.listdir() == []
+
+    def test_max_in_flight(self, tmpdir, client):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+        di.write(ref, client=client, max_in_flight=2)
+
+        for i, date in enumerate(["01-01", "01-02", "01-03", "01-04"]):
+            for y in range(2):
+                written = xr.open_dataset(str(tmpdir / f"2000-{date}_{y:02d}.nc"))
+                np.testing.assert_array_equal(
+                    written.test.values.ravel(), ref.test.isel(time=i, y=y).values
+                )
+
+    def test_resume(self, tmpdir):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+        di.write(ref, resume=True)
+
+        files = sorted(str(f) for f in tmpdir.listdir() if f.ext == ".nc")
+        assert len(files) == 8
+        mtimes = {f: path.getmtime(f) for f in files}
+
+        # nothing changed, nothing is written
+        di.write(ref, resume=True)
+        assert all(path.getmtime(f) == mtimes[f] for f in files)
+
+        # partially written file
+        first = str(tmpdir / "2000-01-01_00.nc")
+        with open(first, "w") as fp:
+            fp.write("garbage")
+        # changed data
+        ref["test"][-1] += 1
+
+        di.write(ref, resume=True)
+        rewritten = [f for f in files if path.getmtime(f) != mtimes[f]]
+        assert rewritten == [
+            first,
+            str(tmpdir / "2000-01-04_00.nc"),
+            str(tmpdir / "2000-01-04_01.nc"),
+        ]
+        xr.open_dataset(first)
+
+    @pytest.mark.parametrize("append", [False, True])
+    def test_store(self, tmpdir, append):
+        ref = self.get_data("1D")
+        ref["static"] = ("x", np.arange(3.0))
+        di = self.get_daily_interface(tmpdir)()
+
+        store = str(tmpdir / "store.zarr")
+        di.writer.write_store(ref, store, time_freq="3D", append=append)
+
+        written = xr.open_zarr(store)
+        assert "written_with_interface" in written.attrs
+        assert_equal(written.drop_attrs(), ref)
+        if not append:
+            assert written.test.encoding["chunks"] == (3, 2, 3)
+
+    @pytest.mark.parametrize("append", [False, True])
+    def test_store_auto_encoding(self, tmpdir, append):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+
+        store = str(tmpdir / "store.zarr")
+        di.writer.write_store(
+            ref, store, time_freq="3D", append=append, encoding="auto"
+        )
+        assert_equal(xr.open_zarr(store).drop_attrs(), ref)
+
+    def test_store_dask(self, tmpdir, client):
+        ref = self.get_data("1D").chunk(time=2)
+        di = self.get_daily_interface(tmpdir)()
+
+        store = str(tmpdir / "store.zarr")
+        di.writer.write_store(
+            ref, store, time_freq="2D", client=client, max_in_flight=1
+        )
+
+        written = xr.open_zarr(store)
+        assert written.test.encoding["chunks"] == (2, 2, 3)
+        assert_equal(written.drop_attrs(), ref)
+
+    @pytest.mark.parametrize("chunk", [None, 5])
+    def test_store_irregular(self, tmpdir, client, chunk):
+        time = pd.date_range(start="2000-01-01", periods=75, freq="1D")
+        ref = xr.Dataset(
+            {"test": (("time", "x"), np.arange(150.0).reshape(75, 2))},
+            coords={"time": time},
+        )
+        if chunk is not None:
+            ref = ref.chunk(time=chunk)
+        di = self.get_daily_interface(tmpdir)()
+
+        # monthly groups: 31, 29, 15
+        slices = di.writer.get_time_slices(ref, time_freq="1MS")
+        assert di.writer.get_store_time_chunk(ref, slices) == (chunk or 31, False)
+        assert di.writer.get_store_time_chunk(ref, slices[:1]) == (chunk or 31, True)
+
+        store = str(tmpdir / "store.zarr")
+        with pytest.raises(ValueError):
+            di.writer.write_store(ref, store, time_freq="1MS", client=client)
+        di.writer.write_store(ref, store, time_freq="1MS")
+        written = xr.open_zarr(store)
+        assert written.test.encoding["chunks"] == (chunk or 31, 2)
+        assert_equal(written.drop_attrs(), ref)
+
+    def test_store_time_chunk(self, tmpdir):
+        ref = self.get_data("1D")
+        di = self.get_daily_interface(tmpdir)()
+        slices = [slice(0, 4), slice(4, 8), slice(8, 10)]
+        assert di.writer.get_store_time_chunk(ref, slices) == (4, True)
+        assert di.writer.get_store_time_chunk(ref.chunk(time=2), slices) == (2, True)
+        assert di.writer.get_store_time_chunk(ref.chunk(time=3), slices) == (4, True)
+
+
+class TestRepartition:
+    def get_interface(self, tmpdir, pattern) -> DataInterface:
+        class XarrayDataset(DataInterface):
+            Parameters = ParametersDict
+            Loader = XarrayLoader
+            Writer = XarraySplitWriter
+
+            class Source(FileFinderSource):
+                def get_root_directory(self):
+                    return tmpdir
+
+                def get_filename_pattern(self):
+                    return pattern
+
+        return XarrayDataset()
+
+    def test_daily_to_monthly(self, tmpdir):
+        time = pd.date_range(start="2000-01-01", periods=40, freq="1D")
+        ref = xr.Dataset(
+            {"test": (("time", "y"), np.arange(80.0).reshape(40, 2))},
+            coords={"time": time, "y": range(2)},
+        )
+        daily = self.get_interface(tmpdir / "daily", "%(Y)-%(m)-%(d)_%(y:fmt=02d).nc")
+        daily.write(ref)
+        monthly = self.get_interface(tmpdir / "monthly", "%(Y)-%(m)_%(y:fmt=02d).nc")
+
+        groups = repartition(daily, monthly, remove=True)
+
+        assert sorted(groups) == [
+            str(tmpdir / "monthly" / f"2000-{m}_{y}.nc")
+            for m in ["01", "02"]
+            for y in ["00", "01"]
+        ]
+        assert len(groups[str(tmpdir / "monthly" / "2000-01_01.nc")]) == 31
+        assert (tmpdir / "daily").listdir() == []
+
+        written = xr.open_mfdataset(sorted(groups))
+        assert_equal(written.drop_attrs().load(), ref)
+
+    def test_verification(self, tmpdir, monkeypatch):
+        ref = self.get_data()
+        daily = self.get_interface(tmpdir / "daily", "%(Y)-%(m)-%(d).nc")
+        daily.write(ref)
+        monthly = self.get_interface(tmpdir / "monthly", "%(Y)-%(m).nc")
+
+        with pytest.raises(ValueError):
+            repartition(daily, monthly, verify=False, remove=True)
+
+        monkeypatch.setattr(xr.Dataset, "equals", lambda self, other: False)
+        with pytest.raises(RuntimeError):
+            repartition(daily, monthly, remove=True)
+        assert len((tmpdir / "daily").listdir()) == 4
+
+        with pytest.raises(TypeError):
+            repartition(daily, XarrayInterface())
+
+    def test_date_groups(self, tmpdir):
+        daily = self.get_interface(tmpdir / "daily", "%(Y)/%(m)-%(d).nc")
+        daily.write(self.get_data())
+        target = self.get_interface(tmpdir / "target", "%(x).nc")
+
+        groups = get_repartition_groups(daily, target)
+        assert sorted(groups) == [
+            str(tmpdir / "target" / f"2000010{d}.nc") for d in range(1, 5)
+        ]
+
+    def test_datafiles(self, tmpdir):
+        (tmpdir / "monthly").mkdir()
+        for m in range(1, 4):
+            (tmpdir / "monthly" / f"{m:02d}.nc").write_text("", "utf8")
+        monthly = self.get_interface(tmpdir / "monthly", "%(m).nc")
+        monthly.source.default_date = dict(year=2005, day=15)
+        monthly.parameters["m"] = [1, 2]
+        target = self.get_interface(tmpdir / "target", "%(Y)/%(x).nc")
+
+        # fixed parameters and default date of the source are used
+        groups = get_repartition_groups(monthly, target)
+        assert groups == {
+            str(tmpdir / "target" / "2005" / f"2005{m:02d}15.nc"): [
+                str(tmpdir / "monthly" / f"{m:02d}.nc")
+            ]
+            for m in [1, 2]
+        }
+
+    def get_data(self):
+        time = pd.date_range(start="2000-01-01", periods=4, freq="1D")
+        return xr.Dataset({"test": ("time", np.arange(4.0))}, coords={"time": time})
@@ -2,7 +2,7 @@
 
 import pytest
 
-from neba.utils import cut_in_slices, get_classname, import_item
+from neba.utils import cut_in_slices, format_nbytes, get_classname, import_item
 
 
 def test_cut_slices():
@@ -46,3 +46,10 @@ def test_get_classname():
     assert get_classname(MyClass.Inner) == "tests.test_utils.MyClass.Inner"
     assert get_classname(Outer, module=False) == "Outer"
     assert get_classname(Outer) == "tests.test_utils.Outer"
+
+
+def test_format_nbytes():
+    assert format_nbytes(12) == "12 B"
+    assert format_nbytes(2048) == "2.0 KiB"
+    assert format_nbytes(3.5 * 1024**3) == "3.5 GiB"
+    assert format_nbytes(2048 * 1024**4) == "2048.0 TiB"